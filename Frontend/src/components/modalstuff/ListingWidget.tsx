@@ -1,10 +1,11 @@
 // src/components/modalstuff/ListingWidget.tsx
-import React from 'react';
+import React, { useEffect, useState } from 'react';
 import styled from 'styled-components';
 
 // WidgetProps Interface
 interface WidgetProps {
   image: string;
+  fallbackImage?: string; // shown instead if `image` fails to load (e.g. a resized copy that doesn't exist)
   title: string;
   artist: string;
   price: number;
@@ -16,6 +17,7 @@ interface WidgetProps {
 
 const Widget: React.FC<WidgetProps> = ({ 
   image, 
+  fallbackImage,
   title, 
   artist, 
   price, 
@@ -24,10 +26,17 @@ const Widget: React.FC<WidgetProps> = ({
   sellerId,
   soldOut 
 }) => {
+  const [src, setSrc] = useState(image);
+  useEffect(() => setSrc(image), [image]);
+
+  const handleImageError = () => {
+    if (fallbackImage && src !== fallbackImage) setSrc(fallbackImage);
+  };
+
   return (
     <WidgetContainer>
       <ImageWrapper>
-        <Image src={image} alt={title} />
+        <Image src={src} alt={title} onError={handleImageError} />
         {soldOut && <SoldOutBadge>SOLD OUT</SoldOutBadge>}
         <GradientOverlay />
       </ImageWrapper>
@@ -1,5 +1,4 @@
 import React, { useState, useEffect } from "react";
-import axios from "axios";
 import styled from "styled-components";
 import ListingWidget from "../components/modalstuff/ListingWidget";
 import ListingModal from "../components/modalstuff/Modal";
@@ -7,6 +6,7 @@ import { useUser } from "../context/UserContext";
 import { useCart } from "../context/CartContext";
 import ListingHeader from "../components/SellerProfileInfo/ListingHeader";
 import SellerInfo from "../components/SellerProfileInfo/SellerInfo";
+import checkoutService from "../services/checkoutService";
 
 interface Product {
   id: number;
@@ -26,46 +26,44 @@ const BuyerView: React.FC = () => {
   const [isModalOpen, setIsModalOpen] = useState<boolean>(false);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
+  const [nextPage, setNextPage] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+
+  // one widget per art piece bought, priced at what the buyer paid for it
+  const formatOrders = (orders: any[]): Product[] => {
+    const formatted: Product[] = [];
+    orders.forEach((order: any) => {
+      order.art_pieces.forEach((item: any) => {
+        const art = item.art;
+
+        // item.price is the price paid at checkout; art.price is only what the piece costs now
+        let price = 0;
+        if (item.price && !isNaN(parseFloat(item.price))) {
+          price = parseFloat(item.price);
+        } else if (art.price && !isNaN(parseFloat(art.price))) {
+          price = parseFloat(art.price);
+        }
+
+        formatted.push({
+          id: art.art_id,
+          name: art.name,
+          image: art.image || "",
+          price: price,
+          date: order.date_purchased || "2025-04-01",
+          stock_amount: art.stock_amount || 0,
+        });
+      });
+    });
+    return formatted;
+  };
 
   useEffect(() => {
     const fetchPurchases = async () => {
       if (!user?.user_id) return;
       try {
-        const response = await axios.get(
-          "http://localhost:8000/base/purchase_order/purchase-history/",
-          { withCredentials: true }
-        );
-
-        console.log("Raw API response:", response.data);
-
-        const formatted: Product[] = [];
-        response.data.forEach((order: any) => {
-          order.art_pieces.forEach((item: any) => {
-            const art = item.art;
-
-            // Simplify price extraction to just one consistent approach
-            let price = 0;
-            if (item.price && !isNaN(parseFloat(item.price))) {
-              price = parseFloat(item.price);
-            } else if (art.price && !isNaN(parseFloat(art.price))) {
-              price = parseFloat(art.price);
-            }
-
-            console.log(`Art piece ${art.name} price:`, price);
-
-            formatted.push({
-              id: art.art_id,
-              name: art.name,
-              image: art.image || "",
-              price: price, // Use the extracted price
-              date: order.date_purchased || "2025-04-01",
-              stock_amount: art.stock_amount || 0,
-            });
-          });
-        });
-
-        console.log("Final formatted purchase data:", formatted);
-        setProducts(formatted);
+        const page = await checkoutService.getPurchaseHistory();
+        setProducts(formatOrders(page.results));
+        setNextPage(page.next);
         setLoading(false);
       } catch (err) {
         console.error("Error fetching past purchases:", err);
@@ -77,7 +75,23 @@ const BuyerView: React.FC = () => {
     fetchPurchases();
   }, [user]);
 
-  // Only sort when sortMethod changes
+  // purchase history is cursor paginated, older orders are fetched on demand
+  const loadMore = async () => {
+    if (!nextPage || loadingMore) return;
+    setLoadingMore(true);
+    try {
+      const page = await checkoutService.getPurchaseHistory(nextPage);
+      setProducts((current) => [...current, ...formatOrders(page.results)]);
+      setNextPage(page.next);
+    } catch (err) {
+      console.error("Error fetching more past purchases:", err);
+      alert("Couldn't load more purchases, please try again.");
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
+  // Sort when sortMethod changes or another page of purchases comes in
   useEffect(() => {
     if (products.length > 0 && sortMethod) {
       const productsCopy = [...products];
@@ -97,7 +111,7 @@ const BuyerView: React.FC = () => {
       });
       setProducts(sorted);
     }
-  }, [sortMethod]);
+  }, [sortMethod, products.length]);
 
   const handleWidgetClick = (product: Product) => {
     console.log("Selected product:", product);
@@ -170,6 +184,12 @@ const BuyerView: React.FC = () => {
           </ProductGrid>
         </div>
 
+        {nextPage && (
+          <LoadMoreButton onClick={loadMore} disabled={loadingMore}>
+            {loadingMore ? "Loading..." : "Load more"}
+          </LoadMoreButton>
+        )}
+
         {isModalOpen && selectedProduct && (
           <ListingModal
             isOpen={isModalOpen} 
@@ -206,4 +226,21 @@ const ProductGrid = styled.div`
   margin-top: 2rem;
 `;
 
+const LoadMoreButton = styled.button`
+  display: block;
+  margin: 2rem auto 0;
+  padding: 0.75rem 2rem;
+  background-color: #2c2c2c;
+  color: #ffffff;
+  border: 1px solid #444;
+  border-radius: 8px;
+  font-size: 1rem;
+  cursor: pointer;
+
+  &:disabled {
+    cursor: default;
+    opacity: 0.6;
+  }
+`;
+
 export default BuyerView;
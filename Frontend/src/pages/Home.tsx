@@ -9,9 +9,12 @@ import Sidebar from "../components/Sidebar";
 import { useCart } from "../context/CartContext";
 import { useUser } from "../context/UserContext";
 
+const SEARCH_DELAY_MS = 300;
+
 interface Product {
   id: string;
   images: string[];
+  thumbnail: string; // small card-sized image for the grid
   title: string;
   artist: string;
   price: number;
@@ -36,63 +39,83 @@ const Home: React.FC = () => {
   const [selectedCategories, setSelectedCategories] = useState<string[]>([]);
   const [selectedCounty, setSelectedCounty] = useState<string | null>(null);
   const [searchQuery, setSearchQuery] = useState('');
+  // what the catalog is actually filtered by: the search box once typing has paused for SEARCH_DELAY_MS
+  const [debouncedQuery, setDebouncedQuery] = useState('');
+
+  // cursor for the next page of the catalog, null once everything has been loaded
+  const [nextPage, setNextPage] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState<boolean>(false);
+
+  const formatProduct = (item: any): Product => ({
+    id: String(item.art_id),
+    // Try image_url first, then fall back to image
+    images: item.image_url ? [item.image_url] :
+           (item.image ? [item.image] : []),
+    // resized card image made by the background job (null until it has run), falling back to the original
+    thumbnail: item.image_variants?.card?.webp || item.image_url || item.image || "",
+    title: item.name,
+    artist: `${item.user.first_name} ${item.user.last_name}`,
+    price: item.price !== null ? parseFloat(String(item.price)) : 0,
+    typeOfArt: item.type_of_art,
+    bio: item.description || "",
+    sellerEmail: item.user?.email || `user_${item.user.user_id}@example.com`,
+    sellerId: String(item.user.user_id), // Add the seller's user_id
+    location: String(item.location.location_id),
+    stock: item.stock_amount,
+  });
 
   useEffect(() => {
+    const timer = setTimeout(() => setDebouncedQuery(searchQuery.trim()), SEARCH_DELAY_MS);
+    return () => clearTimeout(timer);
+  }, [searchQuery]);
+
+  useEffect(() => {
+    let stale = false; // a newer request has started, so this one's response is dropped
+
     const fetchProducts = async () => {
       try {
-        const response = await axios.get("http://127.0.0.1:8000/base/artpieces/");
-        console.log("Raw API response:", response.data);
-        
-        if (response.data.length > 0) {
-          console.log("First item image:", response.data[0].image);
-          console.log("First item image_url:", response.data[0].image_url);
-        }
-  
-        const formattedProducts = response.data.map((item: any) => {
-          return {
-            id: String(item.art_id),
-            // Try image_url first, then fall back to image
-            images: item.image_url ? [item.image_url] : 
-                   (item.image ? [item.image] : []),
-            title: item.name,
-            artist: `${item.user.first_name} ${item.user.last_name}`,
-            price: item.price !== null ? parseFloat(String(item.price)) : 0,
-            typeOfArt: item.type_of_art,
-            bio: item.description || "",
-            sellerEmail: item.user?.email || `user_${item.user.user_id}@example.com`,
-            sellerId: String(item.user.user_id), // Add the seller's user_id
-            location: String(item.location.location_id),
-            stock: item.stock_amount,
-          };
-        });
-  
-        setProducts(formattedProducts);
+        // category, county and search filtering happens on the server
+        const params: Record<string, string> = {};
+        if (debouncedQuery) params.search = debouncedQuery;
+        if (selectedCategories.length > 0) params.type_of_art = selectedCategories.join(",");
+        if (selectedCounty) params.location = selectedCounty;
+
+        const response = await axios.get("http://127.0.0.1:8000/base/artpieces/", { params });
+        if (stale) return;
+        // the catalog is cursor paginated: { next, previous, results }
+        const items = response.data.results ?? response.data;
+
+        setProducts(items.map(formatProduct));
+        setNextPage(response.data.next ?? null);
         setLoading(false);
       } catch (error: any) {
+        if (stale) return;
         console.error("Error fetching products:", error);
         setError("Failed to fetch products. Please check your network and the API.");
         setLoading(false);
       }
     };
-  
+
     fetchProducts();
-  }, []);
-
-  const filterProducts = () => {
-    return products.filter((product) => {
-      const isCategoryMatch =
-        selectedCategories.length === 0 || selectedCategories.includes(product.typeOfArt);
-  
-      const isCountyMatch =
-        !selectedCounty || String(product.location) === selectedCounty;
-  
-      const isSearchMatch =
-        !searchQuery ||
-        product.title.toLowerCase().includes(searchQuery.toLowerCase()) ||
-        product.typeOfArt.toLowerCase().includes(searchQuery.toLowerCase());
-  
-      return isCategoryMatch && isCountyMatch && isSearchMatch;
-    });
+    return () => {
+      stale = true;
+    };
+  }, [selectedCategories, selectedCounty, debouncedQuery]);
+
+  // the next link already carries the filters and the cursor
+  const loadMore = async () => {
+    if (!nextPage || loadingMore) return;
+    setLoadingMore(true);
+    try {
+      const response = await axios.get(nextPage);
+      setProducts((current) => [...current, ...response.data.results.map(formatProduct)]);
+      setNextPage(response.data.next ?? null);
+    } catch (error: any) {
+      console.error("Error fetching more products:", error);
+      alert("Couldn't load more art pieces, please try again.");
+    } finally {
+      setLoadingMore(false);
+    }
   };
 
   const handleSearch = (query: string) => {
@@ -107,7 +130,7 @@ const Home: React.FC = () => {
     setSelectedCounty(locationId);
   };
 
-  const filteredProducts = filterProducts();
+  const filteredProducts = products;
 
   const openModal = (product: Product) => {
     setSelectedProduct(product);
@@ -176,7 +199,8 @@ const Home: React.FC = () => {
             filteredProducts.map((product) => (
               <WidgetWrapper key={product.id} onClick={() => openModal(product)}>
                 <Widget
-                  image={product.images[0] || ""}
+                  image={product.thumbnail}
+                  fallbackImage={product.images[0]}
                   title={product.title}
                   artist={product.artist}
                   price={product.price}
@@ -194,6 +218,11 @@ const Home: React.FC = () => {
           )}
         </WidgetGrid>
       </ContentWrapper>
+      {nextPage && (
+        <LoadMoreButton onClick={loadMore} disabled={loadingMore}>
+          {loadingMore ? "Loading..." : "Load more"}
+        </LoadMoreButton>
+      )}
       {isModalOpen && selectedProduct && (
         <Modal
           isOpen={isModalOpen}
@@ -246,6 +275,23 @@ const WidgetWrapper = styled.div`
   cursor: pointer;
 `;
 
+const LoadMoreButton = styled.button`
+  display: block;
+  margin: 2rem auto 0;
+  padding: 0.75rem 2rem;
+  background-color: #2c2c2c;
+  color: #ffffff;
+  border: 1px solid #444;
+  border-radius: 8px;
+  font-size: 1rem;
+  cursor: pointer;
+
+  &:disabled {
+    cursor: default;
+    opacity: 0.6;
+  }
+`;
+
 const LoadingContainer = styled.div`
   display: flex;
   justify-content: center;
@@ -26,10 +26,11 @@ const cartService = {
   // Get user cart items
   getUserCart: async (): Promise<CartItem[]> => {
     try {
-      const response = await axios.get<CartItem[]>(`${API_URL}/`, { 
+      // the cart endpoint returns { item_count, subtotal, has_out_of_stock, items, ... }
+      const response = await axios.get<{ items: CartItem[] }>(`${API_URL}/`, { 
         withCredentials: true 
       });
-      return response.data;
+      return response.data.items;
     } catch (error) {
       console.error('Error fetching cart:', error);
       throw error;
@@ -65,6 +66,25 @@ const cartService = {
     }
   },
 
+  // Add and remove many items in one request (e.g. restoring a saved cart).
+  // Resolves to what happened to each art id: "added", "already_in_cart", "out_of_stock", "removed", ...
+  updateCart: async (
+    add: Array<string | number> = [],
+    remove: Array<string | number> = []
+  ): Promise<{ add: Record<string, string>; remove: Record<string, string>; item_count: number }> => {
+    try {
+      const response = await axios.post<{ add: Record<string, string>; remove: Record<string, string>; item_count: number }>(
+        `${API_URL}/batch/`,
+        { add: add.map(Number), remove: remove.map(Number) },
+        { withCredentials: true }
+      );
+      return response.data;
+    } catch (error) {
+      console.error('Error updating cart:', error);
+      throw error;
+    }
+  },
+
   // Clear cart
   clearCart: async (): Promise<{ message: string }> => {
     try {
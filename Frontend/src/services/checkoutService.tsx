@@ -20,6 +20,7 @@ interface PurchaseHistoryItem {
   };
   art_pieces: Array<{
     purchase_order_art_id: number;
+    price: string | null; // what the buyer paid; art.price below is the current price
     art: {
       art_id: number;
       name: string;
@@ -32,6 +33,12 @@ interface PurchaseHistoryItem {
   }>;
 }
 
+// One page of purchase history, newest orders first. next is the URL of the following page, or null.
+interface PurchaseHistoryPage {
+  results: PurchaseHistoryItem[];
+  next: string | null;
+}
+
 const checkoutService = {
   // Process checkout
   checkout: async (orderNotes?: string): Promise<CheckoutResponse> => {
@@ -48,17 +55,18 @@ const checkoutService = {
     }
   },
 
-  // Get purchase history
-  getPurchaseHistory: async (): Promise<PurchaseHistoryItem[]> => {
+  // Get a page of purchase history: the first one, or the page at a previous response's next URL
+  getPurchaseHistory: async (pageUrl?: string): Promise<PurchaseHistoryPage> => {
     try {
-      const response = await axios.get<PurchaseHistoryItem[]>(
-        `${API_URL}/purchase-history/`, 
+      const response = await axios.get<PurchaseHistoryPage>(
+        pageUrl || `${API_URL}/purchase-history/`,
         { withCredentials: true }
       );
-      return response.data || []; // Ensure we always return an array
+      // Ensure we always return an array
+      return { results: response.data?.results || [], next: response.data?.next ?? null };
     } catch (error) {
       console.error('Error fetching purchase history:', error);
-      return []; // Return empty array on error
+      throw error;
     }
   }
 };
@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class ArtpieceConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "artpiece"
+
+    def ready(self):
+        # connects the signal receivers that keep the search index in sync
+        from . import search  # noqa: F401
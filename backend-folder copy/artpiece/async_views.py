@@ -0,0 +1,108 @@
+import functools
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django_filters.utils import translate_validation
+from rest_framework import status
+from rest_framework.exceptions import APIException, NotFound
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from base.models import ArtPiece, Location
+from base.replicas import use_primary
+from .cache import (aget_catalog_state, catalog_cache_key, catalog_etag, changed_recently, not_modified_response,
+                    set_validators)
+from .pagination import ArtPieceCursorPagination
+from .serializers import ArtPieceSerializer, LocationSerializer
+from .views import ArtPieceFilter
+
+# Async versions of the read-only catalog endpoints, mounted under /base/artpieces/async/.
+#
+# The views in views.py are DRF class-based views, which are sync only: under ASGI (myproject/asgi.py)
+# every request to them is handed to a thread. These are plain async Django views that query with the
+# async ORM instead. They return exactly the same JSON as their sync counterparts (same serializers,
+# filters, cursors and catalog cache), so the frontend can switch between them by changing the URL.
+#
+#   /base/artpieces/async/                  ->  ArtPieceListAPIView
+#   /base/artpieces/async/<art_id>/         ->  ArtPieceDetailAPIView
+#   /base/artpieces/async/<seller_id>/art/  ->  SellerArtPieceListAPIView
+#   /base/artpieces/async/locations/        ->  AllLocationsAPIView
+#
+# benchmarks/async_catalog.py compares the two under uvicorn.
+
+
+def render(data, status_code=status.HTTP_200_OK):
+    # rendered the same way DRF renders the sync views' responses
+    return HttpResponse(JSONRenderer().render(data), status=status_code, content_type='application/json')
+
+
+# Wraps an async function returning the response data: GET only, conditional GET, catalog cache and DRF-style errors
+def catalog_view(get_data):
+    @functools.wraps(get_data)
+    async def view(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return render({'detail': f'Method "{request.method}" not allowed.'}, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+        request = Request(request)  # for query_params, which the filters and paginator read
+        version, last_modified = await aget_catalog_state()
+        etag = catalog_etag(request, version)
+        not_modified = not_modified_response(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        key = catalog_cache_key(request, version)
+        data = await cache.aget(key)
+        if data is None:
+            try:
+                with use_primary(changed_recently(version, last_modified)):
+                    data = await get_data(request, *args, **kwargs)
+            except APIException as e:
+                detail = e.detail if isinstance(e.detail, (list, dict)) else {'detail': e.detail}
+                return render(detail, e.status_code)
+            await cache.aset(key, data, settings.CATALOG_CACHE_TIMEOUT)
+        response = render(data)
+        set_validators(response, etag, last_modified)
+        return response
+    return view
+
+
+@catalog_view
+async def art_piece_list(request):
+    filterset = ArtPieceFilter(request.query_params, queryset=ArtPiece.objects.select_related('user', 'location'),
+                               request=request)
+    if not filterset.is_valid():
+        raise translate_validation(filterset.errors)
+    if filterset.form.cleaned_data.get('search'):
+        # building the full-text filter can read the database (the in-process search backend), which isn't async
+        queryset = await sync_to_async(lambda: filterset.qs)()
+    else:
+        queryset = filterset.qs
+
+    paginator = ArtPieceCursorPagination()
+    page = await paginator.apaginate_queryset(queryset, request)
+    data = ArtPieceSerializer(page, many=True, context={'request': request}).data
+    return paginator.get_paginated_response(data).data
+
+
+@catalog_view
+async def art_piece_detail(request, art_id):
+    try:
+        art_piece = await ArtPiece.objects.select_related('user', 'location').aget(art_id=art_id)
+    except ArtPiece.DoesNotExist:
+        raise NotFound('No ArtPiece matches the given query.')
+    return ArtPieceSerializer(art_piece, context={'request': request}).data
+
+
+@catalog_view
+async def seller_art_pieces(request, seller_id):
+    art_pieces = [art_piece async for art_piece in
+                  ArtPiece.objects.filter(user_id=seller_id).select_related('user', 'location')]
+    return ArtPieceSerializer(art_pieces, many=True, context={'request': request}).data
+
+
+@catalog_view
+async def all_locations(request):
+    locations = [location async for location in Location.objects.all()]
+    return LocationSerializer(locations, many=True).data
@@ -0,0 +1,154 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+from base.replicas import use_primary
+
+# Response cache for the public catalog endpoints (list, detail, seller listings, search and locations).
+#
+# Every cache key includes a "catalog version" number. Anything that changes what those endpoints return
+# (creating or deleting a listing, checkout lowering stock) calls bump_catalog_version(), which makes all
+# the old keys unreachable at once; they simply expire on their own. That way reads are served from the
+# cache almost all the time, but nobody sees stale stock after a purchase.
+#
+# The version also makes a cheap validator for conditional GETs: every response carries an ETag built from
+# the version and the URL, plus the time of the last change as Last-Modified. When the browser asks again
+# with If-None-Match / If-Modified-Since and nothing has changed, it gets an empty 304 straight away,
+# before the cache or the database is even looked at.
+#
+# Right after a change a read replica may not have it yet, so for REPLICA_PIN_SECONDS after a bump cache misses
+# are filled from the primary database; otherwise an old page could be cached under the new version.
+#
+# Uses the cache configured in settings.CACHES, which must be shared by every process (the database cache by
+# default, Redis/Memcached in production): the version is bumped by web workers and by run_jobs alike.
+
+CATALOG_VERSION_KEY = 'catalog:version'
+CATALOG_MODIFIED_KEY = 'catalog:modified'  # unix time of the last bump, for Last-Modified
+
+
+def get_catalog_version():
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        # start from the current time so a version that was evicted from the cache can never come back
+        # as a smaller number and accidentally match old entries
+        cache.add(CATALOG_VERSION_KEY, int(time.time() * 1000), None)
+        version = cache.get(CATALOG_VERSION_KEY, 0)
+    return version
+
+
+# get_catalog_version for async views
+async def aget_catalog_version():
+    version = await cache.aget(CATALOG_VERSION_KEY)
+    if version is None:
+        await cache.aadd(CATALOG_VERSION_KEY, int(time.time() * 1000), None)
+        version = await cache.aget(CATALOG_VERSION_KEY, 0)
+    return version
+
+
+# (version, time of the last change) in one round trip to the cache
+def get_catalog_state():
+    values = cache.get_many([CATALOG_VERSION_KEY, CATALOG_MODIFIED_KEY])
+    if len(values) < 2:
+        now = int(time.time())
+        cache.add(CATALOG_MODIFIED_KEY, now, None)
+        return get_catalog_version(), cache.get(CATALOG_MODIFIED_KEY, now)
+    return values[CATALOG_VERSION_KEY], values[CATALOG_MODIFIED_KEY]
+
+
+async def aget_catalog_state():
+    values = await cache.aget_many([CATALOG_VERSION_KEY, CATALOG_MODIFIED_KEY])
+    if len(values) < 2:
+        now = int(time.time())
+        await cache.aadd(CATALOG_MODIFIED_KEY, now, None)
+        return await aget_catalog_version(), await cache.aget(CATALOG_MODIFIED_KEY, now)
+    return values[CATALOG_VERSION_KEY], values[CATALOG_MODIFIED_KEY]
+
+
+def bump_catalog_version():
+    cache.set(CATALOG_MODIFIED_KEY, int(time.time()), None)
+    try:
+        return cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:  # key missing (never set, or evicted)
+        version = int(time.time() * 1000)
+        cache.set(CATALOG_VERSION_KEY, version, None)
+        return version
+
+
+def bump_catalog_version_on_commit():
+    # only invalidate once the write is actually committed, otherwise a concurrent read could
+    # re-cache the old data under the new version
+    transaction.on_commit(bump_catalog_version)
+
+
+# True while the replicas may not have caught up with the last catalog change. Always False when the cache can't
+# keep a version (DummyCache), since then nothing is cached anyway.
+def changed_recently(version, last_modified):
+    return bool(version) and time.time() - last_modified < settings.REPLICA_PIN_SECONDS
+
+
+def request_digest(request):
+    query = '&'.join(f'{key}={value}' for key, value in sorted(request.query_params.lists()))
+    raw = f'{request.path}?{query}'
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def catalog_cache_key(request, version=None):
+    if version is None:
+        version = get_catalog_version()
+    return f'catalog:v{version}:{request_digest(request)}'
+
+
+# Strong ETag: same version, URL and format means byte-for-byte the same response.
+# None when the cache can't keep a version (DummyCache), since then the version never changes.
+def catalog_etag(request, version, representation='json'):
+    if not version:
+        return None
+    return f'"{version}-{request_digest(request)[:16]}-{representation}"'
+
+
+def set_validators(response, etag, last_modified):
+    if etag is None:
+        return
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = 'no-cache'  # the browser may keep a copy, but has to check with us before using it
+
+
+# An empty 304 if the client's copy is still current (If-None-Match / If-Modified-Since), otherwise None
+def not_modified_response(request, etag, last_modified):
+    if etag is None:
+        return None
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
+
+
+# Add to a read-only DRF view to cache its successful GET responses and answer conditional GETs
+class CatalogCacheMixin:
+    def get(self, request, *args, **kwargs):
+        version, last_modified = get_catalog_state()
+        # the browsable API and JSON are different representations of the same URL
+        etag = catalog_etag(request, version, request.accepted_renderer.format)
+        not_modified = not_modified_response(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        key = catalog_cache_key(request, version)
+        data = cache.get(key)
+        if data is not None:
+            response = Response(data)
+        else:
+            with use_primary(changed_recently(version, last_modified)):
+                response = super().get(request, *args, **kwargs)
+            if response.status_code == 200:
+                cache.set(key, response.data, settings.CATALOG_CACHE_TIMEOUT)
+        if response.status_code == 200:
+            set_validators(response, etag, last_modified)
+        return response
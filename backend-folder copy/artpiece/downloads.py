@@ -0,0 +1,98 @@
+import http.client
+import ipaddress
+import socket
+from urllib.parse import urljoin, urlsplit
+
+# Downloads images named by URL in listing imports (the artpiece.import_image job).
+#
+# The URL comes from whoever uploaded the import file, so it must not be a way to make the server talk to
+# itself or to the private network (the cloud metadata service at 169.254.169.254, an admin port on
+# localhost...):
+#   - only http and https
+#   - the host name is resolved once, every address it resolves to has to be a public one, and the connection
+#     goes to that checked address (so the name can't resolve to something else by the time we connect)
+#   - redirects are followed by hand, up to MAX_REDIRECTS, and each new URL gets the same checks
+#   - the body is read up to max_bytes and no further
+
+MAX_REDIRECTS = 3
+TIMEOUT = 30  # seconds, for connecting and for each read
+
+
+class DownloadRefused(ValueError):
+    pass
+
+
+def is_public_address(address):
+    address = ipaddress.ip_address(address)
+    if isinstance(address, ipaddress.IPv6Address) and address.ipv4_mapped:
+        address = address.ipv4_mapped
+    return address.is_global and not address.is_multicast
+
+
+# Returns an address to connect to for host, or raises DownloadRefused if any of its addresses isn't public
+def resolve_public_address(host, port):
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)}
+    except socket.gaierror as error:
+        raise DownloadRefused(f'Could not resolve {host}: {error}')
+    for address in addresses:
+        if not is_public_address(address):
+            raise DownloadRefused(f'{host} resolves to a non-public address ({address})')
+    return sorted(addresses)[0]
+
+
+# HTTP(S) connections that connect to an address we already checked instead of looking the host up again.
+# HTTPS still verifies the certificate against (and sends SNI for) the host name.
+class PinnedHTTPConnection(http.client.HTTPConnection):
+    address = None  # set by open_connection
+
+    def connect(self):
+        self.sock = socket.create_connection((self.address, self.port), self.timeout)
+
+
+class PinnedHTTPSConnection(http.client.HTTPSConnection, PinnedHTTPConnection):
+    pass  # HTTPSConnection.connect wraps the socket PinnedHTTPConnection.connect opens
+
+
+def open_connection(url):
+    parts = urlsplit(url)
+    if parts.scheme not in ('http', 'https'):
+        raise DownloadRefused(f'Only http(s) URLs can be downloaded, not {parts.scheme or "this"}: {url}')
+    if not parts.hostname:
+        raise DownloadRefused(f'No host in {url}')
+    try:
+        port = parts.port or (443 if parts.scheme == 'https' else 80)
+    except ValueError:
+        raise DownloadRefused(f'Bad port in {url}')
+
+    address = resolve_public_address(parts.hostname, port)
+    connection_class = PinnedHTTPSConnection if parts.scheme == 'https' else PinnedHTTPConnection
+    connection = connection_class(parts.hostname, port, timeout=TIMEOUT)
+    connection.address = address
+    path = parts.path or '/'
+    if parts.query:
+        path += '?' + parts.query
+    connection.request('GET', path, headers={'Accept': 'image/*'})
+    return connection, connection.getresponse()
+
+
+# Returns the body of url, or raises DownloadRefused (a ValueError) if it's refused, fails or is too large
+def fetch(url, max_bytes):
+    for _ in range(MAX_REDIRECTS + 1):
+        connection, response = open_connection(url)
+        try:
+            if response.status in (301, 302, 303, 307, 308) and response.getheader('Location'):
+                url = urljoin(url, response.getheader('Location'))
+                continue
+            if response.status != 200:
+                raise DownloadRefused(f'{url} answered {response.status} {response.reason}')
+            length = response.getheader('Content-Length', '')
+            if length.isdigit() and int(length) > max_bytes:
+                raise DownloadRefused(f'{url} is larger than {max_bytes} bytes')
+            data = response.read(max_bytes + 1)  # Content-Length may be missing or wrong
+            if len(data) > max_bytes:
+                raise DownloadRefused(f'{url} is larger than {max_bytes} bytes')
+            return data
+        finally:
+            connection.close()
+    raise DownloadRefused(f'Too many redirects, gave up at {url}')
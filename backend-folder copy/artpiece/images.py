@@ -0,0 +1,97 @@
+import io
+import posixpath
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+from base.models import ArtPiece
+
+# Resized copies of uploaded art piece photos.
+#
+# Browsers were downloading the full-size original for every product card. When an image is uploaded we now
+# also save a few smaller versions of it, in both JPEG and WebP, next to the original:
+#   art_pieces/vase.jpg  ->  art_pieces/derivatives/vase_thumb.jpg, art_pieces/derivatives/vase_thumb.webp, ...
+# The names are worked out from the original's name, so the serializer can build their URLs. Once they've all
+# been saved, the original's name is stored in art_piece.derivatives_source; until then (an image from before
+# derivatives existed, or a new one whose background job hasn't run yet) the serializer offers no variants.
+
+# name -> longest side in pixels (images are never scaled up)
+VARIANTS = {
+    'thumb': 160,
+    'card': 480,
+    'full': 1600,
+}
+
+FORMATS = {
+    'jpeg': {'format': 'JPEG', 'extension': 'jpg', 'options': {'quality': 82, 'optimize': True, 'progressive': True}},
+    'webp': {'format': 'WEBP', 'extension': 'webp', 'options': {'quality': 80, 'method': 4}},
+}
+
+DERIVATIVES_DIR = 'derivatives'
+
+
+def derivative_name(original_name, variant, image_format):
+    directory, filename = posixpath.split(original_name)
+    stem = posixpath.splitext(filename)[0]
+    extension = FORMATS[image_format]['extension']
+    return posixpath.join(directory, DERIVATIVES_DIR, f'{stem}_{variant}.{extension}')
+
+
+def derivative_names(original_name):
+    return {
+        variant: {image_format: derivative_name(original_name, variant, image_format) for image_format in FORMATS}
+        for variant in VARIANTS
+    }
+
+
+def _encode(image, image_format):
+    spec = FORMATS[image_format]
+    if spec['format'] == 'JPEG' and image.mode != 'RGB':
+        image = image.convert('RGB')  # JPEG has no alpha channel
+    buffer = io.BytesIO()
+    image.save(buffer, spec['format'], **spec['options'])
+    return buffer.getvalue()
+
+
+# Reads the art piece's original image and saves every variant/format to storage.
+# Returns {variant: {format: stored name}}.
+def generate_derivatives(art_piece, storage=None):
+    storage = storage or art_piece.image.storage
+    original_name = art_piece.image.name
+
+    with storage.open(original_name, 'rb') as original:
+        source = Image.open(original)
+        source = ImageOps.exif_transpose(source)  # respect the camera's rotation flag
+        if source.mode not in ('RGB', 'RGBA'):
+            source = source.convert('RGBA' if 'A' in source.getbands() else 'RGB')
+        source.load()
+
+    names = derivative_names(original_name)
+    for variant, max_side in VARIANTS.items():
+        resized = source.copy()
+        resized.thumbnail((max_side, max_side), Image.LANCZOS)
+        for image_format, name in names[variant].items():
+            if storage.exists(name):
+                storage.delete(name)  # regenerating: replace rather than getting a renamed copy
+            storage.save(name, ContentFile(_encode(resized, image_format)))
+
+    art_piece.derivatives_source = original_name
+    ArtPiece.objects.filter(pk=art_piece.pk).update(derivatives_source=original_name)
+    return names
+
+
+def has_derivatives(art_piece):
+    return bool(art_piece.image) and art_piece.derivatives_source == art_piece.image.name
+
+
+# {variant: {'jpeg': url, 'webp': url, 'width': max side}} for an image name, without touching storage
+def derivative_urls(image_field):
+    variants = {}
+    for variant, names in derivative_names(image_field.name).items():
+        variants[variant] = {image_format: image_field.storage.url(name) for image_format, name in names.items()}
+        variants[variant]['width'] = VARIANTS[variant]
+    return variants
+
+
+def srcset(variants, image_format):
+    return ', '.join(f"{urls[image_format]} {urls['width']}w" for urls in variants.values())
@@ -0,0 +1,189 @@
+import csv
+import io
+import json
+import posixpath
+import time
+from urllib.parse import urlsplit
+
+from django.core.cache import cache
+from django.db import IntegrityError, connection, transaction
+
+from base.models import ArtPiece
+from jobs.queue import enqueue_many
+from . import search
+from .cache import bump_catalog_version_on_commit
+from .locations import resolve_location
+from .serializers import ListingImportRowSerializer
+
+# Bulk listing import for sellers with large catalogs.
+#
+# Creating listings one multipart POST at a time costs a Location get_or_create and two saves per piece.
+# Here a CSV or JSON Lines file is read one row at a time (never the whole file), and:
+#   - locations are looked up in the per-process map of normalized county/state keys (locations.py), so
+#     each distinct place is queried at most once; only locations that don't exist yet are inserted
+#   - art pieces are inserted with bulk_create, IMPORT_BATCH_SIZE at a time, each batch in its own transaction,
+#     so a bad row further down doesn't undo what's already imported and no transaction grows huge
+#   - each batch is added to the search index in one go, and images are fetched by background jobs
+#
+# Columns (CSV header or JSON keys): name, type_of_art, price, county, state, and optionally description,
+# stock_amount and image (an http(s) URL, or a file path when run from `manage.py import_listings`).
+#
+# Used by `python manage.py import_listings` and, through a background job, by ListingImportAPIView.
+
+IMPORT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 100  # rows with errors are counted, but only this many are described
+ID_ATTEMPTS = 5  # tries at a free block of ids when the database doesn't return them (see insert_art_pieces)
+
+FORMATS = {'.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl'}
+PROGRESS_TIMEOUT = 24 * 60 * 60  # imports started over HTTP report progress through the cache for a day
+
+
+def format_for(filename):
+    extension = posixpath.splitext(filename.lower())[1]
+    if extension not in FORMATS:
+        raise ValueError(f'Unsupported file type "{extension}", expected .csv or .jsonl')
+    return FORMATS[extension]
+
+
+# Yields (line number, row dict) from a binary file, one row at a time
+def read_rows(binary_file, file_format):
+    text = io.TextIOWrapper(binary_file, encoding='utf-8-sig', newline='')
+    if file_format == 'csv':
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, row
+    else:
+        for line_number, line in enumerate(text, start=1):
+            if line.strip():
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    row = None  # reported as an invalid row by the importer
+                yield line_number, row
+
+
+def is_url(value):
+    return urlsplit(value).scheme in ('http', 'https')
+
+
+class ListingImporter:
+    def __init__(self, seller, batch_size=IMPORT_BATCH_SIZE, allow_local_images=False, progress=None):
+        self.seller = seller
+        self.batch_size = batch_size
+        self.allow_local_images = allow_local_images  # never for files uploaded over HTTP
+        self.progress = progress  # called with the stats after every batch
+        self.stats = {'rows': 0, 'created': 0, 'failed': 0, 'images_queued': 0, 'errors': [], 'seconds': 0}
+
+    def run(self, rows):
+        started = time.monotonic()
+        batch = []
+        for line_number, row in rows:
+            self.stats['rows'] += 1
+            listing = self.clean(line_number, row)
+            if listing:
+                batch.append(listing)
+            if len(batch) >= self.batch_size:
+                self.save_batch(batch)
+                batch = []
+                self.report(started)
+        if batch:
+            self.save_batch(batch)
+        self.report(started)
+        return self.stats
+
+    def report(self, started):
+        self.stats['seconds'] = round(time.monotonic() - started, 3)
+        if self.progress:
+            self.progress(self.stats)
+
+    def fail(self, line_number, message):
+        self.stats['failed'] += 1
+        if len(self.stats['errors']) < MAX_REPORTED_ERRORS:
+            self.stats['errors'].append({'line': line_number, 'error': message})
+
+    # Returns (unsaved ArtPiece, image source) or None if the row is invalid
+    def clean(self, line_number, row):
+        if not isinstance(row, dict):
+            self.fail(line_number, 'Not a JSON object')
+            return None
+        # blank CSV cells count as missing, so optional columns fall back to their defaults
+        serializer = ListingImportRowSerializer(data={
+            key: value for key, value in row.items() if key and value not in ('', None)
+        })
+        if not serializer.is_valid():
+            self.fail(line_number, '; '.join(f'{field}: {" ".join(map(str, errors))}'
+                                             for field, errors in serializer.errors.items()))
+            return None
+
+        data = serializer.validated_data
+        image = data['image']
+        if image and not is_url(image) and not self.allow_local_images:
+            self.fail(line_number, 'image: must be an http(s) URL')
+            return None
+
+        art_piece = ArtPiece(
+            name=data['name'], description=data['description'], type_of_art=data['type_of_art'],
+            price=data['price'], stock_amount=data['stock_amount'],
+            location=resolve_location(data['county'], data['state']), user=self.seller,
+        )
+        return art_piece, image
+
+    def save_batch(self, batch):
+        art_pieces = [art_piece for art_piece, _ in batch]
+        with transaction.atomic():
+            insert_art_pieces(art_pieces)
+            search.index_art_pieces(art_pieces)
+            jobs = enqueue_many('artpiece.import_image', [
+                {'art_id': art_piece.art_id, 'source': image} for art_piece, image in batch if image
+            ])
+            bump_catalog_version_on_commit()
+        self.stats['created'] += len(art_pieces)
+        self.stats['images_queued'] += len(jobs)
+
+
+# The id after the largest one in use, read with a locking read: inside the batch's transaction a plain SELECT
+# would keep seeing the snapshot from the first read (InnoDB's REPEATABLE READ), and every retry below would
+# pick the same ids again. FOR UPDATE reads the latest committed rows, and the lock on the last row (and the
+# gap after it) holds off other inserts at the end of the table until the batch commits.
+def next_free_art_id():
+    largest = ArtPiece.objects.select_for_update().order_by('-art_id').values_list('art_id', flat=True).first()
+    return (largest or 0) + 1
+
+
+# bulk_create, making sure every art piece ends up with its id.
+# MySQL doesn't hand back the ids of a bulk insert, so there the ids are picked up front, like
+# base/synthetic.py does. If something else still inserts an art piece with one of them first, the insert fails
+# on the primary key and is retried with the next free block.
+def insert_art_pieces(art_pieces):
+    if connection.features.can_return_rows_from_bulk_insert:
+        ArtPiece.objects.bulk_create(art_pieces)
+        return
+
+    for attempt in range(ID_ATTEMPTS):
+        first_id = next_free_art_id()
+        for offset, art_piece in enumerate(art_pieces):
+            art_piece.art_id = first_id + offset
+        try:
+            with transaction.atomic():
+                ArtPiece.objects.bulk_create(art_pieces)
+            return
+        except IntegrityError:
+            if attempt == ID_ATTEMPTS - 1:
+                raise
+
+
+def import_listings(binary_file, file_format, seller, **options):
+    return ListingImporter(seller, **options).run(read_rows(binary_file, file_format))
+
+
+def progress_key(import_id):
+    return f'listing-import:{import_id}'
+
+
+def set_progress(import_id, seller_id, status, stats=None):
+    cache.set(progress_key(import_id), {'import_id': import_id, 'seller_id': seller_id, 'status': status, **(stats or {})},
+              PROGRESS_TIMEOUT)
+
+
+def get_progress(import_id):
+    return cache.get(progress_key(import_id))
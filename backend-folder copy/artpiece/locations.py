@@ -0,0 +1,106 @@
+import time
+import uuid
+
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+
+from base.models import Location, location_key
+
+# Turning a county/state typed in by a seller into a Location row.
+#
+# This used to be get_or_create(county__iexact=..., state__iexact=...): a case-insensitive scan of the
+# location table for every new listing, and two listings for a new place at the same moment could both
+# insert it. Now every location has a normalized location_key with a unique index, and each process
+# keeps a dict of key -> Location, so resolving a place we've seen before is a dict lookup.
+#
+# A location inserted here goes into this process's dict once it's committed; other processes find it
+# with one indexed query the first time they need it. When locations are merged or deleted
+# (consolidate_locations) every process's dict is thrown away: LOCATIONS_VERSION_KEY in the cache gets a
+# new value, and each process checks it before using its dict. The check is itself a cache read (a query,
+# with the database cache), so it's made at most once every LOCATIONS_CHECK_SECONDS rather than for every
+# row of an import; another process can go on using its old dict for that long after a consolidation.
+#
+# That only reaches the other processes if they all use the same cache, which is what settings.CACHES
+# sets up; `manage.py check` warns about a per-process one (base.W001). As a backstop for a cache that
+# loses the key or isn't shared after all, a dict is also thrown away once it's LOCATIONS_MAX_AGE old.
+
+LOCATIONS_VERSION_KEY = 'locations:version'
+LOCATIONS_CHECK_SECONDS = 5
+LOCATIONS_MAX_AGE = 10 * 60  # seconds
+
+
+def tidy(value):
+    return ' '.join(value.split())
+
+
+# Call after merging or deleting locations. A new random version rather than a counter, so it can't come
+# back round to a value some process still has (e.g. after the key was evicted and started again from 1).
+def forget_locations():
+    _locations.clear()
+    cache.set(LOCATIONS_VERSION_KEY, uuid.uuid4().hex, None)
+
+
+class LocationMap:
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.locations = {}
+        self.version = None
+        self.loaded_at = time.monotonic()
+        self.checked_at = None  # the version is read again before the next lookup
+
+    def check_version(self):
+        now = time.monotonic()
+        if self.checked_at is not None and now - self.checked_at < LOCATIONS_CHECK_SECONDS:
+            return
+        version = cache.get(LOCATIONS_VERSION_KEY)
+        if version != self.version or now - self.loaded_at > LOCATIONS_MAX_AGE:
+            self.clear()
+            self.version = version
+        self.checked_at = now
+
+    def get(self, county, state):
+        self.check_version()
+
+        key = location_key(county, state)
+        location = self.locations.get(key)
+        if location is None:
+            location, created = self.load(key, county, state)
+            if created:
+                # only remembered once it's committed, so a rolled back insert can't leave a location
+                # that doesn't exist in the dict
+                transaction.on_commit(lambda: self.locations.__setitem__(key, location))
+            else:
+                self.locations[key] = location
+        return location
+
+    # (location, whether this call inserted or claimed it)
+    def load(self, key, county, state):
+        location = Location.objects.filter(location_key=key).first()
+        if location is not None:
+            return location, False
+
+        # rows from before location_key existed, until consolidate_locations has run
+        legacy = Location.objects.filter(
+            location_key__isnull=True, county__iexact=tidy(county), state__iexact=tidy(state),
+        ).order_by('location_id').first()
+        try:
+            with transaction.atomic():
+                if legacy is not None:
+                    legacy.save(update_fields=['location_key'])
+                    location = legacy
+                else:
+                    location = Location.objects.create(county=tidy(county), state=tidy(state))
+        except IntegrityError:
+            # another request inserted the same place first; use theirs
+            return Location.objects.get(location_key=key), False
+        return location, True
+
+
+_locations = LocationMap()
+
+
+# The Location for a county/state, created if it doesn't exist yet
+def resolve_location(county, state):
+    return _locations.get(county, state)
@@ -0,0 +1,48 @@
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from artpiece.cache import bump_catalog_version_on_commit
+from artpiece.locations import forget_locations
+from base.models import ArtPiece, Location, location_key
+
+
+class Command(BaseCommand):
+    help = ('Merges locations that only differ by case or spacing ("Marin, CA" and "marin , ca"), moving their '
+            'art pieces to the oldest one, and fills in location_key. Run once after migrating base to 0004.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be merged.')
+
+    def handle(self, *args, **options):
+        groups = defaultdict(list)
+        for location in Location.objects.order_by('location_id'):
+            groups[location_key(location.county, location.state)].append(location)
+
+        merged = moved = keyed = 0
+        with transaction.atomic():
+            for key, (keep, *duplicates) in groups.items():
+                if duplicates:
+                    duplicate_ids = [location.location_id for location in duplicates]
+                    self.stdout.write(f'{keep.county}, {keep.state} (#{keep.location_id}) <- '
+                                      + ', '.join(f'#{location_id}' for location_id in duplicate_ids))
+                    if not options['dry_run']:
+                        moved += ArtPiece.objects.filter(location_id__in=duplicate_ids) \
+                            .update(location_id=keep.location_id)
+                        Location.objects.filter(location_id__in=duplicate_ids).delete()
+                    merged += len(duplicates)
+                if keep.location_key != key:
+                    # after the duplicates are gone, so this can't clash with one of their keys
+                    if not options['dry_run']:
+                        Location.objects.filter(location_id=keep.location_id).update(location_key=key)
+                    keyed += 1
+
+            if not options['dry_run'] and (merged or keyed):
+                transaction.on_commit(forget_locations)
+                bump_catalog_version_on_commit()  # cached listings may show a merged location
+
+        prefix = 'Would merge' if options['dry_run'] else 'Merged'
+        self.stdout.write(self.style.SUCCESS(
+            f'{prefix} {merged} duplicate locations ({moved} art pieces moved), {keyed} keys filled in'
+        ))
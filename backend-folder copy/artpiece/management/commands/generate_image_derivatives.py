@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from artpiece.images import generate_derivatives
+from base.models import ArtPiece
+
+
+class Command(BaseCommand):
+    help = 'Generates the resized JPEG/WebP copies for art piece images uploaded before derivatives existed.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--art-id', type=int, action='append', dest='art_ids',
+                            help='Only process these art pieces (can be repeated).')
+
+    def handle(self, *args, **options):
+        art_pieces = ArtPiece.objects.exclude(image='').exclude(image__isnull=True).order_by('art_id')
+        if options['art_ids']:
+            art_pieces = art_pieces.filter(art_id__in=options['art_ids'])
+
+        done = failed = 0
+        for art_piece in art_pieces.iterator():
+            try:
+                generate_derivatives(art_piece)
+                done += 1
+            except Exception as e:
+                failed += 1
+                self.stderr.write(f'Art piece {art_piece.art_id}: {e}')
+        self.stdout.write(self.style.SUCCESS(f'Generated derivatives for {done} art pieces ({failed} failed)'))
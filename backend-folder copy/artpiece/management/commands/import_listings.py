@@ -0,0 +1,57 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from artpiece import imports
+from base.models import Users
+
+
+class Command(BaseCommand):
+    help = 'Imports listings for one seller from a CSV or JSON Lines file (see artpiece/imports.py for the columns).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or JSONL file of listings')
+        parser.add_argument('--seller', type=int, required=True, help='user_id of the seller the listings belong to')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='default: worked out from the file extension')
+        parser.add_argument('--batch-size', type=int, default=imports.IMPORT_BATCH_SIZE)
+        parser.add_argument('--image-root', default=None,
+                            help='directory that relative image paths in the file are relative to '
+                                 '(default: the directory the file is in)')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        try:
+            seller = Users.objects.get(user_id=options['seller'])
+        except Users.DoesNotExist:
+            raise CommandError(f'No user with user_id {options["seller"]}')
+        try:
+            file_format = options['format'] or imports.format_for(path)
+        except ValueError as e:
+            raise CommandError(str(e))
+        image_root = os.path.abspath(options['image_root'] or os.path.dirname(path))
+
+        def progress(stats):
+            rate = stats['rows'] / stats['seconds'] if stats['seconds'] else 0
+            self.stdout.write(f"{stats['rows']} rows: {stats['created']} created, {stats['failed']} failed "
+                              f"({rate:.0f} rows/s)")
+
+        with open(path, 'rb') as listings_file:
+            rows = (
+                (line_number, self.resolve_image(row, image_root))
+                for line_number, row in imports.read_rows(listings_file, file_format)
+            )
+            stats = imports.ListingImporter(seller, batch_size=options['batch_size'], allow_local_images=True,
+                                            progress=progress).run(rows)
+
+        for error in stats['errors']:
+            self.stderr.write(f"line {error['line']}: {error['error']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {stats['created']} listings ({stats['failed']} rows failed, "
+            f"{stats['images_queued']} images queued) in {stats['seconds']:.1f}s"
+        ))
+
+    # the background job that fetches the image needs an absolute path
+    def resolve_image(self, row, image_root):
+        if isinstance(row, dict) and row.get('image') and not imports.is_url(row['image']):
+            row['image'] = os.path.join(image_root, row['image'])
+        return row
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from artpiece.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the art piece full-text search index from the art_piece table.'
+
+    def handle(self, *args, **options):
+        indexed = rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f'Indexed {indexed} art pieces'))
@@ -0,0 +1,27 @@
+from django.db import migrations
+
+
+# Creates the full-text search table used by artpiece/search.py.
+# The SQL depends on the database (FULLTEXT index on MySQL, FTS5 virtual table on SQLite),
+# so the search backend for the current connection decides what to create.
+def create_search_table(apps, schema_editor):
+    from artpiece.search import get_backend
+
+    with schema_editor.connection.cursor() as cursor:
+        get_backend(schema_editor.connection).create_table(cursor)
+
+
+def drop_search_table(apps, schema_editor):
+    from artpiece.search import get_backend
+
+    with schema_editor.connection.cursor() as cursor:
+        get_backend(schema_editor.connection).drop_table(cursor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = []
+
+    operations = [
+        migrations.RunPython(create_search_table, drop_search_table),
+    ]
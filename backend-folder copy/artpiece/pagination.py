@@ -0,0 +1,65 @@
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination
+
+
+# Keyset (cursor) pagination for the catalog.
+# Instead of LIMIT/OFFSET (which gets slower the deeper you page) each page is fetched with
+# "WHERE art_id > <last seen id> ORDER BY art_id LIMIT n", which uses the primary key index,
+# so every page costs the same no matter how big the art_piece table gets.
+# The next/previous links carry an opaque, base64-encoded cursor instead of a page number.
+class ArtPieceCursorPagination(CursorPagination):
+    page_size = 24  # default number of art pieces per page
+    page_size_query_param = 'page_size'  # lets the frontend ask for ?page_size=48
+    max_page_size = 100  # upper bound so a client can't ask for the whole table again
+    cursor_query_param = 'cursor'
+
+    # art_id is unique and never changes, so the ordering is stable across pages.
+    # "-art_id" gives newest listings first.
+    ordering = 'art_id'
+    ordering_options = ('art_id', '-art_id')
+
+    def get_ordering(self, request, queryset, view):
+        # allow ?ordering=-art_id but only on unique, indexed columns so the cursor stays correct;
+        # anything else is a 400 rather than a silently different order
+        ordering = request.query_params.get('ordering')
+        if ordering is None:
+            return (self.ordering,)
+        if ordering not in self.ordering_options:
+            raise ValidationError({'ordering': [f'Must be one of: {", ".join(self.ordering_options)}.']})
+        return (ordering,)
+
+    # Same as paginate_queryset, but the page is fetched with the async ORM (see async_views.py).
+    # A copy of DRF's logic trimmed down for orderings on a single unique column, which is all we allow,
+    # so the next/previous cursors it produces are the same ones the sync view hands out.
+    async def apaginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        offset, reverse, current_position = self.cursor or (0, False, None)
+
+        order = self.ordering[0]
+        field = order.lstrip('-')
+        descending = order.startswith('-') != reverse
+        queryset = queryset.order_by(f'-{field}' if descending else field)
+        if current_position is not None:
+            queryset = queryset.filter(**{f'{field}__lt' if descending else f'{field}__gt': current_position})
+
+        # one extra row tells us whether there's another page after this one
+        results = [item async for item in queryset[offset:offset + self.page_size + 1]]
+        self.page = results[:self.page_size]
+        following_position = (
+            self._get_position_from_instance(results[-1], self.ordering) if len(results) > len(self.page) else None
+        )
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = current_position is not None or offset > 0
+            self.has_previous = following_position is not None
+            self.next_position, self.previous_position = current_position, following_position
+        else:
+            self.has_next = following_position is not None
+            self.has_previous = current_position is not None or offset > 0
+            self.next_position, self.previous_position = following_position, current_position
+        return self.page
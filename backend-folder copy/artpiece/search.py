@@ -0,0 +1,319 @@
+import re
+from collections import defaultdict
+
+from django.db import DEFAULT_DB_ALIAS, connection
+from django.db.models.expressions import RawSQL
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from base.models import ArtPiece, Users
+
+# Full-text search for art pieces.
+#
+# Searching with chained __icontains lookups turns into LIKE '%word%' on several columns, which can't use an
+# index and scans the whole art_piece table on every keystroke. Instead we keep one text "document" per art
+# piece (name, description, type, county/state and seller name) in a separate full-text indexed table:
+#   - MySQL (production): a regular table with a FULLTEXT index, queried with MATCH ... AGAINST
+#   - SQLite (local/tests): an FTS5 virtual table, ranked with bm25
+#   - anything else: a small in-process inverted index (only meant for local runs)
+#
+# The index follows every save and delete of an art piece, and every change to a seller's name (the signal
+# receivers at the bottom). bulk_create sends no signals, so the listing import calls index_art_pieces itself.
+# It can be rebuilt from scratch with `python manage.py rebuild_search_index`.
+
+SEARCH_TABLE = 'art_piece_search'
+MAX_RESULTS = 1000  # upper bound on ranked matches (the /search/ endpoint); the catalog filter has no limit
+REBUILD_BATCH_SIZE = 1000
+
+# the fields build_document reads; saves that change none of them (e.g. the image) leave the index alone
+ART_PIECE_FIELDS = {'name', 'description', 'type_of_art', 'location', 'location_id', 'user', 'user_id'}
+SELLER_FIELDS = {'first_name', 'last_name', 'username'}
+
+# InnoDB's built-in stopword list (INFORMATION_SCHEMA.INNODB_FT_DEFAULT_STOPWORD)
+INNODB_DEFAULT_STOPWORDS = {
+    'a', 'about', 'an', 'are', 'as', 'at', 'be', 'by', 'com', 'de', 'en', 'for', 'from', 'how', 'i', 'in', 'is',
+    'it', 'la', 'of', 'on', 'or', 'that', 'the', 'this', 'to', 'was', 'what', 'when', 'where', 'who', 'will',
+    'with', 'und', 'www',
+}
+
+_word_re = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(text):
+    return [word.lower() for word in _word_re.findall(text or '')]
+
+
+# the searchable text for one art piece (expects user and location to be loaded already)
+def build_document(art_piece):
+    parts = [
+        art_piece.name,
+        art_piece.description,
+        art_piece.type_of_art,
+        art_piece.location.county,
+        art_piece.location.state,
+        art_piece.user.first_name,
+        art_piece.user.last_name,
+        art_piece.user.username,
+    ]
+    return ' '.join(part for part in parts if part)
+
+
+class MySQLFullTextBackend:
+    def __init__(self):
+        self.min_token_size = None  # read from the server the first time a query is built
+        self.stopwords = None
+
+    def create_table(self, cursor):
+        cursor.execute(
+            f'CREATE TABLE IF NOT EXISTS {SEARCH_TABLE} ('
+            '  art_id INT NOT NULL PRIMARY KEY,'
+            '  document TEXT NOT NULL,'
+            f'  FULLTEXT KEY {SEARCH_TABLE}_document (document)'
+            ') ENGINE=InnoDB'
+        )
+
+    def drop_table(self, cursor):
+        cursor.execute(f'DROP TABLE IF EXISTS {SEARCH_TABLE}')
+
+    def index(self, rows):
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {SEARCH_TABLE} (art_id, document) VALUES (%s, %s) '
+                'ON DUPLICATE KEY UPDATE document = VALUES(document)',
+                rows,
+            )
+
+    def remove(self, art_ids):
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {SEARCH_TABLE} WHERE art_id = %s', [(art_id,) for art_id in art_ids])
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+
+    # InnoDB leaves stopwords and words shorter than innodb_ft_min_token_size out of the index, so a required
+    # term like that would make the whole query match nothing; they're dropped instead
+    def usable_terms(self, terms):
+        if self.min_token_size is None:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT @@innodb_ft_min_token_size, @@innodb_ft_enable_stopword')
+                min_token_size, stopwords_enabled = cursor.fetchone()
+            self.stopwords = INNODB_DEFAULT_STOPWORDS if stopwords_enabled else set()
+            self.min_token_size = min_token_size
+        return [term for term in terms if len(term) >= self.min_token_size and term not in self.stopwords]
+
+    # boolean mode: every word is required (+) and may be a prefix (*), so "sculp" finds "sculpture"
+    def match_query(self, terms):
+        return ' '.join(f'+{term}*' for term in terms)
+
+    def matching(self, terms):
+        return RawSQL(f'SELECT art_id FROM {SEARCH_TABLE} WHERE MATCH(document) AGAINST (%s IN BOOLEAN MODE)',
+                      [self.match_query(terms)])
+
+    def search(self, terms, limit):
+        query = self.match_query(terms)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT art_id FROM {SEARCH_TABLE} '
+                'WHERE MATCH(document) AGAINST (%s IN BOOLEAN MODE) '
+                'ORDER BY MATCH(document) AGAINST (%s IN BOOLEAN MODE) DESC, art_id '
+                'LIMIT %s',
+                [query, query, limit],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+class SQLiteFTS5Backend:
+    # the art_id is stored as the FTS rowid, so updates and deletes are primary key lookups
+    def create_table(self, cursor):
+        cursor.execute(f'CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5(document)')
+
+    def drop_table(self, cursor):
+        cursor.execute(f'DROP TABLE IF EXISTS {SEARCH_TABLE}')
+
+    def usable_terms(self, terms):
+        return terms  # FTS5 indexes every word
+
+    def index(self, rows):
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s', [(art_id,) for art_id, _ in rows])
+            cursor.executemany(f'INSERT INTO {SEARCH_TABLE} (rowid, document) VALUES (%s, %s)', rows)
+
+    def remove(self, art_ids):
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s', [(art_id,) for art_id in art_ids])
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+
+    # every word must match, as a prefix; quoting keeps FTS5 operators in user input from being interpreted
+    def match_query(self, terms):
+        return ' '.join(f'"{term}"*' for term in terms)
+
+    def matching(self, terms):
+        return RawSQL(f'SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s', [self.match_query(terms)])
+
+    def search(self, terms, limit):
+        query = self.match_query(terms)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s ORDER BY rank, rowid LIMIT %s',
+                [query, limit],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+class InMemoryBackend:
+    # word -> {art_id: number of times the word appears}. Lives in this process only, so it's
+    # rebuilt from the database the first time it's used. Fine for local runs, not for production.
+    def __init__(self):
+        self.postings = None
+
+    def create_table(self, cursor):
+        pass
+
+    def drop_table(self, cursor):
+        pass
+
+    def usable_terms(self, terms):
+        return terms
+
+    def _load(self):
+        if self.postings is None:
+            self.postings = defaultdict(dict)
+            for art_piece in ArtPiece.objects.select_related('user', 'location').iterator():
+                self._add(art_piece.art_id, build_document(art_piece))
+
+    def _add(self, art_id, document):
+        for word in tokenize(document):
+            self.postings[word][art_id] = self.postings[word].get(art_id, 0) + 1
+
+    def index(self, rows):
+        self._load()
+        self.remove([art_id for art_id, _ in rows])
+        for art_id, document in rows:
+            self._add(art_id, document)
+
+    def remove(self, art_ids):
+        self._load()
+        for postings in self.postings.values():
+            for art_id in art_ids:
+                postings.pop(art_id, None)
+
+    def clear(self):
+        self.postings = defaultdict(dict)
+
+    def matching(self, terms):
+        return self.search(terms, None)
+
+    def search(self, terms, limit):
+        self._load()
+        scores = None
+        for term in terms:
+            # prefix match, like the database backends
+            term_scores = defaultdict(int)
+            for word, postings in self.postings.items():
+                if word.startswith(term):
+                    for art_id, hits in postings.items():
+                        term_scores[art_id] += hits
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {art_id: scores[art_id] + hits for art_id, hits in term_scores.items() if art_id in scores}
+        ranked = sorted((scores or {}).items(), key=lambda item: (-item[1], item[0]))
+        return [art_id for art_id, _ in ranked[:limit]]
+
+
+_backends = {}
+
+
+def get_backend(using=None):
+    vendor = (using or connection).vendor
+    if vendor not in _backends:
+        if vendor == 'mysql':
+            _backends[vendor] = MySQLFullTextBackend()
+        elif vendor == 'sqlite':
+            _backends[vendor] = SQLiteFTS5Backend()
+        else:
+            _backends[vendor] = InMemoryBackend()
+    return _backends[vendor]
+
+
+# the words of query the index can look up; a query without any (blank, or only stopwords on MySQL) searches nothing
+def search_terms(query):
+    return get_backend().usable_terms(tokenize(query))
+
+
+def search_art_ids(query, limit=MAX_RESULTS):
+    # ids of the matching art pieces, best match first
+    terms = search_terms(query)
+    if not terms:
+        return []
+    return get_backend().search(terms, min(limit, MAX_RESULTS))
+
+
+# Every matching art piece, unranked and without a limit, for filtering a queryset with art_id__in:
+# a subquery on the index table for the database backends, a list of ids for the in-process one
+def matching_art_ids(query):
+    terms = search_terms(query)
+    if not terms:
+        return []
+    return get_backend().matching(terms)
+
+
+def index_art_piece(art_piece):
+    index_art_pieces([art_piece])
+
+
+# several at once (e.g. a batch from a bulk import); user and location must already be loaded
+def index_art_pieces(art_pieces):
+    get_backend().index([(art_piece.art_id, build_document(art_piece)) for art_piece in art_pieces])
+
+
+def remove_art_piece(art_id):
+    get_backend().remove([art_id])
+
+
+def rebuild_index(queryset=None):
+    get_backend().clear()
+    return reindex(queryset if queryset is not None else ArtPiece.objects.all())
+
+
+# (re)indexes the art pieces in queryset, in batches. Returns how many there were.
+def reindex(queryset):
+    backend = get_backend()
+    batch = []
+    indexed = 0
+    for art_piece in queryset.select_related('user', 'location').iterator(chunk_size=REBUILD_BATCH_SIZE):
+        batch.append((art_piece.art_id, build_document(art_piece)))
+        if len(batch) >= REBUILD_BATCH_SIZE:
+            backend.index(batch)
+            indexed += len(batch)
+            batch = []
+    if batch:
+        backend.index(batch)
+        indexed += len(batch)
+    return indexed
+
+
+# Saves and deletes on the primary only: the replicas get the index table's rows through replication
+@receiver(post_save, sender=ArtPiece, dispatch_uid='search_index_art_piece')
+def art_piece_saved(sender, instance, update_fields=None, using=DEFAULT_DB_ALIAS, **kwargs):
+    if using != DEFAULT_DB_ALIAS or (update_fields is not None and not ART_PIECE_FIELDS & set(update_fields)):
+        return
+    index_art_piece(instance)  # loads its user and location if they aren't already
+
+
+@receiver(post_delete, sender=ArtPiece, dispatch_uid='search_remove_art_piece')
+def art_piece_deleted(sender, instance, using=DEFAULT_DB_ALIAS, **kwargs):
+    if using == DEFAULT_DB_ALIAS:
+        remove_art_piece(instance.art_id)
+
+
+# the seller's name is part of every one of their art pieces' documents
+@receiver(post_save, sender=Users, dispatch_uid='search_index_seller')
+def seller_saved(sender, instance, created=False, update_fields=None, using=DEFAULT_DB_ALIAS, **kwargs):
+    if created or using != DEFAULT_DB_ALIAS or (update_fields is not None and not SELLER_FIELDS & set(update_fields)):
+        return
+    reindex(ArtPiece.objects.filter(user_id=instance.pk))
@@ -1,20 +1,28 @@
+import logging
+
 from rest_framework import serializers
+from base.metrics import TimedSerializerMixin
 from base.models import ArtPiece, Location, Users
 from users.serializers import UserSerializer  # Assuming you have a UserSerializer
+from .images import derivative_urls, has_derivatives, srcset
+
+logger = logging.getLogger(__name__)
 
 
-class LocationSerializer(serializers.ModelSerializer):
+class LocationSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Location
-        fields = '__all__'
+        fields = ['location_id', 'county', 'state']
 
 
 # ArtPiece Serializer
-class ArtPieceSerializer(serializers.ModelSerializer):
+class ArtPieceSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     location = LocationSerializer(read_only=True)  # show location details when viewing
     user = UserSerializer(read_only=True)  # show user details when viewing
     image = serializers.ImageField(max_length=None, use_url=True, required=False)
     image_url = serializers.SerializerMethodField()
+    image_variants = serializers.SerializerMethodField()  # resized JPEG/WebP copies, see images.py
+    image_srcset = serializers.SerializerMethodField()  # ready to drop into <img srcset> / <source srcset>
     
     # these fields are for creating/updating the ArtPiece
     user_id = serializers.PrimaryKeyRelatedField(
@@ -37,6 +45,8 @@ class ArtPieceSerializer(serializers.ModelSerializer):
             'description',
             'image',
             'image_url',
+            'image_variants',
+            'image_srcset',
             'stock_amount',
             'price',
             'location',
@@ -49,10 +59,34 @@ class ArtPieceSerializer(serializers.ModelSerializer):
         extra_kwargs = {
             'image': {'required': False},
         }
+    def to_representation(self, instance):
+        # image_variants and image_srcset both need the variant URLs; work them out once per art piece
+        self._variants = derivative_urls(instance.image) if has_derivatives(instance) else None
+        return super().to_representation(instance)
+
     def get_image_url(self, obj):
-        if obj.image and hasattr(obj.image, 'url'):
-            # Add print statement to debug
+        if obj.image:
             url = obj.image.url
-            print(f"Generated image URL: {url}")
+            logger.debug('Generated image URL: %s', url)
             return url
-        return None
\ No newline at end of file
+        return None
+
+    def get_image_variants(self, obj):
+        return self._variants
+
+    def get_image_srcset(self, obj):
+        if not self._variants:
+            return None
+        return {'jpeg': srcset(self._variants, 'jpeg'), 'webp': srcset(self._variants, 'webp')}
+
+
+# One row of a bulk listing import (see imports.py). The limits match the art_piece and location columns.
+class ListingImportRowSerializer(serializers.Serializer):
+    name = serializers.CharField(max_length=255)
+    description = serializers.CharField(required=False, allow_blank=True, default='')
+    type_of_art = serializers.CharField(max_length=255)
+    price = serializers.DecimalField(max_digits=5, decimal_places=2, min_value=0)
+    stock_amount = serializers.IntegerField(min_value=0, required=False, default=0)
+    county = serializers.CharField(max_length=45)
+    state = serializers.CharField(max_length=45)
+    image = serializers.CharField(required=False, allow_blank=True, default='')  # a URL, or a file path for the command
@@ -0,0 +1,94 @@
+import io
+import posixpath
+from urllib.parse import urlsplit
+
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.conf import settings
+from PIL import Image
+
+from base.models import ArtPiece, Users
+from jobs.queue import task
+from .cache import bump_catalog_version_on_commit
+from .downloads import fetch
+from .images import generate_derivatives
+from . import imports
+
+# Background jobs for art pieces, run by `python manage.py run_jobs` (see jobs/queue.py)
+
+
+# where uploaded images wait until the worker sends them to S3
+def pending_upload_storage():
+    return FileSystemStorage(location=settings.PENDING_UPLOAD_ROOT)
+
+
+# Moves an image that came in with ArtPieceCreateAPIView from local disk to S3, then makes the resized copies.
+# The S3 key is the pending path (art id, upload id, file name) under art_pieces/, so a retry overwrites what an
+# earlier attempt uploaded instead of leaving it behind under a renamed key. (filename is only there for jobs
+# queued before that.)
+@task('artpiece.attach_image')
+def attach_image(art_id, path, filename):
+    storage = pending_upload_storage()
+    art_piece = ArtPiece.objects.get(art_id=art_id)
+    image_storage = art_piece.image.storage
+    name = posixpath.join('art_pieces', path)
+    if image_storage.exists(name):
+        image_storage.delete(name)  # from an attempt that failed after uploading it
+    with storage.open(path, 'rb') as image_file:
+        art_piece.image.name = image_storage.save(name, File(image_file))
+    art_piece.save(update_fields=['image'])
+    generate_derivatives(art_piece)
+    storage.delete(path)
+    bump_catalog_version_on_commit()
+
+
+@task('artpiece.generate_derivatives')
+def generate_image_derivatives(art_id):
+    art_piece = ArtPiece.objects.get(art_id=art_id)
+    generate_derivatives(art_piece)
+    bump_catalog_version_on_commit()
+
+
+# Fetches the image named in a bulk import row (an http(s) URL, or a local path from the management command).
+# URLs come from the uploaded file, so they're only fetched from public addresses (see downloads.py).
+@task('artpiece.import_image')
+def import_image(art_id, source):
+    if imports.is_url(source):
+        data = fetch(source, settings.ART_IMAGE_MAX_UPLOAD_BYTES)
+        filename = posixpath.basename(urlsplit(source).path)
+    else:
+        with open(source, 'rb') as image_file:
+            data = image_file.read(settings.ART_IMAGE_MAX_UPLOAD_BYTES + 1)
+        filename = posixpath.basename(source)
+    if len(data) > settings.ART_IMAGE_MAX_UPLOAD_BYTES:
+        raise ValueError(f'Image for art piece {art_id} is too large')
+    Image.open(io.BytesIO(data)).verify()  # don't store something that isn't an image
+
+    art_piece = ArtPiece.objects.get(art_id=art_id)
+    art_piece.image.save(filename or f'{art_id}.jpg', ContentFile(data), save=False)
+    art_piece.save(update_fields=['image'])
+    generate_derivatives(art_piece)
+    bump_catalog_version_on_commit()
+
+
+# Runs an import file uploaded to ListingImportAPIView. Not atomic: the importer commits batch by batch.
+@task('artpiece.import_listings', atomic=False)
+def import_listings(path, file_format, seller_id, import_id):
+    storage = pending_upload_storage()
+    stats = {}
+
+    def progress(current):
+        stats.update(current)
+        imports.set_progress(import_id, seller_id, 'running', stats)
+
+    try:
+        seller = Users.objects.get(user_id=seller_id)
+        with storage.open(path, 'rb') as listings_file:
+            imports.import_listings(listings_file, file_format, seller, progress=progress)
+        imports.set_progress(import_id, seller_id, 'done', stats)
+    except Exception:
+        imports.set_progress(import_id, seller_id, 'failed', stats)
+        raise
+    finally:
+        storage.delete(path)
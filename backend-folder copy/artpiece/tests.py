@@ -0,0 +1,792 @@
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.storage import FileSystemStorage
+from django.db import DatabaseError, IntegrityError, connection, transaction
+from django.test import AsyncClient, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from moto import mock_aws
+from PIL import Image
+
+from artpiece import downloads, images, imports, search, tasks
+from artpiece.locations import (
+    LOCATIONS_CHECK_SECONDS, LOCATIONS_MAX_AGE, LocationMap, forget_locations, resolve_location,
+)
+from artpiece.cache import bump_catalog_version
+from artpiece.serializers import ArtPieceSerializer
+from base.models import ArtPiece, Location
+from jobs.models import Job
+from base.testing import log_in, make_art_piece, make_location, make_user
+from jobs.queue import run_pending
+from myproject.storage_backends import MediaStorage
+
+
+class ArtPieceQueryCountTests(TestCase):
+    # The nested user/location serializers used to cost 2 queries per art piece.
+    # These tests check the number of queries stays the same no matter how many rows there are.
+
+    def setUp(self):
+        self.seller = make_user()
+        self.location = make_location()
+
+    def add_pieces(self, how_many):
+        for _ in range(how_many):
+            # a seller + location per piece so nothing is served from a shared related-object cache
+            make_art_piece(make_user(), make_location())
+            make_art_piece(self.seller, self.location)
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_list_query_count_is_constant(self):
+        self.add_pieces(2)
+        small = self.count_queries('/base/artpieces/')
+        self.add_pieces(10)
+        self.assertEqual(self.count_queries('/base/artpieces/'), small)
+
+    def test_seller_list_query_count_is_constant(self):
+        url = f'/base/artpieces/{self.seller.user_id}/art/'
+        self.add_pieces(2)
+        small = self.count_queries(url)
+        self.add_pieces(10)
+        self.assertEqual(self.count_queries(url), small)
+
+    def test_detail_is_a_single_query(self):
+        piece = make_art_piece(self.seller, self.location)
+        self.assertEqual(self.count_queries(f'/base/artpieces/{piece.art_id}/'), 1)
+
+
+
+class ArtPieceCursorPaginationTests(TestCase):
+
+    def setUp(self):
+        self.seller = make_user()
+        self.location = make_location()
+        self.pieces = [make_art_piece(self.seller, self.location) for _ in range(5)]
+
+    def page(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        return [piece['art_id'] for piece in data['results']], data['next']
+
+    def test_cursor_is_stable_across_inserts(self):
+        ids = [piece.art_id for piece in self.pieces]
+        first, next_url = self.page('/base/artpieces/?page_size=2')
+        self.assertEqual(first, ids[:2])
+        newer = make_art_piece(self.seller, self.location)
+        second, next_url = self.page(next_url)
+        third, next_url = self.page(next_url)
+        self.assertEqual(second + third, ids[2:] + [newer.art_id])  # no repeats, nothing skipped
+        self.assertIsNone(next_url)
+
+        # newest first: pieces listed after the first page was read don't shift the pages after it
+        first, next_url = self.page('/base/artpieces/?page_size=2&ordering=-art_id')
+        make_art_piece(self.seller, self.location)
+        second, next_url = self.page(next_url)
+        self.assertEqual(first + second, [newer.art_id] + ids[::-1][:3])
+
+    def test_page_size_is_capped(self):
+        ArtPiece.objects.bulk_create([
+            ArtPiece(name=f'Bulk {n}', type_of_art='Painting', stock_amount=1, price=10, user=self.seller,
+                     location=self.location) for n in range(100)
+        ])
+        self.assertEqual(len(self.page('/base/artpieces/?page_size=500')[0]), 100)
+        self.assertEqual(len(self.page('/base/artpieces/')[0]), 24)
+
+    def test_invalid_ordering_is_rejected(self):
+        for ordering in ['price', 'name', '-stock_amount', '']:
+            response = self.client.get(f'/base/artpieces/?ordering={ordering}')
+            self.assertEqual(response.status_code, 400, ordering)
+            self.assertIn('ordering', response.json())
+        self.assertEqual(self.client.get('/base/artpieces/async/?ordering=price').status_code, 400)
+        self.assertEqual(self.page('/base/artpieces/?ordering=-art_id')[0][0], self.pieces[-1].art_id)
+
+class ArtPieceFilterTests(TestCase):
+
+    def setUp(self):
+        self.seller = make_user()
+        self.other_seller = make_user()
+        self.marin = make_location(county='Marin', state='CA')
+        self.king = make_location(county='King', state='WA')
+        self.painting = make_art_piece(self.seller, self.marin, type_of_art='Painting', price='20.00')
+        self.vase = make_art_piece(self.seller, self.king, type_of_art='Pottery', price='80.00', name='Blue vase')
+        self.carving = make_art_piece(self.other_seller, self.king, type_of_art='Woodwork', price='150.00', stock_amount=0)
+        search.rebuild_index()
+
+    def get_ids(self, query):
+        response = self.client.get(f'/base/artpieces/?{query}')
+        self.assertEqual(response.status_code, 200)
+        return {piece['art_id'] for piece in response.data['results']}
+
+    def test_type_of_art_in_list(self):
+        self.assertEqual(self.get_ids('type_of_art=Painting,Pottery'), {self.painting.art_id, self.vase.art_id})
+
+    def test_location_and_state(self):
+        self.assertEqual(self.get_ids(f'location={self.marin.location_id}'), {self.painting.art_id})
+        self.assertEqual(self.get_ids('state=wa'), {self.vase.art_id, self.carving.art_id})
+
+    def test_seller(self):
+        self.assertEqual(self.get_ids(f'seller={self.other_seller.user_id}'), {self.carving.art_id})
+
+    def test_price_range(self):
+        self.assertEqual(self.get_ids('min_price=50&max_price=100'), {self.vase.art_id})
+
+    def test_in_stock(self):
+        self.assertEqual(self.get_ids('in_stock=true'), {self.painting.art_id, self.vase.art_id})
+
+    def test_search(self):
+        self.assertEqual(self.get_ids('search=vase'), {self.vase.art_id})
+
+
+class ArtPieceSearchTests(TestCase):
+
+    def setUp(self):
+        forget_locations()  # the per-process location map would outlive the rows each test rolls back
+        self.seller = make_user(first_name='Rosa', last_name='Moss')
+        self.location = make_location(county='Mendocino', state='CA')
+        self.redwood = make_art_piece(self.seller, self.location, name='Redwood carving', type_of_art='Woodwork',
+                                      description='Carved from fallen redwood')
+        self.fern = make_art_piece(self.seller, self.location, name='Fern study', type_of_art='Painting',
+                                   description='Watercolor ferns near a redwood grove')
+        search.rebuild_index()
+
+    def search_ids(self, query):
+        response = self.client.get('/base/artpieces/search/', {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return [piece['art_id'] for piece in response.data]
+
+    def test_results_are_ranked(self):
+        self.assertEqual(self.search_ids('redwood'), [self.redwood.art_id, self.fern.art_id])
+
+    def test_prefix_and_related_fields(self):
+        self.assertEqual(self.search_ids('water'), [self.fern.art_id])
+        self.assertEqual(set(self.search_ids('mendocino moss')), {self.redwood.art_id, self.fern.art_id})
+
+    def test_operators_in_input_are_ignored(self):
+        self.assertEqual(self.search_ids('fern"* ('), [self.fern.art_id])
+        self.assertEqual(self.search_ids('   '), [])
+
+    def test_delete_removes_from_index(self):
+        response = self.client.delete(f'/base/artpieces/{self.fern.art_id}/delete/')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.search_ids('fern'), [])
+
+    def test_create_adds_to_index(self):
+        log_in(self.client, self.seller)
+        response = self.client.post('/base/artpieces/create/', {
+            'name': 'Granite heron', 'description': 'Stone bird', 'type_of_art': 'Sculpture',
+            'stock_amount': 1, 'price': '99.00', 'county': 'Mendocino', 'state': 'CA',
+        })
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.search_ids('heron'), [response.data['art_id']])
+
+    def test_edits_are_reindexed(self):
+        self.fern.name = 'Moss study'
+        self.fern.description = 'Watercolor'
+        self.fern.save()
+        self.assertEqual(self.search_ids('fern'), [])
+        self.assertEqual(self.search_ids('study'), [self.fern.art_id])
+
+        self.seller.last_name = 'Lichen'
+        self.seller.save(update_fields=['last_name'])
+        self.assertEqual(set(self.search_ids('lichen')), {self.redwood.art_id, self.fern.art_id})
+
+    def test_saving_other_fields_skips_the_index(self):
+        with mock.patch.object(search, 'get_backend') as get_backend:
+            self.fern.save(update_fields=['image'])
+            self.seller.save(update_fields=['email'])
+        get_backend.assert_not_called()
+
+    def test_mysql_drops_terms_it_does_not_index(self):
+        backend = search.MySQLFullTextBackend()
+        backend.min_token_size, backend.stopwords = 3, search.INNODB_DEFAULT_STOPWORDS
+        terms = backend.usable_terms(search.tokenize('The fern by a redwood'))
+        self.assertEqual(backend.match_query(terms), '+fern* +redwood*')
+        self.assertEqual(backend.usable_terms(['of', 'an']), [])
+
+    def test_catalog_filter_is_not_capped(self):
+        extra = make_art_piece(self.seller, self.location, name='Redwood bowl')
+        with mock.patch.object(search, 'MAX_RESULTS', 2):
+            self.assertEqual(len(self.search_ids('redwood')), 2)
+            response = self.client.get('/base/artpieces/', {'search': 'redwood'})
+            self.assertEqual({piece['art_id'] for piece in response.json()['results']},
+                             {self.redwood.art_id, self.fern.art_id, extra.art_id})
+
+    def test_in_memory_backend_matches_database_backend(self):
+        backend = search.InMemoryBackend()
+        self.assertEqual(backend.search(['redwood'], 10), [self.redwood.art_id, self.fern.art_id])
+        self.assertEqual(backend.search(['fer', 'grove'], 10), [self.fern.art_id])
+        self.assertEqual(set(backend.matching(['redwood'])), {self.redwood.art_id, self.fern.art_id})
+        backend.remove([self.fern.art_id])
+        self.assertEqual(backend.search(['fern'], 10), [])
+
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'catalog-tests'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class CatalogCacheTests(TestCase):
+
+    def setUp(self):
+        forget_locations()
+        cache.clear()
+        self.seller = make_user()
+        self.location = make_location()
+        self.piece = make_art_piece(self.seller, self.location, stock_amount=3)
+
+    def test_repeat_reads_skip_the_database(self):
+        for url in ['/base/artpieces/', f'/base/artpieces/{self.piece.art_id}/', '/base/artpieces/locations/',
+                    '/base/artpieces/async/', f'/base/artpieces/async/{self.piece.art_id}/']:
+            first = self.client.get(url)
+            with CaptureQueriesContext(connection) as queries:
+                second = self.client.get(url)
+            self.assertEqual(len(queries), 0, url)
+            self.assertEqual(first.json(), second.json())
+
+    def test_query_params_are_part_of_the_key(self):
+        make_art_piece(self.seller, self.location, type_of_art='Pottery')
+        self.assertEqual(len(self.client.get('/base/artpieces/').data['results']), 2)
+        self.assertEqual(len(self.client.get('/base/artpieces/?type_of_art=Pottery').data['results']), 1)
+
+    def test_create_and_delete_invalidate(self):
+        self.assertEqual(len(self.client.get('/base/artpieces/').data['results']), 1)
+
+        log_in(self.client, self.seller)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/base/artpieces/create/', {
+                'name': 'New piece', 'type_of_art': 'Painting', 'stock_amount': 1, 'price': '10.00',
+                'county': 'Marin', 'state': 'CA',
+            })
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(self.client.get('/base/artpieces/').data['results']), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f'/base/artpieces/{self.piece.art_id}/delete/')
+        self.assertEqual(self.client.get(f'/base/artpieces/{self.piece.art_id}/').status_code, 404)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class ConditionalGetTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.seller = make_user()
+        self.piece = make_art_piece(self.seller, make_location())
+        self.urls = [
+            '/base/artpieces/', f'/base/artpieces/{self.piece.art_id}/', f'/base/artpieces/{self.seller.user_id}/art/',
+            '/base/artpieces/locations/', '/base/artpieces/async/', f'/base/artpieces/async/{self.piece.art_id}/',
+        ]
+
+    def test_unchanged_catalog_is_a_304_without_queries(self):
+        for url in self.urls:
+            first = self.client.get(url)
+            self.assertEqual(first['Cache-Control'], 'no-cache')
+            with CaptureQueriesContext(connection) as queries:
+                again = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+            self.assertEqual(again.status_code, 304, url)
+            self.assertEqual((again.content, again['ETag']), (b'', first['ETag']))
+            self.assertEqual(len(queries), 0, url)
+
+            since = self.client.get(url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+            self.assertEqual(since.status_code, 304, url)
+
+    def test_etag_changes_with_the_catalog_and_the_url(self):
+        etags = {url: self.client.get(url)['ETag'] for url in self.urls}
+        self.assertEqual(len(set(etags.values())), len(self.urls))
+        self.assertNotEqual(self.client.get('/base/artpieces/?ordering=-art_id')['ETag'], etags['/base/artpieces/'])
+        self.assertNotEqual(self.client.get('/base/artpieces/', HTTP_ACCEPT='text/html')['ETag'],
+                            etags['/base/artpieces/'])
+
+        bump_catalog_version()
+        for url, etag in etags.items():
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200, url)
+            self.assertNotEqual(response['ETag'], etag)
+
+    def test_errors_have_no_etag(self):
+        self.assertFalse(self.client.get('/base/artpieces/999999/').has_header('ETag'))
+        self.assertFalse(self.client.get('/base/artpieces/async/999999/').has_header('ETag'))
+
+
+class AsyncCatalogViewTests(TestCase):
+    # the async views must return exactly what the sync ones do
+
+    def setUp(self):
+        self.seller = make_user()
+        self.marin = make_location(county='Marin', state='CA')
+        self.king = make_location(county='King', state='WA')
+        for i in range(5):
+            make_art_piece(self.seller, self.marin if i % 2 else self.king, type_of_art='Painting', name=f'Fern {i}')
+        make_art_piece(make_user(), self.king, type_of_art='Pottery', name='Blue vase')
+        search.rebuild_index()
+
+    def assertSameResponse(self, path):
+        sync = self.client.get(f'/base/artpieces/{path}')
+        asynchronous = self.client.get(f'/base/artpieces/async/{path}')
+        self.assertEqual(asynchronous.status_code, sync.status_code, path)
+        self.assertEqual(asynchronous.json(), sync.json(), path)
+        return sync
+
+    def assertSamePages(self, query):
+        # follow next links all the way, then previous links all the way back, on both views
+        walks = []
+        for prefix in ['/base/artpieces/', '/base/artpieces/async/']:
+            url, pages = f'{prefix}?{query}', []
+            for direction in ['next', 'previous']:
+                while True:
+                    data = self.client.get(url).json()
+                    pages.append([piece['art_id'] for piece in data['results']])
+                    if not data[direction]:
+                        break
+                    url = data[direction].replace('/base/artpieces/async/', '/base/artpieces/') \
+                        .replace('/base/artpieces/', prefix)
+            walks.append(pages)
+        self.assertEqual(walks[0], walks[1])
+        self.assertGreater(len(walks[0]), 2)
+
+    def test_list_filters_and_search(self):
+        for query in ['', 'type_of_art=Painting', 'county=king&ordering=-art_id', 'search=fern', 'min_price=abc']:
+            self.assertSameResponse(f'?{query}')
+
+    def test_cursor_pages(self):
+        self.assertSamePages('page_size=2')
+        self.assertSamePages('page_size=2&ordering=-art_id')
+        self.assertSameResponse('?cursor=not-a-cursor')
+
+    def test_detail_seller_and_locations(self):
+        piece = ArtPiece.objects.first()
+        for path in [f'{piece.art_id}/', '999999/', f'{self.seller.user_id}/art/', 'locations/']:
+            self.assertSameResponse(path)
+
+    async def test_runs_on_the_async_orm(self):
+        response = await AsyncClient().get('/base/artpieces/async/?page_size=3')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 3)
+        self.assertEqual((await AsyncClient().post('/base/artpieces/async/')).status_code, 405)
+
+
+class ListingImportTests(TestCase):
+
+    CSV = (
+        'name,type_of_art,price,stock_amount,county,state,description,image\n'
+        'Fern print,Painting,20.00,3,marin,ca,Green,\n'
+        'Blue vase,Pottery,45.5,,  King ,WA,,https://example.com/vase.jpg\n'
+        'No price,Painting,,1,Marin,CA,,\n'
+        'Oak bowl,Woodwork,1000,1,King,WA,,\n'
+        'Maple bowl,Woodwork,12,-1,King,WA,,\n'
+    )
+
+    def setUp(self):
+        forget_locations()
+        self.seller = make_user()
+        self.marin = make_location(county='Marin', state='CA')
+
+    def run_import(self, content, file_format='csv', **options):
+        return imports.import_listings(io.BytesIO(content.encode()), file_format, self.seller, **options)
+
+    def test_imports_valid_rows_and_reports_bad_ones(self):
+        stats = self.run_import(self.CSV)
+        self.assertEqual((stats['rows'], stats['created'], stats['failed'], stats['images_queued']), (5, 2, 3, 1))
+        self.assertEqual([error['line'] for error in stats['errors']], [4, 5, 6])
+        self.assertIn('price', stats['errors'][0]['error'])
+
+        fern = ArtPiece.objects.get(name='Fern print')
+        vase = ArtPiece.objects.get(name='Blue vase')
+        self.assertEqual(fern.location_id, self.marin.location_id)  # matched case-insensitively
+        self.assertEqual((vase.location.county, vase.location.state, vase.stock_amount), ('King', 'WA', 0))
+        self.assertEqual(Location.objects.count(), 2)
+        self.assertEqual(search.search_art_ids('vase'), [vase.art_id])
+
+        job = Job.objects.get(name='artpiece.import_image')
+        self.assertEqual(job.payload, {'art_id': vase.art_id, 'source': 'https://example.com/vase.jpg'})
+
+    def test_jsonl_and_local_images_only_when_allowed(self):
+        content = '\n'.join([
+            json.dumps({'name': 'Fern', 'type_of_art': 'Painting', 'price': '5', 'county': 'Marin', 'state': 'CA',
+                        'image': '/tmp/fern.jpg'}),
+            '',
+            'not json',
+        ])
+        stats = self.run_import(content, 'jsonl')
+        self.assertEqual((stats['created'], stats['failed']), (0, 2))
+        self.assertEqual(self.run_import(content, 'jsonl', allow_local_images=True)['created'], 1)
+
+    def test_queries_per_batch_not_per_row(self):
+        def count_queries(rows):
+            content = 'name,type_of_art,price,county,state\n' + ''.join(
+                f'Piece {i},Painting,10,Marin,CA\n' for i in range(rows))
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.run_import(content, batch_size=50)['created'], rows)
+            return len(queries)
+
+        count_queries(1)  # looks the location up once; after that it comes from the location map
+        per_batch = count_queries(100) - count_queries(50)
+        self.assertLess(per_batch, 10)
+        self.assertEqual(count_queries(500), count_queries(50) + 9 * per_batch)
+
+    def test_ids_are_found_when_the_database_does_not_return_them(self):
+        # like MySQL
+        content = 'name,type_of_art,price,county,state,image\n' + ''.join(
+            f'Piece {i},Painting,10,Marin,CA,https://example.com/{i}.jpg\n' for i in range(5))
+        with mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert', False):
+            self.run_import(content)
+        sources = dict(Job.objects.values_list('payload__art_id', 'payload__source'))
+        for piece in ArtPiece.objects.all():
+            self.assertEqual(sources[piece.art_id], f'https://example.com/{piece.name.split()[1]}.jpg')
+
+    def test_ids_taken_in_the_meantime_are_skipped(self):
+        # another request inserts an art piece between picking the ids and the insert
+        taken = make_art_piece(make_user(), self.marin)
+        real_next_id = imports.next_free_art_id
+        next_ids = iter([taken.art_id])
+        content = 'name,type_of_art,price,county,state\nFern,Painting,5,Marin,CA\nOak,Painting,5,Marin,CA\n'
+        with mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert', False), \
+                mock.patch('artpiece.imports.next_free_art_id', lambda: next(next_ids, None) or real_next_id()):
+            self.assertEqual(self.run_import(content)['created'], 2)
+        self.assertEqual(ArtPiece.objects.get(art_id=taken.art_id).name, taken.name)
+        self.assertEqual(ArtPiece.objects.filter(user=self.seller).count(), 2)
+        self.assertEqual(search.search_art_ids('oak'), [ArtPiece.objects.get(name='Oak').art_id])
+
+    def test_next_free_id_is_a_locking_read(self):
+        make_art_piece(self.seller, self.marin)
+        with mock.patch.object(type(connection.features), 'has_select_for_update', True), \
+                CaptureQueriesContext(connection) as queries, self.assertRaises(DatabaseError):
+            imports.next_free_art_id()  # SQLite can't run FOR UPDATE, but the SQL shows it was asked for
+        self.assertIn('FOR UPDATE', queries[-1]['sql'])
+
+    def test_command(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as listings_file:
+            listings_file.write('name,type_of_art,price,county,state,image\nFern,Painting,5,Marin,CA,fern.jpg\n')
+        self.addCleanup(os.remove, listings_file.name)
+        out = io.StringIO()
+        call_command('import_listings', listings_file.name, seller=self.seller.user_id, stdout=out)
+        self.assertIn('Imported 1 listings', out.getvalue())
+        job = Job.objects.get(name='artpiece.import_image')
+        self.assertEqual(job.payload['source'], os.path.join(os.path.dirname(listings_file.name), 'fern.jpg'))
+
+    @override_settings(CACHES=LOCMEM_CACHE)
+    def test_upload_endpoint_runs_in_the_background(self):
+        cache.clear()
+        pending_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(pending_dir.cleanup)
+        log_in(self.client, self.seller)
+
+        with override_settings(PENDING_UPLOAD_ROOT=pending_dir.name):
+            response = self.client.post('/base/artpieces/import/', {
+                'file': SimpleUploadedFile('listings.csv', self.CSV.encode(), content_type='text/csv'),
+            })
+            self.assertEqual(response.status_code, 202)
+            status_url = f"/base/artpieces/import/{response.json()['import_id']}/"
+            self.assertEqual(self.client.get(status_url).json()['status'], 'queued')
+            run_pending()
+
+        progress = self.client.get(status_url).json()
+        self.assertEqual((progress['status'], progress['created'], progress['failed']), ('done', 2, 3))
+        self.assertEqual(ArtPiece.objects.filter(user=self.seller).count(), 2)
+        self.assertEqual(os.listdir(os.path.join(pending_dir.name, 'imports', str(self.seller.user_id))), [])
+
+        log_in(self.client, make_user())
+        self.assertEqual(self.client.get(status_url).status_code, 404)
+        response = self.client.post('/base/artpieces/import/', {'file': SimpleUploadedFile('listings.xlsx', b'x')})
+        self.assertEqual(response.status_code, 400)
+
+
+class ImageDownloadTests(TestCase):
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.startswith('/redirect'):
+                self.send_response(302)
+                self.send_header('Location', self.path.split('?to=', 1)[1])
+                self.end_headers()
+                return
+            body = b'x' * int(self.path.rsplit('/', 1)[1])
+            self.send_response(200)
+            if 'no-length' not in self.path:
+                self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    def setUp(self):
+        server = HTTPServer(('127.0.0.1', 0), self.Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.base_url = f'http://127.0.0.1:{server.server_port}'
+
+    def allow_test_server(self):
+        # pretend the test server on 127.0.0.1 is on the internet; every other address gets the real check
+        real_check = downloads.is_public_address
+        return mock.patch('artpiece.downloads.is_public_address',
+                          lambda address: address == '127.0.0.1' or real_check(address))
+
+    def test_only_public_http_addresses(self):
+        for url in ['ftp://example.com/a.jpg', 'file:///etc/passwd', 'http://127.0.0.1/a.jpg', 'http://10.1.2.3/',
+                    'http://169.254.169.254/latest/meta-data/', 'http://[::1]/', 'http://[::ffff:192.168.0.1]/',
+                    f'{self.base_url}/10']:
+            with self.subTest(url=url), self.assertRaises(downloads.DownloadRefused):
+                downloads.fetch(url, 100)
+
+    def test_host_names_are_checked_after_resolving(self):
+        with mock.patch('socket.getaddrinfo', return_value=[(None, None, None, '', ('10.0.0.8', 80))]), \
+                self.assertRaisesRegex(downloads.DownloadRefused, 'non-public'):
+            downloads.fetch('http://images.example.com/a.jpg', 100)
+
+    def test_follows_redirects_only_to_public_addresses(self):
+        with self.allow_test_server():
+            self.assertEqual(downloads.fetch(f'{self.base_url}/redirect?to=/10', 100), b'x' * 10)
+            with self.assertRaisesRegex(downloads.DownloadRefused, 'non-public'):
+                downloads.fetch(f'{self.base_url}/redirect?to=http://169.254.169.254/', 100)
+
+    def test_size_is_capped(self):
+        with self.allow_test_server():
+            self.assertEqual(len(downloads.fetch(f'{self.base_url}/100', 100)), 100)
+            for path in ['/101', '/no-length/101']:
+                with self.subTest(path=path), self.assertRaisesRegex(downloads.DownloadRefused, 'larger'):
+                    downloads.fetch(self.base_url + path, 100)
+
+
+class LocationResolutionTests(TestCase):
+
+    def setUp(self):
+        forget_locations()
+
+    def test_same_place_whatever_the_spelling(self):
+        marin = resolve_location('Marin', 'CA')
+        self.assertEqual((marin.county, marin.location_key), ('Marin', 'marin|ca'))
+        self.assertEqual(resolve_location('  MARIN ', 'ca').location_id, marin.location_id)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(resolve_location('marin', 'Ca').location_id, marin.location_id)
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(Location.objects.count(), 1)
+
+    @override_settings(CACHES=LOCMEM_CACHE)
+    def test_forgetting_reaches_every_process(self):
+        # another process's map, sharing the cache with this one
+        other = LocationMap()
+        marin = make_location(county='Marin', state='CA')
+        other.get('Marin', 'CA')
+        Location.objects.filter(pk=marin.pk).delete()
+        self.assertEqual(other.get('Marin', 'CA').pk, marin.pk)  # still remembered
+
+        forget_locations()
+        self.assertEqual(other.get('Marin', 'CA').pk, marin.pk)  # the version was checked just now
+        later = time.monotonic() + LOCATIONS_CHECK_SECONDS
+        with mock.patch('artpiece.locations.time.monotonic', return_value=later):
+            self.assertNotEqual(other.get('Marin', 'CA').pk, marin.pk)
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+                                           'LOCATION': 'django_cache'}})
+    def test_version_is_checked_once_not_per_row(self):
+        call_command('createcachetable', database='default')  # the test settings use DummyCache
+        make_location(county='Marin', state='CA')
+        resolve_location('Marin', 'CA')
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(100):
+                resolve_location('Marin', 'CA')
+        self.assertEqual(len(queries), 0)
+
+    def test_maps_expire(self):
+        marin = make_location(county='Marin', state='CA')
+        resolve_location('Marin', 'CA')
+        Location.objects.filter(pk=marin.pk).delete()
+        with mock.patch('artpiece.locations.time.monotonic', return_value=time.monotonic() + LOCATIONS_MAX_AGE + 1):
+            self.assertNotEqual(resolve_location('Marin', 'CA').pk, marin.pk)
+
+    def test_key_is_unique(self):
+        make_location(county='Marin', state='CA')
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            make_location(county='marin ', state='ca')
+
+    def test_rows_from_before_the_key_are_claimed(self):
+        Location.objects.bulk_create([Location(county='Sonoma', state='CA')])  # bulk_create skips save(): no key
+        legacy = Location.objects.get()
+        self.assertEqual(resolve_location('sonoma', 'ca').location_id, legacy.location_id)
+        legacy.refresh_from_db()
+        self.assertEqual(legacy.location_key, 'sonoma|ca')
+
+    def test_consolidate_merges_duplicates(self):
+        Location.objects.bulk_create([
+            Location(county='Marin', state='CA'), Location(county='marin ', state='ca'),
+            Location(county='MARIN', state='Ca'), Location(county='King', state='WA'),
+        ])
+        marin, lower, upper, king = Location.objects.order_by('location_id')
+        seller = make_user()
+        pieces = [make_art_piece(seller, location) for location in (marin, lower, upper, king)]
+        self.assertEqual(resolve_location('Marin', 'CA').location_id, marin.location_id)
+
+        call_command('consolidate_locations', dry_run=True, stdout=io.StringIO())
+        self.assertEqual(Location.objects.count(), 4)
+
+        out = io.StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('consolidate_locations', stdout=out)
+        self.assertIn('Merged 2 duplicate locations (2 art pieces moved)', out.getvalue())
+        self.assertEqual(dict(Location.objects.values_list('location_id', 'location_key')),
+                         {marin.location_id: 'marin|ca', king.location_id: 'king|wa'})
+        self.assertEqual([ArtPiece.objects.get(pk=piece.pk).location_id for piece in pieces],
+                         [marin.location_id] * 3 + [king.location_id])
+
+
+class ImageDerivativeTests(TestCase):
+
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.storage = FileSystemStorage(location=self.media.name)
+        buffer = io.BytesIO()
+        Image.new('RGB', (3000, 2000), 'green').save(buffer, 'JPEG')
+        self.original_name = self.storage.save('art_pieces/forest.jpg', ContentFile(buffer.getvalue()))
+
+    def tearDown(self):
+        self.media.cleanup()
+
+    def test_generates_every_variant_and_format(self):
+        piece = make_art_piece(make_user(), make_location(), image=self.original_name)
+        names = images.generate_derivatives(piece, storage=self.storage)
+
+        for variant, max_side in images.VARIANTS.items():
+            for image_format, name in names[variant].items():
+                with self.storage.open(name) as stored:
+                    derivative = Image.open(stored)
+                    self.assertEqual(derivative.format, images.FORMATS[image_format]['format'])
+                    self.assertEqual(max(derivative.size), max_side)
+        self.assertLess(self.storage.size(names['card']['webp']), self.storage.size(self.original_name))
+
+    def test_serializer_exposes_variant_urls(self):
+        piece = make_art_piece(make_user(), make_location(), image=self.original_name)
+        images.generate_derivatives(piece, storage=self.storage)
+        piece.refresh_from_db()
+        with mock.patch.object(MediaStorage, 'url', side_effect=lambda name: f'/media/{name}') as url:
+            data = ArtPieceSerializer(piece).data
+        self.assertEqual(url.call_count, 2 + 2 * len(images.VARIANTS))  # image, image_url, then each variant once
+        self.assertEqual(set(data['image_variants']), set(images.VARIANTS))
+        self.assertTrue(data['image_variants']['card']['webp'].endswith('art_pieces/derivatives/forest_card.webp'))
+        self.assertIn('480w', data['image_srcset']['webp'])
+
+    def test_variants_only_once_they_exist(self):
+        piece = make_art_piece(make_user(), make_location(), image=self.original_name)
+        self.assertIsNone(ArtPieceSerializer(piece).data['image_variants'])  # the job hasn't run yet
+        images.generate_derivatives(piece, storage=self.storage)
+        self.assertIsNotNone(ArtPieceSerializer(piece).data['image_variants'])
+        piece.image = 'art_pieces/replacement.jpg'
+        self.assertIsNone(ArtPieceSerializer(piece).data['image_srcset'])
+
+    def test_no_image_means_no_variants(self):
+        data = ArtPieceSerializer(make_art_piece(make_user(), make_location())).data
+        self.assertIsNone(data['image_variants'])
+        self.assertIsNone(data['image_srcset'])
+
+
+class DirectImageUploadTests(TestCase):
+    # runs against moto's in-memory S3 instead of the real bucket
+
+    def setUp(self):
+        forget_locations()
+        aws = mock_aws()
+        aws.start()
+        self.addCleanup(aws.stop)
+
+        self.storage = MediaStorage(region_name='us-east-2')
+        self.storage.bucket.meta.client.create_bucket(
+            Bucket=self.storage.bucket_name, CreateBucketConfiguration={'LocationConstraint': 'us-east-2'})
+        patcher = mock.patch.object(ArtPiece._meta.get_field('image'), 'storage', self.storage)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.seller = make_user()
+        self.piece = make_art_piece(self.seller, make_location())
+        log_in(self.client, self.seller)
+
+    def upload(self, key, body, content_type='image/jpeg'):
+        self.storage.bucket.meta.client.put_object(
+            Bucket=self.storage.bucket_name, Key=f'media/{key}', Body=body, ContentType=content_type)
+
+    def jpeg_bytes(self):
+        buffer = io.BytesIO()
+        Image.new('RGB', (800, 600), 'brown').save(buffer, 'JPEG')
+        return buffer.getvalue()
+
+    def test_presign_then_confirm(self):
+        response = self.client.post(f'/base/artpieces/{self.piece.art_id}/image-upload/', {'content_type': 'image/jpeg'})
+        self.assertEqual(response.status_code, 201)
+        key = response.data['key']
+        self.assertTrue(key.startswith(f'art_pieces/uploads/{self.piece.art_id}/'))
+        self.assertEqual(response.data['fields']['key'], f'media/{key}')
+
+        self.upload(key, self.jpeg_bytes())
+        response = self.client.post(f'/base/artpieces/{self.piece.art_id}/image-upload/confirm/', {'key': key})
+        self.assertEqual(response.status_code, 200)
+        self.piece.refresh_from_db()
+        self.assertEqual(self.piece.image.name, key)
+
+        # thumbnails are made by the background job
+        self.assertEqual(run_pending(), 1)
+        self.assertTrue(self.storage.exists(images.derivative_name(key, 'card', 'webp')))
+
+    def test_create_with_image_returns_before_upload(self):
+        with tempfile.TemporaryDirectory() as pending_dir, self.settings(PENDING_UPLOAD_ROOT=pending_dir):
+            response = self.client.post('/base/artpieces/create/', {
+                'name': 'Oak leaf', 'type_of_art': 'Painting', 'stock_amount': 1, 'price': '30.00',
+                'county': 'Marin', 'state': 'CA',
+                'image': SimpleUploadedFile('leaf.jpg', self.jpeg_bytes(), content_type='image/jpeg'),
+            })
+            self.assertEqual(response.status_code, 202)
+            self.assertEqual(response.data['image_status'], 'pending')
+            self.assertIsNone(response.data['image_url'])
+
+            self.assertEqual(run_pending(), 1)
+            piece = ArtPiece.objects.get(art_id=response.data['art_id'])
+            self.assertTrue(self.storage.exists(piece.image.name))
+            self.assertTrue(self.storage.exists(images.derivative_name(piece.image.name, 'thumb', 'jpeg')))
+            self.assertEqual(os.listdir(os.path.join(pending_dir, str(piece.art_id))), [])
+
+    def test_retried_upload_leaves_nothing_behind(self):
+        with tempfile.TemporaryDirectory() as pending_dir, self.settings(PENDING_UPLOAD_ROOT=pending_dir):
+            path = tasks.pending_upload_storage().save(f'{self.piece.art_id}/abc_leaf.jpg',
+                                                       ContentFile(self.jpeg_bytes()))
+            with mock.patch.object(tasks, 'generate_derivatives', side_effect=OSError('S3 went away')):
+                with self.assertRaises(OSError):
+                    tasks.attach_image(self.piece.art_id, path, 'leaf.jpg')
+            tasks.attach_image(self.piece.art_id, path, 'leaf.jpg')
+
+        self.piece.refresh_from_db()
+        self.assertEqual(self.piece.image.name, f'art_pieces/{self.piece.art_id}/abc_leaf.jpg')
+        listed = self.storage.bucket.meta.client.list_objects_v2(Bucket=self.storage.bucket_name, Prefix='media/')
+        originals = [item['Key'] for item in listed['Contents'] if '/derivatives/' not in item['Key']]
+        self.assertEqual(originals, [f'media/{self.piece.image.name}'])
+
+    def test_confirm_rejects_missing_foreign_and_non_image_objects(self):
+        confirm_url = f'/base/artpieces/{self.piece.art_id}/image-upload/confirm/'
+        prefix = f'art_pieces/uploads/{self.piece.art_id}/'
+
+        self.assertEqual(self.client.post(confirm_url, {'key': prefix + 'missing.jpg'}).status_code, 400)
+        self.assertEqual(self.client.post(confirm_url, {'key': 'art_pieces/uploads/999/x.jpg'}).status_code, 400)
+        self.upload(prefix + 'notes.jpg', b'hello', content_type='text/plain')
+        self.assertEqual(self.client.post(confirm_url, {'key': prefix + 'notes.jpg'}).status_code, 400)
+
+    def test_only_the_owner_can_upload(self):
+        log_in(self.client, make_user())
+        response = self.client.post(f'/base/artpieces/{self.piece.art_id}/image-upload/', {'content_type': 'image/jpeg'})
+        self.assertEqual(response.status_code, 403)
+
+    def test_unsupported_type(self):
+        response = self.client.post(f'/base/artpieces/{self.piece.art_id}/image-upload/', {'content_type': 'image/gif'})
+        self.assertEqual(response.status_code, 400)
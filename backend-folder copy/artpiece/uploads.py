@@ -0,0 +1,84 @@
+import posixpath
+import uuid
+
+from botocore.exceptions import ClientError
+from django.conf import settings
+
+from base.metrics import timer
+from base.models import ArtPiece
+
+# Direct-to-bucket image uploads.
+#
+# Uploading through ArtPieceCreateAPIView means Django has to receive and buffer the whole photo and then send
+# it on to S3, which ties up a worker for as long as the upload takes. Instead the browser can:
+#   1. ask for a presigned POST (create_presigned_upload) and send the file straight to the bucket, then
+#   2. tell us it's done (confirm_upload), and we check the object and attach it to the art piece.
+# Django only ever handles a few hundred bytes of JSON, whatever the size of the image.
+
+ALLOWED_CONTENT_TYPES = {
+    'image/jpeg': 'jpg',
+    'image/png': 'png',
+    'image/webp': 'webp',
+}
+UPLOAD_DIR = 'art_pieces/uploads'
+
+
+class UploadError(Exception):
+    pass
+
+
+def get_storage():
+    # the same storage ArtPiece.image files go to (MediaStorage on S3)
+    return ArtPiece._meta.get_field('image').storage
+
+
+def upload_prefix(art_piece):
+    return f'{UPLOAD_DIR}/{art_piece.art_id}/'
+
+
+def object_key(storage, name):
+    # storage names are relative to MediaStorage.location ("media/"), bucket keys aren't
+    return posixpath.join(storage.location, name) if storage.location else name
+
+
+def create_presigned_upload(art_piece, content_type):
+    extension = ALLOWED_CONTENT_TYPES.get(content_type)
+    if not extension:
+        raise UploadError(f'Unsupported image type: {content_type}')
+
+    storage = get_storage()
+    name = f'{upload_prefix(art_piece)}{uuid.uuid4().hex}.{extension}'
+    presigned = storage.bucket.meta.client.generate_presigned_post(
+        Bucket=storage.bucket_name,
+        Key=object_key(storage, name),
+        Fields={'Content-Type': content_type},
+        Conditions=[
+            {'Content-Type': content_type},
+            ['content-length-range', 1, settings.ART_IMAGE_MAX_UPLOAD_BYTES],
+        ],
+        ExpiresIn=settings.ART_IMAGE_UPLOAD_EXPIRY,
+    )
+    return {'url': presigned['url'], 'fields': presigned['fields'], 'key': name}
+
+
+# Checks the uploaded object (without downloading it) and attaches it to the art piece
+def confirm_upload(art_piece, name):
+    # only keys we handed out for this art piece can be attached to it
+    if not name or not name.startswith(upload_prefix(art_piece)) or '..' in name:
+        raise UploadError('Invalid upload key')
+
+    storage = get_storage()
+    try:
+        with timer('storage'):
+            head = storage.bucket.meta.client.head_object(Bucket=storage.bucket_name, Key=object_key(storage, name))
+    except ClientError:
+        raise UploadError('Uploaded image not found')
+
+    if head['ContentLength'] > settings.ART_IMAGE_MAX_UPLOAD_BYTES:
+        raise UploadError('Uploaded image is too large')
+    if head.get('ContentType') not in ALLOWED_CONTENT_TYPES:
+        raise UploadError('Uploaded file is not a supported image')
+
+    art_piece.image.name = name
+    art_piece.save(update_fields=['image'])
+    return art_piece
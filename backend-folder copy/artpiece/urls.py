@@ -1,12 +1,24 @@
 from django.urls import path
-from .views import ArtPieceDetailAPIView, ArtPieceListAPIView,ArtPieceCreateAPIView, ArtPieceDeleteAPIView, SellerArtPieceListAPIView, AllLocationsAPIView
+from .views import ArtPieceDetailAPIView, ArtPieceListAPIView,ArtPieceCreateAPIView, ArtPieceDeleteAPIView, SellerArtPieceListAPIView, AllLocationsAPIView, ArtPieceSearchAPIView, ArtPieceImageUploadAPIView, ArtPieceImageConfirmAPIView, ListingImportAPIView, ListingImportStatusAPIView
+from . import async_views
 # foward request to appropriate view
 urlpatterns = [
     path('locations/', AllLocationsAPIView.as_view(), name='all-locations'),
     path('create/', ArtPieceCreateAPIView.as_view(), name='create-artpiece'),
     path('', ArtPieceListAPIView.as_view(), name='artpiece-list'),
+    path('import/', ListingImportAPIView.as_view(), name='listing-import'),
+    path('import/<str:import_id>/', ListingImportStatusAPIView.as_view(), name='listing-import-status'),
+    path('search/', ArtPieceSearchAPIView.as_view(), name='artpiece-search'),
     path('<int:seller_id>/art/', SellerArtPieceListAPIView.as_view(), name='seller-art'),
     path('<int:art_id>/', ArtPieceDetailAPIView.as_view(), name='artpiece-detail'),
     path('<int:art_id>/delete/', ArtPieceDeleteAPIView.as_view(), name='artpiece-delete'),
+    path('<int:art_id>/image-upload/', ArtPieceImageUploadAPIView.as_view(), name='artpiece-image-upload'),
+    path('<int:art_id>/image-upload/confirm/', ArtPieceImageConfirmAPIView.as_view(), name='artpiece-image-confirm'),
+
+    # async versions of the read endpoints above (see async_views.py)
+    path('async/', async_views.art_piece_list, name='artpiece-list-async'),
+    path('async/locations/', async_views.all_locations, name='all-locations-async'),
+    path('async/<int:seller_id>/art/', async_views.seller_art_pieces, name='seller-art-async'),
+    path('async/<int:art_id>/', async_views.art_piece_detail, name='artpiece-detail-async'),
 
 ]
\ No newline at end of file
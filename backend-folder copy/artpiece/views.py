@@ -8,71 +8,118 @@ from rest_framework.generics import RetrieveAPIView,ListAPIView, DestroyAPIView
 from django.shortcuts import get_object_or_404
 from base.models import Location, ArtPiece, Users  
 from .serializers import ArtPieceSerializer, LocationSerializer # Import the serializer
+from .pagination import ArtPieceCursorPagination
+from . import search
+from .tasks import pending_upload_storage
+from jobs.queue import enqueue
+from . import uploads
+from . import imports
+from .locations import resolve_location
+from .cache import CatalogCacheMixin, bump_catalog_version_on_commit
 import django_filters
 from django.db.models import Q
+import logging
 import re
+import uuid
+
+logger = logging.getLogger(__name__)
 
 # retrieve all locations in the database
-class AllLocationsAPIView(ListAPIView):
+class AllLocationsAPIView(CatalogCacheMixin, ListAPIView):
     queryset = Location.objects.all()
     serializer_class = LocationSerializer
 
+# Server-side filters for the catalog, e.g.
+#   /base/artpieces/?type_of_art=Painting,Sculpture&state=CA&min_price=10&max_price=200
+# every filter becomes a WHERE clause in the SQL query, so the database only returns matching rows
+class CharInFilter(django_filters.BaseInFilter, django_filters.CharFilter):
+    pass
+
+
+class NumberInFilter(django_filters.BaseInFilter, django_filters.NumberFilter):
+    pass
+
+
 class ArtPieceFilter(django_filters.FilterSet):
-    type_of_art = django_filters.BaseInFilter(field_name="type_of_art", lookup_expr="in")
+    type_of_art = CharInFilter(field_name="type_of_art", lookup_expr="in")
+    location = NumberInFilter(field_name="location_id", lookup_expr="in")  # location ids from the sidebar
+    county = django_filters.CharFilter(field_name="location__county", lookup_expr="iexact")
+    state = django_filters.CharFilter(field_name="location__state", lookup_expr="iexact")
+    seller = django_filters.NumberFilter(field_name="user_id")
+    min_price = django_filters.NumberFilter(field_name="price", lookup_expr="gte")
+    max_price = django_filters.NumberFilter(field_name="price", lookup_expr="lte")
+    in_stock = django_filters.BooleanFilter(method='filter_in_stock')
     search = django_filters.CharFilter(method='filter_combined_search')
-    
+
+    def filter_in_stock(self, queryset, name, value):
+        if value:
+            return queryset.filter(stock_amount__gt=0)
+        return queryset
+
     def filter_combined_search(self, queryset, name, value):
-        # Sanitize input - remove potentially harmful characters
-        sanitized_value = self.sanitize_input(value)
-        
-        if not sanitized_value:
+        if not search.search_terms(value):
             return queryset
-            
-        # This means "find records where the value is in ANY of these fields" - 
-        # without Q objects, Django's default behavior would require all conditions to match.
-        return queryset.filter(
-            Q(title__icontains=sanitized_value) | 
-            Q(location__icontains=sanitized_value) |
-            Q(artist__name__icontains=sanitized_value) |
-            Q(description__icontains=sanitized_value)
-        )
+
+        # look the words up in the full-text index (see search.py) instead of LIKE '%word%' scans;
+        # every match, since the catalog pages through all of them
+        return queryset.filter(art_id__in=search.matching_art_ids(value))
     
     class Meta:
         model = ArtPiece
-        fields = ['type_of_art', 'search']
+        fields = ['type_of_art', 'location', 'county', 'state', 'seller', 'min_price', 'max_price', 'in_stock', 'search']
 
 
 # uses Django REST Framework's ListAPIView which is made for listing multiple objects
 # this is used to get a list of all art pieces in the database
-# it will return a list of all art pieces in the database & can filter if needed 
-class ArtPieceListAPIView(APIView):
-    def get(self, request):
-        art_pieces = ArtPiece.objects.all()
-        serializer = ArtPieceSerializer(art_pieces, many=True)
-        data = serializer.data
-        
-        # Debug print
-        for piece in data:
-            print(f"Art piece: {piece['name']}")
-            print(f"  image: {piece.get('image')}")
-            print(f"  image_url: {piece.get('image_url')}")
-        
-        return Response(data)
+# results come back one page at a time ({"next", "previous", "results"}) using cursor pagination,
+# so the response size stays the same no matter how many art pieces are in the database
+class ArtPieceListAPIView(CatalogCacheMixin, ListAPIView):
+    # select_related joins the seller and location in the same query,
+    # otherwise the nested serializers would run 2 extra queries for every art piece
+    queryset = ArtPiece.objects.select_related('user', 'location')
+    serializer_class = ArtPieceSerializer
+    pagination_class = ArtPieceCursorPagination
+    filterset_class = ArtPieceFilter
+
+# ranked full-text search: /base/artpieces/search/?q=blue vase
+# returns the best matches first (instead of by art_id) and accepts the same filters as the catalog list
+class ArtPieceSearchAPIView(CatalogCacheMixin, ListAPIView):
+    serializer_class = ArtPieceSerializer
+    filterset_class = ArtPieceFilter
+    default_limit = 24
+    max_limit = 100
+
+    def get_queryset(self):
+        return ArtPiece.objects.select_related('user', 'location')
+
+    def list(self, request, *args, **kwargs):
+        ranked_ids = search.search_art_ids(request.query_params.get('q', ''))
+        try:
+            limit = min(int(request.query_params.get('limit', self.default_limit)), self.max_limit)
+        except ValueError:
+            limit = self.default_limit
+
+        matches = self.filter_queryset(self.get_queryset().filter(art_id__in=ranked_ids))
+        position = {art_id: rank for rank, art_id in enumerate(ranked_ids)}
+        art_pieces = sorted(matches, key=lambda piece: position[piece.art_id])[:limit]
+        return Response(self.get_serializer(art_pieces, many=True).data)
+
 
 # uses Django REST Framework's RetrieveAPIView which is made for retrieving a single object 
-class ArtPieceDetailAPIView(RetrieveAPIView):
-    queryset = ArtPiece.objects.all()
+class ArtPieceDetailAPIView(CatalogCacheMixin, RetrieveAPIView):
+    queryset = ArtPiece.objects.select_related('user', 'location')
     serializer_class = ArtPieceSerializer
     lookup_field = 'art_id'
     
     
 # retrieve products for a specific user 
-class SellerArtPieceListAPIView(ListAPIView):
+class SellerArtPieceListAPIView(CatalogCacheMixin, ListAPIView):
     serializer_class = ArtPieceSerializer
 
     def get_queryset(self):
         seller_id = self.kwargs.get("seller_id")  # extract seller_id from URL
-        return ArtPiece.objects.filter(user_id=seller_id)  # filter by the user_id in the ArtPiece model
+        # filter by the user_id in the ArtPiece model, joining seller + location in the same query
+        return ArtPiece.objects.filter(user_id=seller_id).select_related('user', 'location')
 
 
     
@@ -83,6 +130,10 @@ class ArtPieceDeleteAPIView(DestroyAPIView):
     queryset = ArtPiece.objects.all() # what model to look into
     serializer_class = ArtPieceSerializer
     lookup_field = 'art_id' # the field to look up by (pk) 
+
+    def perform_destroy(self, instance):
+        instance.delete()  # the search index entry goes with it (signal in search.py)
+        bump_catalog_version_on_commit()  # cached catalog responses may include this piece
     
 
 
@@ -94,13 +145,12 @@ class ArtPieceCreateAPIView(APIView):
     def post(self, request):
         try:
             # Authentication check
-            user_id = request.session.get('user_id')
-            if not user_id:
+            if not request.user.is_authenticated:
                 return Response({'error': 'User not authenticated'}, 
                             status=status.HTTP_401_UNAUTHORIZED)
             
-            # Get User
-            user = get_object_or_404(Users, pk=user_id)
+            # Get User (loaded from the session by SessionUserAuthentication)
+            user = request.user
             
             # Validate Location Data
             county = request.data.get('county')
@@ -112,13 +162,9 @@ class ArtPieceCreateAPIView(APIView):
 
             # Handle Location
             try:
-                location, _ = Location.objects.get_or_create(
-                    county__iexact=county, # case insensitive 
-                    state__iexact=state, # case insensitive
-                    defaults={'county': county, 'state': state}
-                )
+                location = resolve_location(county, state)  # case/whitespace insensitive, see locations.py
             except Exception as e:
-                print(f"Location error: {str(e)}")
+                logger.warning('Location error: %s', e)
                 return Response({'error': f'Location error: {str(e)}'},
                             status=status.HTTP_400_BAD_REQUEST)
 
@@ -136,34 +182,112 @@ class ArtPieceCreateAPIView(APIView):
             # Create serializer for basic data
             serializer = ArtPieceSerializer(data=art_data)
             if not serializer.is_valid():
-                print("Serializer errors:", serializer.errors)
+                logger.debug('Serializer errors: %s', serializer.errors)
                 return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
             # Save the art piece first
             art_piece = serializer.save()
             
-            # Then handle image upload separately
+            # saving indexed it for search (signal in search.py); make it visible in the cached catalog
+            bump_catalog_version_on_commit()
+
+            # The S3 upload and thumbnails happen in a background job (artpiece/tasks.py) so we can answer right away.
+            # The image is parked on local disk until the worker picks it up.
             if 'image' in request.FILES:
-                try:
-                    # Get the image file
-                    image_file = request.FILES['image']
-                    
-                    # Update the art piece with the image
-                    art_piece.image = image_file
-                    art_piece.save()
-                    
-                    print(f"Image saved successfully: {art_piece.image.url}")
-                except Exception as e:
-                    print(f"Image save error: {str(e)}")
-                    # Continue even if image upload fails
-            else:
-                print("No image file found in request")
+                image_file = request.FILES['image']
+                # the upload id keeps the path (and the S3 key made from it) apart from earlier uploads for this piece
+                path = pending_upload_storage().save(f'{art_piece.art_id}/{uuid.uuid4().hex}_{image_file.name}',
+                                                     image_file)
+                job = enqueue('artpiece.attach_image', owner_id=user.user_id, art_id=art_piece.art_id,
+                              path=path, filename=image_file.name)
+
+                data = ArtPieceSerializer(art_piece).data
+                data['image_status'] = 'pending'
+                data['image_job_id'] = job.job_id
+                return Response(data, status=status.HTTP_202_ACCEPTED)
             
             # Return the full art piece data
             return Response(ArtPieceSerializer(art_piece).data, status=status.HTTP_201_CREATED)
             
         except Exception as e:
-            import traceback
-            print(f"Unexpected error: {str(e)}")
-            print(traceback.format_exc())
-            return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+            logger.exception('Unexpected error creating an art piece')
+            return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+
+# Bulk import: upload a CSV or JSON Lines file of listings (see imports.py for the columns).
+# The file is imported by a background job; poll ListingImportStatusAPIView with the import_id for progress.
+class ListingImportAPIView(APIView):
+    parser_classes = (MultiPartParser, FormParser)
+
+    def post(self, request):
+        if not request.user.is_authenticated:
+            return Response({'error': 'User not authenticated'}, status=status.HTTP_401_UNAUTHORIZED)
+
+        listings_file = request.FILES.get('file')
+        if listings_file is None:
+            return Response({'error': 'No file uploaded'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            file_format = imports.format_for(listings_file.name)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        seller_id = request.user.user_id
+        import_id = uuid.uuid4().hex
+        path = pending_upload_storage().save(f'imports/{seller_id}/{import_id}-{listings_file.name}', listings_file)
+        imports.set_progress(import_id, seller_id, 'queued')
+        # not retried: a second attempt would create the rows the first one already committed again
+        job = enqueue('artpiece.import_listings', max_attempts=1, owner_id=seller_id, path=path,
+                      file_format=file_format, seller_id=seller_id, import_id=import_id)
+        return Response({'import_id': import_id, 'job_id': job.job_id, 'status': 'queued'},
+                        status=status.HTTP_202_ACCEPTED)
+
+
+# progress of an import started with ListingImportAPIView: rows read, created, failed (with the first errors)
+class ListingImportStatusAPIView(APIView):
+    def get(self, request, import_id):
+        if not request.user.is_authenticated:
+            return Response({'error': 'User not authenticated'}, status=status.HTTP_401_UNAUTHORIZED)
+
+        progress = imports.get_progress(import_id)
+        if progress is None or progress['seller_id'] != request.user.user_id:
+            return Response({'error': 'Import not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(progress)
+
+
+# Step 1 of a direct upload: returns a presigned POST the browser uses to send the image straight to S3
+class ArtPieceImageUploadAPIView(APIView):
+    def post(self, request, art_id):
+        if not request.user.is_authenticated:
+            return Response({'error': 'User not authenticated'}, status=status.HTTP_401_UNAUTHORIZED)
+
+        art_piece = get_object_or_404(ArtPiece, art_id=art_id)
+        if art_piece.user_id != request.user.user_id:
+            return Response({'error': 'You can only upload images for your own art'}, status=status.HTTP_403_FORBIDDEN)
+
+        try:
+            upload = uploads.create_presigned_upload(art_piece, request.data.get('content_type'))
+        except uploads.UploadError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(upload, status=status.HTTP_201_CREATED)
+
+
+# Step 2 of a direct upload: the browser tells us the upload finished, we check it and attach it to the art piece
+class ArtPieceImageConfirmAPIView(APIView):
+    def post(self, request, art_id):
+        if not request.user.is_authenticated:
+            return Response({'error': 'User not authenticated'}, status=status.HTTP_401_UNAUTHORIZED)
+
+        art_piece = get_object_or_404(ArtPiece.objects.select_related('user', 'location'), art_id=art_id)
+        if art_piece.user_id != request.user.user_id:
+            return Response({'error': 'You can only upload images for your own art'}, status=status.HTTP_403_FORBIDDEN)
+
+        try:
+            uploads.confirm_upload(art_piece, request.data.get('key'))
+        except uploads.UploadError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        # thumbnails are made by a background job; the image itself is usable straight away
+        enqueue('artpiece.generate_derivatives', owner_id=request.user.user_id, art_id=art_piece.art_id)
+        bump_catalog_version_on_commit()
+        return Response(ArtPieceSerializer(art_piece).data, status=status.HTTP_200_OK)
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class BaseConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "base"
+
+    def ready(self):
+        # connects the per-request query timer to every new database connection
+        from . import metrics  # noqa: F401
+        # registers the system checks
+        from . import checks  # noqa: F401
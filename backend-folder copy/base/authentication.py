@@ -0,0 +1,108 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from rest_framework.authentication import BaseAuthentication
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .models import Cart, TokenUser, Users
+
+# DRF authentication for our own Users table.
+#
+# LoginAPIView stores the user's id in the session. Every protected view used to read that id and then run
+# its own get_object_or_404(Users, ...) (and often a Cart lookup on top). This class does it once per
+# request instead: request.user is the Users row, with the id of the user's cart attached as
+# request.user.current_cart_id (None if they don't have a cart yet), loaded in a single query.
+# If AUTH_USER_CACHE_TIMEOUT is set, the row is also kept in the cache for that many seconds. The password
+# hash is never loaded here (so it's never in the cache, which is a shared table); reading user.password
+# fetches it from the database.
+
+
+def user_cache_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def load_user(user_id):
+    timeout = getattr(settings, 'AUTH_USER_CACHE_TIMEOUT', 0)
+    if timeout:
+        user = cache.get(user_cache_key(user_id))
+        if user is not None:
+            return user
+
+    user = Users.objects.defer('password').annotate(current_cart_id=F('cart__cart_id')).filter(pk=user_id).first()
+    if user is not None and timeout:
+        cache.set(user_cache_key(user_id), user, timeout)
+    return user
+
+
+# call when something we cache about the user changes (e.g. they get a cart, or log out)
+def forget_user(user_id):
+    cache.delete(user_cache_key(user_id))
+
+
+class SessionUserAuthentication(BaseAuthentication):
+    def authenticate(self, request):
+        user_id = request._request.session.get('user_id')
+        if not user_id:
+            return None  # not logged in; request.user is AnonymousUser
+
+        user = load_user(user_id)
+        if user is None:
+            return None  # the session points at a user that no longer exists
+        return (user, None)
+
+
+# ---- JSON Web Tokens (opt-in) ----
+#
+# Instead of a session cookie a client can log in through /base/users/token/ and send
+# "Authorization: Bearer <access token>". The access token carries the user's id, username and cart id,
+# so the request is authenticated without reading django_session, the users table or the cart table.
+# Logging out puts the token ids (jti) on a denylist in the cache until they would have expired anyway;
+# every process has to see that denylist, which is why the cache must be shared (check base.W001).
+
+def token_denylist_key(jti):
+    return f'auth:denied-token:{jti}'
+
+
+# Returns False if the token was already denied (or has expired). cache.add is atomic, so of two requests
+# denying the same token only one gets True: refreshing uses that to make each refresh token single-use.
+def deny_token(token):
+    remaining = int(token['exp'] - time.time())
+    if remaining <= 0:
+        return False
+    return cache.add(token_denylist_key(token['jti']), True, remaining)
+
+
+def is_token_denied(token):
+    return cache.get(token_denylist_key(token['jti'])) is not None
+
+
+# Every token carries a cart id, so a user without a cart gets one here rather than each request
+# having to look for one that was created after the token was issued
+def tokens_for_user(user, cart_id=None):
+    if cart_id is None:
+        cart_id = Cart.objects.get_or_create(user_id=user.user_id)[0].cart_id
+        forget_user(user.user_id)  # the cached user doesn't know about the new cart yet
+    refresh = RefreshToken.for_user(user)
+    refresh['username'] = user.username
+    refresh['cart_id'] = cart_id
+    return refresh
+
+
+class JWTUserAuthentication(JWTAuthentication):
+    def get_validated_token(self, raw_token):
+        token = super().get_validated_token(raw_token)
+        if is_token_denied(token):
+            raise InvalidToken('Token has been revoked')
+        return token
+
+    def get_user(self, validated_token):
+        # Built straight from the token claims; nothing is read from the database (and it can't be saved)
+        user = TokenUser(user_id=validated_token['user_id'], username=validated_token.get('username', ''))
+        user._state.adding = False
+        user._state.db = 'default'
+        user.current_cart_id = validated_token['cart_id']
+        return user
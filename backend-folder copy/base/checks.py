@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+# Per-process caches: each process has its own copy, so a change one process makes (a bumped catalog version,
+# forgotten locations, a revoked token) is invisible to the others
+PER_PROCESS_CACHES = ('django.core.cache.backends.locmem.LocMemCache',)
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    if settings.CACHES['default']['BACKEND'] not in PER_PROCESS_CACHES:
+        return []
+    return [Warning(
+        'The default cache is not shared between processes.',
+        hint='Catalog invalidation and everything else coordinated through the cache only works when every web '
+             'worker and run_jobs use the same one. Use the database cache (the default in settings.py, after '
+             '`manage.py createcachetable`), Redis or Memcached.',
+        id='base.W001',
+    )]
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from base.query_plans import check_hot_queries, hot_queries
+
+
+class Command(BaseCommand):
+    help = ('EXPLAINs the queries behind the busiest endpoints (see base/query_plans.py) and fails if any of '
+            'them reads a whole table instead of using an index.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        try:
+            scans = check_hot_queries(options['database'])
+        except ValueError as error:
+            raise CommandError(str(error))
+        for name in hot_queries():
+            if name in scans:
+                self.stdout.write(self.style.ERROR(f'{name}: full scan of {", ".join(scans[name])}'))
+            else:
+                self.stdout.write(f'{name}: ok')
+
+        if scans:
+            raise CommandError(f'{len(scans)} hot queries scan whole tables; is migration base 0005 applied?')
+        self.stdout.write(self.style.SUCCESS('Every hot query uses an index'))
@@ -0,0 +1,55 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from artpiece import search
+from artpiece.cache import bump_catalog_version
+from base.synthetic import SyntheticDataGenerator
+
+# rows per --scale step
+SCALE = {'users': 10_000, 'locations': 1_000, 'art_pieces': 50_000, 'orders': 20_000}
+
+
+class Command(BaseCommand):
+    help = ('Fills the database with synthetic users, locations, art pieces, carts and orders for scale testing '
+            '(see base/synthetic.py). The same --seed and counts always produce the same data.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=float, default=1,
+                            help='multiplies the default counts (10k users, 1k locations, 50k art pieces, '
+                                 '20k orders); --scale 100 gives millions of rows')
+        parser.add_argument('--users', type=int)
+        parser.add_argument('--locations', type=int)
+        parser.add_argument('--art-pieces', type=int)
+        parser.add_argument('--orders', type=int)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--password', default='password123', help='every generated user gets this password')
+        parser.add_argument('--prefix', default='synth', help='start of generated usernames, emails and counties')
+        parser.add_argument('--skip-search-index', action='store_true',
+                            help="don't rebuild the search index afterwards (run rebuild_search_index later)")
+
+    def handle(self, *args, **options):
+        counts = {name: options[name] if options[name] is not None else int(default * options['scale'])
+                  for name, default in SCALE.items()}
+        if counts['users'] < 1 or counts['locations'] < 1 or counts['art_pieces'] < 1:
+            raise CommandError('Need at least one user, location and art piece')
+
+        started = time.monotonic()
+
+        def progress(table, inserted):
+            self.stdout.write(f'{table}: {inserted} rows ({time.monotonic() - started:.0f}s)')
+
+        created = SyntheticDataGenerator(
+            **counts, seed=options['seed'], batch_size=options['batch_size'], password=options['password'],
+            prefix=options['prefix'], progress=progress,
+        ).run()
+
+        if not options['skip_search_index']:
+            self.stdout.write(f'Indexed {search.rebuild_index()} art pieces for search')
+        bump_catalog_version()  # cached catalog pages don't include the new art
+
+        self.stdout.write(self.style.SUCCESS(
+            'Created ' + ', '.join(f'{rows} {table}' for table, rows in created.items())
+            + f' in {time.monotonic() - started:.0f}s'
+        ))
@@ -0,0 +1,113 @@
+import contextvars
+import time
+from contextlib import contextmanager
+
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+# Per-request timings, collected by base.middleware.RequestMetricsMiddleware.
+#
+# The middleware starts a RequestMetrics for each request and puts it in a context variable, which follows
+# the request into sync_to_async/async_to_sync threads. Anything that wants to be measured adds to it:
+#   - every SQL query, through a wrapper installed on each database connection (count and time)
+#   - serializers that use TimedSerializerMixin (time spent turning objects into data)
+#   - file storage calls, through TimedStorageMixin or `with timer('storage'):` around boto3 calls
+# Outside a request (management commands, jobs) nothing is recorded.
+
+_current = contextvars.ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.durations = {'db': 0.0, 'serialize': 0.0, 'storage': 0.0}
+        self.serializer_depth = 0
+
+    def add(self, name, seconds):
+        self.durations[name] = self.durations.get(name, 0.0) + seconds
+
+    def total(self):
+        return time.perf_counter() - self.started
+
+
+def start_request():
+    metrics = RequestMetrics()
+    return metrics, _current.set(metrics)
+
+
+def finish_request(token):
+    _current.reset(token)
+
+
+def current():
+    return _current.get()
+
+
+@contextmanager
+def timer(name):
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.add(name, time.perf_counter() - started)
+
+
+def record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.add('db', time.perf_counter() - started)
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+# For serializers: times to_representation, counting nested serializers only once
+class TimedSerializerMixin:
+    def to_representation(self, instance):
+        metrics = _current.get()
+        if metrics is None or metrics.serializer_depth:
+            return super().to_representation(instance)
+        metrics.serializer_depth += 1
+        started = time.perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            metrics.serializer_depth -= 1
+            metrics.add('serialize', time.perf_counter() - started)
+
+
+# For storage backends: times the calls that go over the network (url() doesn't, for public buckets)
+class TimedStorageMixin:
+    def _open(self, *args, **kwargs):
+        with timer('storage'):
+            return super()._open(*args, **kwargs)
+
+    def _save(self, *args, **kwargs):
+        with timer('storage'):
+            return super()._save(*args, **kwargs)
+
+    def exists(self, *args, **kwargs):
+        with timer('storage'):
+            return super().exists(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with timer('storage'):
+            return super().delete(*args, **kwargs)
+
+    def size(self, *args, **kwargs):
+        with timer('storage'):
+            return super().size(*args, **kwargs)
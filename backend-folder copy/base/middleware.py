@@ -0,0 +1,103 @@
+import logging
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from . import metrics, replicas
+
+logger = logging.getLogger(__name__)
+
+
+# Measures every request (see base/metrics.py) and reports it two ways:
+#   - a Server-Timing header, which the browser's dev tools show in the Network tab's Timing view:
+#       Server-Timing: total;dur=48.2, db;dur=31.0;desc="4 queries", serialize;dur=9.7, storage;dur=0.0
+#   - one log line per request on the "base.middleware" logger, with the numbers as fields
+# Works for sync and async views. Turn the header off with SERVER_TIMING = False.
+class RequestMetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        request_metrics, token = metrics.start_request()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.finish_request(token)
+        return self.report(request, response, request_metrics)
+
+    async def __acall__(self, request):
+        request_metrics, token = metrics.start_request()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.finish_request(token)
+        return self.report(request, response, request_metrics)
+
+    def report(self, request, response, request_metrics):
+        total = request_metrics.total()
+        durations = request_metrics.durations
+        if settings.SERVER_TIMING:
+            response['Server-Timing'] = ', '.join([
+                f'total;dur={total * 1000:.1f}',
+                f'db;dur={durations["db"] * 1000:.1f};desc="{request_metrics.queries} queries"',
+                *(f'{name};dur={seconds * 1000:.1f}' for name, seconds in durations.items() if name != 'db'),
+            ])
+
+        fields = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 1),
+            'db_queries': request_metrics.queries,
+            **{f'{name}_ms': round(seconds * 1000, 1) for name, seconds in durations.items()},
+        }
+        logger.info(' '.join(f'{key}={value}' for key, value in fields.items()), extra={'metrics': fields})
+        return response
+
+
+# Lets GET/HEAD/OPTIONS requests read from a read replica, and pins a client to the primary for a while after
+# it writes (see base/replicas.py). Does nothing while settings.DATABASE_REPLICAS is empty.
+class ReplicaRoutingMiddleware:
+    sync_capable = True
+    async_capable = True
+    safe_methods = ('GET', 'HEAD', 'OPTIONS')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state, token = replicas.start_request(self.may_use_replica(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            replicas.finish_request(token)
+        return self.pin(request, response, state)
+
+    async def __acall__(self, request):
+        state, token = replicas.start_request(self.may_use_replica(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            replicas.finish_request(token)
+        return self.pin(request, response, state)
+
+    def may_use_replica(self, request):
+        return bool(settings.DATABASE_REPLICAS) and request.method in self.safe_methods \
+            and replicas.PIN_COOKIE not in request.COOKIES
+
+    def pin(self, request, response, state):
+        if settings.DATABASE_REPLICAS and (request.method not in self.safe_methods or state.wrote):
+            response.set_cookie(replicas.PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS, httponly=True,
+                                samesite='Lax')
+        return response
@@ -0,0 +1,30 @@
+from django.db import migrations, models
+
+
+# location is one of the hand-built tables Django doesn't manage, so the AddField below doesn't touch the
+# database: add the column (and its unique index) to the real table by hand. Existing rows get NULL keys,
+# which the unique index allows; `manage.py consolidate_locations` merges duplicates and fills them in.
+def add_location_key(apps, schema_editor):
+    Location = apps.get_model('base', 'Location')
+    schema_editor.add_field(Location, Location._meta.get_field('location_key'))
+
+
+def remove_location_key(apps, schema_editor):
+    Location = apps.get_model('base', 'Location')
+    schema_editor.remove_field(Location, Location._meta.get_field('location_key'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("base", "0003_alter_location_options"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="location",
+            name="location_key",
+            field=models.CharField(blank=True, max_length=100, null=True, unique=True),
+        ),
+        migrations.RunPython(add_location_key, remove_location_key),
+    ]
@@ -0,0 +1,76 @@
+from django.db import migrations
+
+
+# Indexes for the catalog, cart and purchase history queries (see base/query_plans.py), plus a unique
+# (cart_id, art_id) so the same piece can't be in a cart twice. They're declared in the models' Meta too,
+# which is what the test database is built from.
+#
+# The tables are hand-built ones Django doesn't manage, and the migration state of these models doesn't
+# include their foreign keys, so this works with table and column names directly. An index is skipped
+# when the table already has one that starts with the same columns (e.g. the one MySQL keeps for a
+# foreign key), and only indexes that exist are dropped when migrating backwards.
+
+# (table, index name, columns, unique)
+INDEXES = [
+    ('art_piece', 'art_piece_type_of_art_idx', ['type_of_art'], False),
+    ('art_piece', 'art_piece_user_idx', ['user_id'], False),
+    ('art_piece', 'art_piece_price_idx', ['price'], False),
+    ('purchase_order', 'purchase_order_buyer_date_idx', ['buyer_id', 'date_purchased'], False),
+    ('cart_art_piece', 'cart_art_piece_cart_art_uniq', ['cart_id', 'art_id'], True),
+]
+
+
+def existing_indexes(connection, table):
+    with connection.cursor() as cursor:
+        return connection.introspection.get_constraints(cursor, table)
+
+
+def is_covered(existing, columns, unique):
+    for constraint in existing.values():
+        if unique and constraint['unique'] and sorted(constraint['columns']) == sorted(columns):
+            return True
+        if not unique and (constraint['index'] or constraint['unique']) \
+                and constraint['columns'][:len(columns)] == columns:
+            return True
+    return False
+
+
+# a piece that's somehow in a cart more than once keeps only its first row
+def remove_duplicate_cart_items(schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('SELECT cart_id, art_id, MIN(cart_art_id) FROM cart_art_piece '
+                       'GROUP BY cart_id, art_id HAVING COUNT(*) > 1')
+        for cart_id, art_id, first_id in cursor.fetchall():
+            cursor.execute('DELETE FROM cart_art_piece WHERE cart_id = %s AND art_id = %s AND cart_art_id <> %s',
+                           [cart_id, art_id, first_id])
+
+
+def add_indexes(apps, schema_editor):
+    quote = schema_editor.quote_name
+    for table, name, columns, unique in INDEXES:
+        if is_covered(existing_indexes(schema_editor.connection, table), columns, unique):
+            continue
+        if table == 'cart_art_piece':
+            remove_duplicate_cart_items(schema_editor)
+        schema_editor.execute('CREATE %sINDEX %s ON %s (%s)' % (
+            'UNIQUE ' if unique else '', quote(name), quote(table), ', '.join(quote(column) for column in columns),
+        ))
+
+
+def remove_indexes(apps, schema_editor):
+    for table, name, columns, unique in INDEXES:
+        if name in existing_indexes(schema_editor.connection, table):
+            schema_editor.execute(schema_editor.sql_delete_index % {
+                'name': schema_editor.quote_name(name), 'table': schema_editor.quote_name(table),
+            })
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("base", "0004_location_location_key"),
+    ]
+
+    operations = [
+        migrations.RunPython(add_indexes, remove_indexes),
+    ]
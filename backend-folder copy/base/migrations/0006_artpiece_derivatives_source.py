@@ -0,0 +1,30 @@
+from django.db import migrations, models
+
+
+# art_piece is one of the hand-built tables Django doesn't manage, so the AddField below doesn't touch the
+# database: add the column to the real table by hand. Existing rows get NULL, i.e. no resized copies are
+# served for them until `manage.py generate_image_derivatives` has made them.
+def add_derivatives_source(apps, schema_editor):
+    ArtPiece = apps.get_model('base', 'ArtPiece')
+    schema_editor.add_field(ArtPiece, ArtPiece._meta.get_field('derivatives_source'))
+
+
+def remove_derivatives_source(apps, schema_editor):
+    ArtPiece = apps.get_model('base', 'ArtPiece')
+    schema_editor.remove_field(ArtPiece, ArtPiece._meta.get_field('derivatives_source'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("base", "0005_hot_query_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="artpiece",
+            name="derivatives_source",
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+        migrations.RunPython(add_derivatives_source, remove_derivatives_source),
+    ]
@@ -0,0 +1,34 @@
+from django.db import migrations, models
+
+
+# purchase_order_art_piece is one of the hand-built tables Django doesn't manage, so the AddField below doesn't
+# touch the database: add the column to the real table by hand. What was paid for older purchases wasn't
+# recorded anywhere, so they get the art piece's price as it is now, the closest thing available.
+def add_price(apps, schema_editor):
+    PurchaseOrderArtPiece = apps.get_model('base', 'PurchaseOrderArtPiece')
+    schema_editor.add_field(PurchaseOrderArtPiece, PurchaseOrderArtPiece._meta.get_field('price'))
+    schema_editor.execute(
+        'UPDATE purchase_order_art_piece SET price = '
+        '(SELECT art_piece.price FROM art_piece WHERE art_piece.art_id = purchase_order_art_piece.art_id)'
+    )
+
+
+def remove_price(apps, schema_editor):
+    PurchaseOrderArtPiece = apps.get_model('base', 'PurchaseOrderArtPiece')
+    schema_editor.remove_field(PurchaseOrderArtPiece, PurchaseOrderArtPiece._meta.get_field('price'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("base", "0006_artpiece_derivatives_source"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="purchaseorderartpiece",
+            name="price",
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True),
+        ),
+        migrations.RunPython(add_price, remove_price),
+    ]
@@ -0,0 +1,22 @@
+from django.db import migrations
+
+
+# A proxy of Users, so there's nothing to do in the database
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("base", "0007_purchaseorderartpiece_price"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TokenUser",
+            fields=[],
+            options={
+                "proxy": True,
+                "indexes": [],
+                "constraints": [],
+            },
+            bases=("base.users",),
+        ),
+    ]
@@ -5,15 +5,29 @@ from django.contrib.auth.hashers import make_password, check_password
 # It includes models for users, art pieces, purchase orders, and other related entities.
 # Each model corresponds to a table in the database, and the fields in each model correspond to the columns in those tables.
 
+# "Marin, CA", " marin , ca" and "MARIN, CA" are all the same place: lowercased, with whitespace collapsed
+def location_key(county, state):
+    return f"{' '.join(county.split()).casefold()}|{' '.join(state.split()).casefold()}"
+
+
 class Location(models.Model):
     location_id = models.AutoField(primary_key=True)  # Explicitly define the PK field
     county = models.CharField(max_length=45)
     state = models.CharField(max_length=45)
+    # unique, so the same county/state can't be inserted twice (see artpiece/locations.py).
+    # Rows from before the column existed are NULL until `manage.py consolidate_locations` fills them in.
+    location_key = models.CharField(max_length=100, unique=True, blank=True, null=True)
 
     class Meta:
         db_table = 'location'  # Specify the exact table name
         managed = False  # Let Django know not to manage this table, because it exists in the DB already
 
+    def save(self, *args, **kwargs):
+        self.location_key = location_key(self.county, self.state)
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'location_key'}
+        super().save(*args, **kwargs)
+
 
 # In base/models.py
 
@@ -25,6 +39,9 @@ class ArtPiece(models.Model):
     image = models.ImageField(upload_to='art_pieces/', blank=True, null=True)
     stock_amount = models.IntegerField()
     price = models.DecimalField(max_digits=5, decimal_places=2, blank=True, null=True)
+    # name of the image the resized copies were made from (artpiece/images.py); they're only served while it
+    # matches image, so a new image has no variants until the background job has made them
+    derivatives_source = models.CharField(max_length=100, blank=True, null=True)
     
     # Foreign keys
     location = models.ForeignKey(Location, on_delete=models.RESTRICT, db_column='location_id')
@@ -33,6 +50,12 @@ class ArtPiece(models.Model):
     class Meta:
         db_table = 'art_piece'
         managed = False
+        # added to the hand-built table by migration 0005 (catalog filters, seller pages, price filters)
+        indexes = [
+            models.Index(fields=['type_of_art'], name='art_piece_type_of_art_idx'),
+            models.Index(fields=['user'], name='art_piece_user_idx'),
+            models.Index(fields=['price'], name='art_piece_price_idx'),
+        ]
         
 
 
@@ -132,6 +155,10 @@ class CartArtPiece(models.Model):
     class Meta:
         managed = False
         db_table = 'cart_art_piece'
+        # a piece is in a cart at most once; also the index for "what's in this cart" (migration 0005)
+        constraints = [
+            models.UniqueConstraint(fields=['cart', 'art'], name='cart_art_piece_cart_art_uniq'),
+        ]
 
 
 class DjangoAdminLog(models.Model):
@@ -189,12 +216,18 @@ class PurchaseOrder(models.Model):
     class Meta:
         managed = False
         db_table = 'purchase_order'
+        # purchase history: one buyer's orders, newest first (migration 0005)
+        indexes = [
+            models.Index(fields=['buyer', 'date_purchased'], name='purchase_order_buyer_date_idx'),
+        ]
 
 
 class PurchaseOrderArtPiece(models.Model):
     purchase_order_art_id = models.AutoField(primary_key=True)
     purchase_order = models.ForeignKey(PurchaseOrder, models.DO_NOTHING)
     art = models.ForeignKey(ArtPiece, models.DO_NOTHING)
+    # what the buyer paid, copied from the art piece at checkout (migration 0007)
+    price = models.DecimalField(max_digits=5, decimal_places=2, blank=True, null=True)
 
     class Meta:
         managed = False
@@ -217,7 +250,30 @@ class Users(models.Model):
     def check_password(self, raw_password):
         return check_password(raw_password, self.password)
 
+    # needed so DRF (and our views) can treat a Users row as request.user, see base/authentication.py
+    @property
+    def is_authenticated(self):
+        return True
+
+    @property
+    def is_anonymous(self):
+        return False
+
 
     class Meta:
         managed = False
-        db_table = 'users'
\ No newline at end of file
+        db_table = 'users'
+
+
+# request.user for requests authenticated with a JWT (base/authentication.py). It's built from the token's
+# claims rather than loaded, so everything but the id and username is blank, and saving it would overwrite the
+# real row with those blanks. Load the user with Users.objects.get(pk=...) to change it.
+class TokenUser(Users):
+    class Meta:
+        proxy = True
+
+    def save(self, *args, **kwargs):
+        raise TypeError('A user built from a token can\'t be saved; load it from the database first')
+
+    def delete(self, *args, **kwargs):
+        raise TypeError('A user built from a token can\'t be deleted; load it from the database first')
@@ -0,0 +1,69 @@
+import json
+import re
+
+from django.db import connections
+from django.db.models import F
+
+from .models import ArtPiece, CartArtPiece, Location, PurchaseOrder, PurchaseOrderArtPiece, Users
+
+# EXPLAIN checks for the queries behind the busiest endpoints.
+#
+# Every one of these filters or sorts on something, and should be answered from an index (the ones in
+# migration 0005, the foreign key indexes and the primary keys), never by reading a whole table. The
+# unfiltered first catalog page isn't here: it reads art_piece in primary key order and stops after a page,
+# which SQLite's plan doesn't tell apart from a full scan.
+#
+# Used by QueryPlanTests (on the test database) and `python manage.py check_query_plans` (on a real one;
+# on a nearly empty MySQL table the optimizer may prefer a scan, so load data first, e.g. with
+# generate_synthetic_data).
+
+
+# name -> queryset, shaped like the queries the views run (the ids don't need to exist)
+def hot_queries():
+    return {
+        'catalog filtered by type': ArtPiece.objects.filter(type_of_art__in=['Painting'])
+                                                    .select_related('user', 'location').order_by('art_id')[:25],
+        'catalog filtered by price': ArtPiece.objects.filter(price__gte=10, price__lte=50).order_by('art_id')[:25],
+        'catalog sorted by price': ArtPiece.objects.order_by('price')[:25],
+        "a seller's art": ArtPiece.objects.filter(user_id=1).select_related('user', 'location'),
+        'cart contents': CartArtPiece.objects.filter(cart_id=1).select_related('art__user', 'art__location'),
+        'is it in the cart': CartArtPiece.objects.filter(cart_id=1, art_id=1),
+        'purchase history': PurchaseOrder.objects.filter(buyer_id=1)
+                                                 .order_by('-date_purchased', '-purchase_order_id')[:21],
+        'purchase order items': PurchaseOrderArtPiece.objects.filter(purchase_order_id__in=[1, 2])
+                                                             .select_related('art__user', 'art__location'),
+        'location by key': Location.objects.filter(location_key='marin|ca'),
+        'session user and cart': Users.objects.annotate(current_cart_id=F('cart__cart_id')).filter(pk=1),
+    }
+
+
+def _mysql_scans(node):
+    if isinstance(node, dict):
+        if node.get('access_type') == 'ALL':
+            yield node.get('table_name')
+        for value in node.values():
+            yield from _mysql_scans(value)
+    elif isinstance(node, list):
+        for value in node:
+            yield from _mysql_scans(value)
+
+
+# Tables the database would read from start to end to answer the queryset, according to EXPLAIN
+def full_table_scans(queryset):
+    vendor = connections[queryset.db].vendor
+    if vendor == 'mysql':
+        return list(_mysql_scans(json.loads(queryset.explain(format='json'))))
+    if vendor == 'sqlite':
+        # "SCAN art_piece" reads the table; "SCAN art_piece USING INDEX ..." walks an index in order instead
+        return re.findall(r'\bSCAN (\w+)$', queryset.explain(), flags=re.MULTILINE)
+    raise ValueError(f"Can't read {vendor} query plans, only MySQL and SQLite ones")
+
+
+# {query name: [tables scanned]} for the hot queries that scan anything
+def check_hot_queries(using='default'):
+    scans = {}
+    for name, queryset in hot_queries().items():
+        tables = full_table_scans(queryset.using(using))
+        if tables:
+            scans[name] = tables
+    return scans
@@ -0,0 +1,130 @@
+import contextvars
+import logging
+import random
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+logger = logging.getLogger(__name__)
+
+# Read replicas: GET traffic reads from copies of the database so it doesn't compete with writes on the primary.
+#
+# base.middleware.ReplicaRoutingMiddleware decides per request whether reads may go to a replica, and
+# ReplicaRouter (settings.DATABASE_ROUTERS) sends them there:
+#   - only GET/HEAD/OPTIONS requests read from a replica; everything else, and anything outside a request
+#     (management commands, jobs), uses the primary
+#   - one replica is picked per request, so every query in it sees the same snapshot
+#   - writes always go to the primary, and once a request has written, its later reads do too
+#   - a client that just wrote (added to the cart, checked out, created a listing, logged in...) gets a cookie
+#     that sends its reads to the primary for REPLICA_PIN_SECONDS, so it sees its own change even if the
+#     replicas are a little behind
+#   - a replica that can't be connected to is skipped for REPLICA_RETRY_SECONDS. If none is left,
+#     REPLICA_FALLBACK says what happens: 'primary' reads from the primary, 'error' answers 503 instead
+#     (so a replica outage doesn't move all the read traffic onto the primary)
+# Raw SQL through django.db.connection (the search index, artpiece/search.py) always uses the primary.
+# So does the database cache (settings.CACHES): its reads must see the latest catalog version and denylist
+# entries, and filling it on a GET isn't a write of the request's data, so it doesn't pin anything.
+#
+# DATABASE_REPLICAS lists the replica aliases in settings.DATABASES; when it's empty everything uses the primary.
+
+PIN_COOKIE = 'use_primary_db'
+CACHE_APP_LABEL = 'django_cache'  # the app_label DatabaseCache gives its table's model
+
+_current = contextvars.ContextVar('replica_routing', default=None)
+_unavailable_until = {}  # replica alias -> time.monotonic() after which to try it again (per process)
+
+
+class ReplicaUnavailable(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'The service is temporarily unavailable, please try again shortly.'
+    default_code = 'replica_unavailable'
+
+
+class RoutingState:
+    def __init__(self, use_replica):
+        self.use_replica = use_replica
+        self.replica = None  # picked on the first read
+        self.wrote = False
+
+
+def start_request(use_replica):
+    state = RoutingState(use_replica)
+    return state, _current.set(state)
+
+
+def finish_request(token):
+    _current.reset(token)
+
+
+# Read from the primary inside the block, e.g. `with use_primary(data_just_changed):`
+@contextmanager
+def use_primary(enabled=True):
+    state = _current.get()
+    if state is None or not enabled:
+        yield
+        return
+    previous, state.use_replica = state.use_replica, False
+    try:
+        yield
+    finally:
+        state.use_replica = previous
+
+
+def is_available(alias):
+    if _unavailable_until.get(alias, 0) > time.monotonic():
+        return False
+    try:
+        connections[alias].ensure_connection()
+    except DatabaseError:
+        logger.warning('Read replica %s is unavailable, skipping it for %ss', alias, settings.REPLICA_RETRY_SECONDS,
+                       exc_info=True)
+        _unavailable_until[alias] = time.monotonic() + settings.REPLICA_RETRY_SECONDS
+        return False
+    return True
+
+
+# for tests
+def forget_unavailable_replicas():
+    _unavailable_until.clear()
+
+
+def pick_replica():
+    replicas = list(settings.DATABASE_REPLICAS)
+    random.shuffle(replicas)
+    for alias in replicas:
+        if is_available(alias):
+            return alias
+    if settings.REPLICA_FALLBACK == 'error':
+        raise ReplicaUnavailable()
+    return DEFAULT_DB_ALIAS
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label == CACHE_APP_LABEL:
+            return DEFAULT_DB_ALIAS
+        state = _current.get()
+        if state is None or not state.use_replica or state.wrote:
+            return DEFAULT_DB_ALIAS
+        if state.replica is None:
+            state.replica = pick_replica()
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label == CACHE_APP_LABEL:
+            return DEFAULT_DB_ALIAS
+        state = _current.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    # rows from the primary and from a replica are the same rows
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
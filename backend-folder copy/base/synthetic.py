@@ -0,0 +1,212 @@
+import bisect
+import itertools
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.db.models import Max
+
+from .models import ArtPiece, Cart, CartArtPiece, Location, PurchaseOrder, PurchaseOrderArtPiece, Users, location_key
+
+# Synthetic marketplace data for scale testing (`python manage.py generate_synthetic_data`).
+#
+# Real marketplaces are lopsided, and so is this data:
+#   - a small share of users sell, and a few of those sellers list most of the art (Zipf-distributed)
+#   - a few locations have most of the listings, with a long tail of places that have one or two
+#   - a few hot pieces are in many carts and orders, and repeat customers place most of the orders
+#   - most pieces are one-offs (stock 1), prices are log-normal
+#
+# Everything comes from one random.Random(seed), and primary keys are assigned here (starting after the
+# largest existing id) instead of by the database, so the same seed and counts produce the same rows on any
+# machine (order dates count back from today) and MySQL never has to report inserted ids back. Rows are
+# inserted with bulk_create, batch_size at a time, each batch committed on its own; of what's been inserted
+# only each art piece's seller and each order's buyer are kept in memory.
+
+ZIPF_EXPONENT = 1.1
+SELLER_SHARE = 0.1  # of users
+CART_SHARE = 0.3  # of users that have a cart
+ORDER_HISTORY_DAYS = 730
+
+STATES = ['AL', 'AK', 'AZ', 'AR', 'CA', 'CO', 'CT', 'DE', 'FL', 'GA', 'HI', 'ID', 'IL', 'IN', 'IA', 'KS', 'KY',
+          'LA', 'ME', 'MD', 'MA', 'MI', 'MN', 'MS', 'MO', 'MT', 'NE', 'NV', 'NH', 'NJ', 'NM', 'NY', 'NC', 'ND',
+          'OH', 'OK', 'OR', 'PA', 'RI', 'SC', 'SD', 'TN', 'TX', 'UT', 'VT', 'VA', 'WA', 'WV', 'WI', 'WY']
+TYPES_OF_ART = [('Painting', 35), ('Photography', 30), ('Print', 15), ('Drawing', 10), ('Sculpture', 6),
+                ('Textile', 4)]
+FIRST_NAMES = ['Ada', 'Ben', 'Cleo', 'Dev', 'Eli', 'Fern', 'Gus', 'Hana', 'Ivy', 'Jo', 'Kai', 'Lena', 'Milo',
+               'Nia', 'Oren', 'Pia', 'Quinn', 'Rosa', 'Sam', 'Tess', 'Uma', 'Vic', 'Wren', 'Yuri', 'Zoe']
+LAST_NAMES = ['Alder', 'Brook', 'Cedar', 'Dale', 'Ellis', 'Ford', 'Grove', 'Hale', 'Isles', 'Jay', 'Knox',
+              'Lake', 'Moss', 'North', 'Oak', 'Park', 'Reed', 'Stone', 'Thorn', 'Vale', 'West', 'Yates']
+SUBJECTS = ['river', 'mountain', 'heron', 'fern', 'canyon', 'meadow', 'fog', 'tide', 'pine', 'aspen',
+            'desert', 'glacier', 'otter', 'poppy', 'redwood', 'marsh', 'dune', 'falcon', 'lichen', 'sunrise',
+            'coast', 'prairie', 'waterfall', 'moss', 'owl', 'salmon', 'tundra', 'bay', 'ridge', 'wildflower']
+MOODS = ['quiet', 'golden', 'misty', 'wild', 'early', 'winter', 'summer', 'evening', 'hidden', 'northern']
+
+
+# Picks from `values` with probability falling off as 1/rank^exponent, rank being a random order of the
+# values (so the popular ones aren't simply the lowest ids)
+class ZipfChooser:
+    def __init__(self, values, rng, exponent=ZIPF_EXPONENT):
+        self.values = list(values)
+        rng.shuffle(self.values)
+        self.cum_weights = list(itertools.accumulate(1 / rank ** exponent for rank in range(1, len(self.values) + 1)))
+        self.rng = rng
+
+    def choice(self):
+        return self.values[bisect.bisect(self.cum_weights, self.rng.random() * self.cum_weights[-1])]
+
+
+# The art pieces a run inserted: ids first_id, first_id + 1, ... and their sellers and prices in the same order
+class InsertedArt:
+    def __init__(self, first_id):
+        self.first_id = first_id
+        self.sellers = []
+        self.prices = []
+
+
+def next_id(model):
+    return (model.objects.aggregate(largest=Max(model._meta.pk.attname))['largest'] or 0) + 1
+
+
+class SyntheticDataGenerator:
+    def __init__(self, users, locations, art_pieces, orders, seed=0, batch_size=5000, password='password123',
+                 prefix='synth', progress=None):
+        self.counts = {'users': users, 'locations': locations, 'art_pieces': art_pieces, 'orders': orders}
+        self.rng = random.Random(seed)
+        self.batch_size = batch_size
+        self.password = password
+        self.prefix = prefix  # usernames, emails and counties start with this, so runs with another prefix don't clash
+        self.progress = progress  # called with (table, rows inserted so far) after every batch
+        self.created = {}
+
+    def run(self):
+        user_ids = self.create_users()
+        location_ids = self.create_locations()
+        art = self.create_art_pieces(user_ids, location_ids)
+        hot_items = ZipfChooser(range(len(art.sellers)), self.rng)
+        self.create_carts(user_ids, art, hot_items)
+        self.create_orders(user_ids, art, hot_items)
+        return self.created
+
+    def insert(self, model, rows):
+        table = model._meta.db_table
+        self.created[table] = 0
+        for batch in iter(lambda: list(itertools.islice(rows, self.batch_size)), []):
+            with transaction.atomic():
+                model.objects.bulk_create(batch)
+            self.created[table] += len(batch)
+            if self.progress:
+                self.progress(table, self.created[table])
+
+    def create_users(self):
+        first_id = next_id(Users)
+        password = make_password(self.password)  # one hash for everyone; hashing millions would take hours
+        user_ids = range(first_id, first_id + self.counts['users'])
+
+        def rows():
+            for user_id in user_ids:
+                yield Users(
+                    user_id=user_id,
+                    username=f'{self.prefix}{user_id}',
+                    email=f'{self.prefix}{user_id}@example.com',
+                    first_name=self.rng.choice(FIRST_NAMES),
+                    last_name=self.rng.choice(LAST_NAMES),
+                    password=password,
+                )
+
+        self.insert(Users, rows())
+        return user_ids
+
+    def create_locations(self):
+        first_id = next_id(Location)
+        location_ids = range(first_id, first_id + self.counts['locations'])
+
+        def rows():
+            for location_id in location_ids:
+                county, state = f'{self.prefix.title()} County {location_id}', self.rng.choice(STATES)
+                yield Location(location_id=location_id, county=county, state=state,
+                               location_key=location_key(county, state))
+
+        self.insert(Location, rows())
+        return location_ids
+
+    def create_art_pieces(self, user_ids, location_ids):
+        sellers = ZipfChooser(self.rng.sample(user_ids, max(1, int(len(user_ids) * SELLER_SHARE))), self.rng)
+        locations = ZipfChooser(location_ids, self.rng)
+        types, type_weights = zip(*TYPES_OF_ART)
+        art = InsertedArt(next_id(ArtPiece))
+
+        def rows():
+            for art_id in range(art.first_id, art.first_id + self.counts['art_pieces']):
+                subject, mood = self.rng.choice(SUBJECTS), self.rng.choice(MOODS)
+                type_of_art = self.rng.choices(types, type_weights)[0]
+                seller_id = sellers.choice()
+                art.sellers.append(seller_id)
+                piece = ArtPiece(
+                    art_id=art_id,
+                    name=f'{mood.title()} {subject}',
+                    description=f'{type_of_art} of a {mood} {subject}, with '
+                                + ', '.join(self.rng.sample(SUBJECTS, 3)) + '.',
+                    type_of_art=type_of_art,
+                    image=f'art_pieces/{self.prefix}_{art_id}.jpg',
+                    stock_amount=1 if self.rng.random() < 0.7 else self.rng.randint(2, 50),
+                    price=Decimal(min(99999, max(500, int(self.rng.lognormvariate(8.5, 0.9))))) / 100,
+                    user_id=seller_id,
+                    location_id=locations.choice(),
+                )
+                art.prices.append(piece.price)
+                yield piece
+
+        self.insert(ArtPiece, rows())
+        return art
+
+    # 1+ art ids from the hot-item distribution, never the buyer's own art
+    def pick_items(self, hot_items, art, buyer_id):
+        count = min(1 + int(self.rng.expovariate(0.7)), 10)
+        picked = sorted({hot_items.choice() for _ in range(count)})
+        return [art.first_id + index for index in picked if art.sellers[index] != buyer_id]
+
+    def create_carts(self, user_ids, art, hot_items):
+        owners = sorted(self.rng.sample(user_ids, int(len(user_ids) * CART_SHARE)))
+        first_cart_id = next_id(Cart)
+        self.insert(Cart, (Cart(cart_id=first_cart_id + n, user_id=user_id) for n, user_id in enumerate(owners)))
+
+        first_item_id = next_id(CartArtPiece)
+        item_ids = itertools.count(first_item_id)
+
+        def rows():
+            for n, user_id in enumerate(owners):
+                for art_id in self.pick_items(hot_items, art, user_id):
+                    yield CartArtPiece(cart_art_id=next(item_ids), cart_id=first_cart_id + n, art_id=art_id)
+
+        self.insert(CartArtPiece, rows())
+
+    def create_orders(self, user_ids, art, hot_items):
+        buyers = ZipfChooser(user_ids, self.rng, exponent=0.8)  # repeat customers, but a long tail too
+        first_order_id = next_id(PurchaseOrder)
+        order_ids = range(first_order_id, first_order_id + self.counts['orders'])
+        today = date.today()
+        order_buyers = []
+
+        def orders():
+            for order_id in order_ids:
+                order_buyers.append(buyers.choice())
+                yield PurchaseOrder(
+                    purchase_order_id=order_id,
+                    buyer_id=order_buyers[-1],
+                    date_purchased=today - timedelta(days=self.rng.randrange(ORDER_HISTORY_DAYS)),
+                )
+
+        self.insert(PurchaseOrder, orders())
+
+        first_item_id = next_id(PurchaseOrderArtPiece)
+        item_ids = itertools.count(first_item_id)
+
+        def items():
+            for order_id, buyer_id in zip(order_ids, order_buyers):
+                for art_id in self.pick_items(hot_items, art, buyer_id):
+                    yield PurchaseOrderArtPiece(purchase_order_art_id=next(item_ids), purchase_order_id=order_id,
+                                                art_id=art_id, price=art.prices[art_id - art.first_id])
+
+        self.insert(PurchaseOrderArtPiece, items())
@@ -0,0 +1,73 @@
+from collections import namedtuple
+from decimal import Decimal
+from itertools import count
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from base.models import ArtPiece, Location, Users
+
+# Small helpers for building rows in tests. Every model is unmanaged, so there are no fixtures
+# or factories from migrations to lean on; these keep the test files short.
+
+_sequence = count(1)
+
+
+def make_user(**fields):
+    n = next(_sequence)
+    data = {
+        'username': f'user{n}',
+        'email': f'user{n}@example.com',
+        'first_name': 'Test',
+        'last_name': f'User{n}',
+    }
+    data.update(fields)
+    user = Users(**data)
+    user.set_password(fields.get('password', 'password123'))
+    user.save()
+    return user
+
+
+def make_location(**fields):
+    # a different county each time, since a county/state pair can only exist once (Location.location_key)
+    data = {'county': f'County {next(_sequence)}', 'state': 'CA'}
+    data.update(fields)
+    return Location.objects.create(**data)
+
+
+def make_art_piece(user, location, **fields):
+    n = next(_sequence)
+    data = {
+        'name': f'Art piece {n}',
+        'type_of_art': 'Painting',
+        'description': 'A test piece',
+        'stock_amount': 5,
+        'price': Decimal('25.00'),
+        'user': user,
+        'location': location,
+    }
+    data.update(fields)
+    return ArtPiece.objects.create(**data)
+
+
+def log_in(client, user):
+    # same thing LoginAPIView does: store the user id in the session
+    session = client.session
+    session['user_id'] = user.user_id
+    session.save()
+
+
+# ---- query budgets ----
+
+# What one request to an endpoint may cost (see QueryBudgetTests in base/tests.py). `path` and `data` are
+# formatted with the ids of the rows the test built; `content` is how data is sent ('json' or 'multipart').
+Budget = namedtuple('Budget', 'method path max_queries max_bytes data content status',
+                    defaults=(None, 'json', 200))
+
+
+# (response, number of SQL queries it ran, size of the body in bytes)
+def measure_request(client, method, path, data=None, content='json'):
+    kwargs = {'content_type': 'application/json'} if content == 'json' and data is not None else {}
+    with CaptureQueriesContext(connection) as queries:
+        response = getattr(client, method.lower())(path, data, **kwargs)
+    return response, len(queries), len(response.content)
@@ -1,3 +1,461 @@
-from django.test import TestCase
+import re
+import tempfile
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, OperationalError, connection, connections, transaction
+from django.db.models import F
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, get_resolver
+
+try:
+    from moto import mock_aws
+except ImportError:
+    mock_aws = None
+
+from artpiece import imports, search
+from artpiece.cache import bump_catalog_version
+from artpiece.locations import forget_locations
+from base import replicas
+from base.authentication import load_user, user_cache_key
+from base.checks import check_shared_cache
+from jobs.queue import enqueue
+from base.query_plans import check_hot_queries, full_table_scans
+from base.models import ArtPiece, Cart, CartArtPiece, Location, PurchaseOrder, PurchaseOrderArtPiece, Users
+from base.testing import Budget, log_in, make_art_piece, make_location, make_user, measure_request
+
+
+class SessionUserAuthenticationTests(TestCase):
+
+    def setUp(self):
+        self.user = make_user()
+        log_in(self.client, self.user)
+
+    def test_user_and_cart_loaded_in_one_query(self):
+        cart = Cart.objects.create(user=self.user)
+        with CaptureQueriesContext(connection) as queries:
+            user = load_user(self.user.user_id)
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(user.current_cart_id, cart.cart_id)
+        self.assertIsNone(load_user(make_user().user_id).current_cart_id)
+
+    def test_unknown_session_user_is_not_authenticated(self):
+        self.user.delete()
+        response = self.client.delete('/base/cart/clear/')
+        self.assertEqual(response.status_code, 401)
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+                       AUTH_USER_CACHE_TIMEOUT=30)
+    def test_cached_user_learns_about_new_cart(self):
+        cache.clear()
+        piece = make_art_piece(make_user(), make_location())
+        self.assertEqual(self.client.delete('/base/cart/clear/').data['message'], 'Cart is already empty')
+
+        self.assertEqual(self.client.post(f'/base/cart/add-to-cart/{piece.art_id}/').status_code, 201)
+        self.client.get('/base/cart/summary/')  # reloads the user (now with a cart) into the cache
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.delete(f'/base/cart/remove/{piece.art_id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(CartArtPiece.objects.exists())
+        # session + delete; the user row and cart id come from the cache
+        self.assertFalse(any('FROM "users"' in query['sql'] for query in queries))
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+                       AUTH_USER_CACHE_TIMEOUT=30)
+    def test_password_hash_is_not_cached(self):
+        cache.clear()
+        load_user(self.user.user_id)
+        cached = cache.get(user_cache_key(self.user.user_id))
+        self.assertEqual(cached.username, self.user.username)
+        self.assertNotIn('password', cached.__dict__)
+
+
+
+class SharedCacheCheckTests(TestCase):
+
+    def test_per_process_cache_is_flagged(self):
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            self.assertEqual([warning.id for warning in check_shared_cache(None)], ['base.W001'])
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+                                                   'LOCATION': 'django_cache'}}):
+            self.assertEqual(check_shared_cache(None), [])
+
+class RequestMetricsMiddlewareTests(TestCase):
+
+    def setUp(self):
+        self.piece = make_art_piece(make_user(), make_location())
+
+    def timings(self, response):
+        return dict(re.findall(r'(\w+);dur=([\d.]+)', response['Server-Timing']))
+
+    def test_server_timing_counts_the_requests_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/base/artpieces/{self.piece.art_id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(self.timings(response)), {'total', 'db', 'serialize', 'storage'})
+        self.assertIn(f'desc="{len(queries)} queries"', response['Server-Timing'])
+        self.assertGreater(float(self.timings(response)['total']), 0)
+
+    def test_async_views_are_measured(self):
+        response = self.client.get(f'/base/artpieces/async/{self.piece.art_id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('desc="1 queries"', response['Server-Timing'])
+
+    def test_each_request_is_logged(self):
+        with self.assertLogs('base.middleware', 'INFO') as logs:
+            self.client.get('/base/artpieces/locations/')
+        metrics = logs.records[0].metrics
+        self.assertEqual((metrics['method'], metrics['path'], metrics['status']),
+                         ('GET', '/base/artpieces/locations/', 200))
+        self.assertEqual(metrics['db_queries'], 1)
+        self.assertIn('db_queries=1', logs.output[0])
+
+    @override_settings(SERVER_TIMING=False)
+    def test_header_can_be_turned_off(self):
+        self.assertNotIn('Server-Timing', self.client.get('/base/artpieces/locations/'))
+
+
+
+# 'replica' is a second SQLite test database. The art piece is copied to it under another name, so each
+# response shows which database it was read from.
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(TestCase):
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        replicas.forget_unavailable_replicas()
+        self.buyer = make_user()
+        self.piece = make_art_piece(make_user(), make_location(), name='Primary')
+        for row in (self.piece.user, self.piece.location, self.piece):
+            row.save(using='replica')
+        ArtPiece.objects.using('replica').filter(pk=self.piece.pk).update(name='Replica')
+
+    def name_read(self, client=None, path='/base/artpieces/{}/'):
+        response = (client or self.client).get(path.format(self.piece.art_id))
+        self.assertEqual(response.status_code, 200)
+        return response.json()['name']
+
+    def test_reads_go_to_the_replica(self):
+        self.assertEqual(self.name_read(), 'Replica')
+        self.assertEqual(self.name_read(path='/base/artpieces/async/{}/'), 'Replica')
+        self.assertNotIn(replicas.PIN_COOKIE, self.client.get('/base/artpieces/locations/').cookies)
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas_everything_uses_the_primary(self):
+        self.assertEqual(self.name_read(), 'Primary')
+
+    def test_writing_pins_the_client_to_the_primary(self):
+        client = Client()
+        log_in(client, self.buyer)
+        response = client.post(f'/base/cart/add-to-cart/{self.piece.art_id}/')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.cookies[replicas.PIN_COOKIE]['max-age'], settings.REPLICA_PIN_SECONDS)
+        self.assertEqual(self.name_read(client), 'Primary')
+
+        del client.cookies[replicas.PIN_COOKIE]  # what the browser does once max-age has passed
+        self.assertEqual(self.name_read(client), 'Replica')
+
+    def test_reads_after_a_write_in_the_same_request_use_the_primary(self):
+        state, token = replicas.start_request(use_replica=True)
+        try:
+            self.assertEqual(ArtPiece.objects.get(pk=self.piece.pk).name, 'Replica')
+            make_location()
+            self.assertEqual(ArtPiece.objects.get(pk=self.piece.pk).name, 'Primary')
+        finally:
+            replicas.finish_request(token)
+        self.assertTrue(state.wrote)
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_catalog_cache_is_filled_from_the_primary_right_after_a_change(self):
+        cache.clear()
+        bump_catalog_version()
+        self.assertEqual(self.name_read(), 'Primary')
+        with override_settings(REPLICA_PIN_SECONDS=0):
+            bump_catalog_version()
+            self.assertEqual(self.name_read(), 'Replica')
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+                                           'LOCATION': 'django_cache'}})
+    def test_database_cache_uses_the_primary_without_pinning(self):
+        call_command('createcachetable', database='default')  # the test settings use DummyCache
+        cache.clear()
+        response = self.client.get('/base/artpieces/locations/')  # a cache miss, so the response is stored
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(replicas.PIN_COOKIE, response.cookies)
+        with override_settings(REPLICA_PIN_SECONDS=0):  # the catalog version was only just created
+            self.assertEqual(self.name_read(), 'Replica')
+
+        # inside a replica request the cache still reads and writes the primary's table (the test replica
+        # doesn't even have one)
+        state, token = replicas.start_request(use_replica=True)
+        try:
+            cache.set('fresh', 1)
+            self.assertEqual(cache.get('fresh'), 1)
+        finally:
+            replicas.finish_request(token)
+        self.assertFalse(state.wrote)
+
+    def test_unavailable_replica_falls_back_to_the_primary(self):
+        with mock.patch.object(connections['replica'], 'ensure_connection', side_effect=OperationalError), \
+                self.assertLogs('base.replicas', 'WARNING'):
+            self.assertEqual(self.name_read(), 'Primary')
+        self.assertEqual(self.name_read(), 'Primary')  # not retried until REPLICA_RETRY_SECONDS have passed
+
+    @override_settings(REPLICA_FALLBACK='error')
+    def test_unavailable_replica_can_be_an_error(self):
+        with mock.patch.object(connections['replica'], 'ensure_connection', side_effect=OperationalError), \
+                self.assertLogs('base.replicas', 'WARNING'):
+            response = self.client.get(f'/base/artpieces/{self.piece.art_id}/')
+        self.assertEqual(response.status_code, 503)
+
+class SyntheticDataTests(TestCase):
+
+    def generate(self, **options):
+        call_command('generate_synthetic_data', users=40, locations=10, art_pieces=200, orders=50, seed=3,
+                     stdout=StringIO(), **options)
+
+    def snapshot(self):
+        return (
+            list(ArtPiece.objects.order_by('art_id').values_list('art_id', 'name', 'price', 'user_id', 'location_id')),
+            list(PurchaseOrderArtPiece.objects.order_by('pk').values_list('purchase_order__buyer_id', 'art_id')),
+            list(CartArtPiece.objects.order_by('pk').values_list('cart__user_id', 'art_id')),
+        )
+
+    def test_rows_are_skewed_and_consistent(self):
+        self.generate()
+        self.assertEqual((Users.objects.count(), Location.objects.count(), ArtPiece.objects.count(),
+                          PurchaseOrder.objects.count(), Cart.objects.count()), (40, 10, 200, 50, 12))
+        sellers = ArtPiece.objects.values('user_id').distinct().count()
+        self.assertLessEqual(sellers, 4)  # 10% of users sell
+        self.assertFalse(PurchaseOrderArtPiece.objects.filter(art__user_id=F('purchase_order__buyer_id')).exists())
+        self.assertFalse(CartArtPiece.objects.filter(art__user_id=F('cart__user_id')).exists())
+        self.assertTrue(PurchaseOrderArtPiece.objects.exists())
+        self.assertFalse(Location.objects.filter(location_key__isnull=True).exists())
+
+    def test_same_seed_gives_the_same_data(self):
+        self.generate(skip_search_index=True)
+        first = self.snapshot()
+        for model in (PurchaseOrderArtPiece, PurchaseOrder, CartArtPiece, Cart, ArtPiece, Location, Users):
+            model.objects.all().delete()
+
+        self.generate(skip_search_index=True)
+        self.assertEqual(self.snapshot(), first)
+
+    def test_adds_to_existing_rows(self):
+        existing = make_art_piece(make_user(), make_location())
+        self.generate(skip_search_index=True)
+        self.assertEqual(ArtPiece.objects.count(), 201)
+        self.assertEqual(ArtPiece.objects.order_by('art_id').first(), existing)
+
+
+
+class QueryPlanTests(TestCase):
+
+    def setUp(self):
+        seller = make_user()
+        location = make_location()
+        for n in range(30):
+            make_art_piece(seller, location, price=n + 1, type_of_art=['Painting', 'Print', 'Sculpture'][n % 3])
+
+    def test_hot_queries_use_indexes(self):
+        self.assertEqual(check_hot_queries(), {})
+        call_command('check_query_plans', stdout=StringIO())
+
+    def test_full_scans_are_reported(self):
+        self.assertEqual(full_table_scans(ArtPiece.objects.filter(description='x')), ['art_piece'])
+
+    def test_unsupported_database_is_a_command_error(self):
+        with mock.patch.object(connection, 'vendor', 'oracle'), \
+                self.assertRaisesRegex(CommandError, "Can't read oracle query plans"):
+            call_command('check_query_plans', stdout=StringIO())
+
+    def test_art_piece_can_only_be_in_a_cart_once(self):
+        cart = Cart.objects.create(user=make_user())
+        art_piece = ArtPiece.objects.first()
+        CartArtPiece.objects.create(cart=cart, art=art_piece)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            CartArtPiece.objects.create(cart=cart, art=art_piece)
+
+def listings_file(context):
+    return {'file': SimpleUploadedFile('listings.csv', b'name,type_of_art,price,county,state\n'
+                                                       b'Fern study,Painting,40.00,Marin,CA\n')}
+
+
+# Every URL under /base/, with the most queries one request may run and the largest body it may return.
+# QueryBudgetTests checks each one with SMALL and with LARGE rows of everything (art, cart items, orders...):
+# the query count may not go up with the data (that's an N+1) and must stay within max_queries.
+# A new URL needs an entry here.
+QUERY_BUDGETS = {
+    # users
+    'signup': Budget('POST', '/base/users/signup/', 6, 200, {
+        'username': 'newuser', 'email': 'new@example.com', 'first_name': 'New', 'last_name': 'User',
+        'password': 'password123', 'password_confirm': 'password123'}, status=201),
+    'login': Budget('POST', '/base/users/login/', 8, 200, {'username': '{username}', 'password': 'password123'}),
+    'logout': Budget('POST', '/base/users/logout/', 4, 100),
+    'token-obtain': Budget('POST', '/base/users/token/', 4, 1000,
+                           {'username': '{username}', 'password': 'password123'}),
+    'token-refresh': Budget('POST', '/base/users/token/refresh/', 1, 1000, {'refresh': '{refresh}'}),
+    'token-logout': Budget('POST', '/base/users/token/logout/', 2, 100, {'refresh': '{refresh}'}),
+    # art pieces
+    'all-locations': Budget('GET', '/base/artpieces/locations/', 3, 3000),
+    'create-artpiece': Budget('POST', '/base/artpieces/create/', 12, 1000, {
+        'name': 'Fern study', 'type_of_art': 'Painting', 'price': '40.00', 'stock_amount': 1,
+        'county': 'Marin', 'state': 'CA'}, 'multipart', 201),
+    'artpiece-list': Budget('GET', '/base/artpieces/', 3, 12_000),
+    'listing-import': Budget('POST', '/base/artpieces/import/', 3, 200, listings_file, 'multipart', 202),
+    'listing-import-status': Budget('GET', '/base/artpieces/import/{import_id}/', 2, 200),
+    'artpiece-search': Budget('GET', '/base/artpieces/search/?q=piece', 4, 12_000),
+    'seller-art': Budget('GET', '/base/artpieces/{seller_id}/art/', 3, 10_000),
+    'artpiece-detail': Budget('GET', '/base/artpieces/{art_id}/', 3, 1000),
+    'artpiece-delete': Budget('DELETE', '/base/artpieces/{art_id}/delete/', 5, 100, status=204),
+    'artpiece-image-upload': Budget('POST', '/base/artpieces/{art_id}/image-upload/', 3, 1500,
+                                    {'content_type': 'image/jpeg'}, status=201),
+    'artpiece-image-confirm': Budget('POST', '/base/artpieces/{art_id}/image-upload/confirm/', 5, 2500,
+                                     {'key': '{upload_key}'}),
+    'artpiece-list-async': Budget('GET', '/base/artpieces/async/', 1, 12_000),
+    'all-locations-async': Budget('GET', '/base/artpieces/async/locations/', 1, 3000),
+    'seller-art-async': Budget('GET', '/base/artpieces/async/{seller_id}/art/', 1, 10_000),
+    'artpiece-detail-async': Budget('GET', '/base/artpieces/async/{art_id}/', 1, 1000),
+    # cart
+    'user-cart': Budget('GET', '/base/cart/', 4, 11_000),
+    'cart-summary': Budget('GET', '/base/cart/summary/', 3, 200),
+    'add-to-cart': Budget('POST', '/base/cart/add-to-cart/{other_art_id}/', 7, 100, status=201),
+    'remove-from-cart': Budget('DELETE', '/base/cart/remove/{cart_art_id}/', 3, 100),
+    'cart-batch': Budget('POST', '/base/cart/batch/', 8, 300,
+                         {'add': ['{other_art_id}'], 'remove': ['{cart_art_id}']}),
+    'clear-cart': Budget('DELETE', '/base/cart/clear/', 3, 100),
+    # purchase orders
+    'purchase-history': Budget('GET', '/base/purchase_order/purchase-history/', 4, 25_000),
+    'checkout': Budget('POST', '/base/purchase_order/checkout/', 13, 11_000, {}, status=201),
+    # jobs
+    'job-stats': Budget('GET', '/base/jobs/stats/', 5, 300),
+    'job-status': Budget('GET', '/base/jobs/{job_id}/', 3, 300),
+}
+S3_URLS = {'artpiece-image-upload', 'artpiece-image-confirm'}
+
+
+def url_names(resolver):
+    for pattern in resolver.url_patterns:
+        if isinstance(pattern, URLResolver):
+            yield from url_names(pattern)
+        elif isinstance(pattern, URLPattern):
+            yield pattern.name
+
+
+# fills in '{name}' placeholders from the context, keeping ints as ints
+def fill(value, context):
+    if isinstance(value, dict):
+        return {key: fill(item, context) for key, item in value.items()}
+    if isinstance(value, list):
+        return [fill(item, context) for item in value]
+    if isinstance(value, str) and re.fullmatch(r'\{\w+\}', value):
+        return context[value[1:-1]]
+    if isinstance(value, str):
+        return value.format(**context)
+    return value
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class QueryBudgetTests(TestCase):
+    SMALL = 2
+    LARGE = 20
+
+    def setUp(self):
+        forget_locations()
+        pending_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(pending_dir.cleanup)
+        settings_patch = override_settings(PENDING_UPLOAD_ROOT=pending_dir.name)
+        settings_patch.enable()
+        self.addCleanup(settings_patch.disable)
+
+        self.storage = None
+        if mock_aws is not None:
+            from myproject.storage_backends import MediaStorage
+            aws = mock_aws()
+            aws.start()
+            self.addCleanup(aws.stop)
+            self.storage = MediaStorage(region_name='us-east-2')
+            self.storage.bucket.meta.client.create_bucket(
+                Bucket=self.storage.bucket_name, CreateBucketConfiguration={'LocationConstraint': 'us-east-2'})
+            patcher = mock.patch.object(ArtPiece._meta.get_field('image'), 'storage', self.storage)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.user = make_user()  # sells their own art and buys the other seller's
+        self.other_seller = make_user()
+        self.cart = Cart.objects.create(user=self.user)
+
+    # tops the data up to `size` of everything and returns the ids the paths need
+    def grow(self, size):
+        own = list(ArtPiece.objects.filter(user=self.user))
+        own += [make_art_piece(self.user, make_location()) for _ in range(size - len(own))]
+        others = list(ArtPiece.objects.filter(user=self.other_seller))
+        others += [make_art_piece(self.other_seller, make_location()) for _ in range(size + 1 - len(others))]
+        in_cart = set(CartArtPiece.objects.filter(cart=self.cart).values_list('art_id', flat=True))
+        CartArtPiece.objects.bulk_create([
+            CartArtPiece(cart=self.cart, art=piece) for piece in others[:size] if piece.art_id not in in_cart
+        ])
+        for _ in range(size - PurchaseOrder.objects.filter(buyer=self.user).count()):
+            order = PurchaseOrder.objects.create(buyer=self.user, date_purchased='2025-01-01')
+            PurchaseOrderArtPiece.objects.bulk_create([
+                PurchaseOrderArtPiece(purchase_order=order, art=piece) for piece in others[:2]
+            ])
+        search.rebuild_index()
+
+        upload_key = f'art_pieces/uploads/{own[0].art_id}/budget.jpg'
+        if self.storage is not None:
+            self.storage.bucket.meta.client.put_object(
+                Bucket=self.storage.bucket_name, Key=f'media/{upload_key}', Body=b'jpeg', ContentType='image/jpeg')
+        token_client = Client()
+        return {
+            'username': self.user.username,
+            'seller_id': self.user.user_id,
+            'art_id': own[0].art_id,
+            'cart_art_id': others[0].art_id,
+            'other_art_id': others[size].art_id,
+            'upload_key': upload_key,
+            'import_id': 'budget-import',
+            'job_id': enqueue('artpiece.attach_image', owner_id=self.user.user_id, art_id=own[0].art_id, path='x',
+                              filename='x').job_id,
+            'refresh': token_client.post('/base/users/token/', {'username': self.user.username,
+                                                                'password': 'password123'}).data['refresh'],
+        }
+
+    # runs one request against the current data and undoes whatever it changed
+    def measure(self, budget, context):
+        savepoint = transaction.savepoint()
+        try:
+            cache.clear()  # every request is a catalog cache miss
+            imports.set_progress(context['import_id'], self.user.user_id, 'queued')
+            client = Client()
+            log_in(client, self.user)
+            data = budget.data(context) if callable(budget.data) else fill(budget.data, context)
+            return measure_request(client, budget.method, fill(budget.path, context), data, budget.content)
+        finally:
+            transaction.savepoint_rollback(savepoint)
+
+    def test_every_url_has_a_budget(self):
+        missing = set(url_names(get_resolver('base.urls'))) - set(QUERY_BUDGETS)
+        self.assertFalse(missing, f'add these URLs to QUERY_BUDGETS: {sorted(missing)}')
+
+    def test_endpoints_stay_within_budget(self):
+        small = {}
+        for size in (self.SMALL, self.LARGE):
+            context = self.grow(size)
+            for name, budget in QUERY_BUDGETS.items():
+                if name in S3_URLS and self.storage is None:
+                    continue
+                with self.subTest(endpoint=name, size=size):
+                    response, queries, body_bytes = self.measure(budget, context)
+                    self.assertEqual(response.status_code, budget.status, response.content[:300])
+                    self.assertLessEqual(queries, budget.max_queries)
+                    self.assertLessEqual(body_bytes, budget.max_bytes)
+                    if size == self.SMALL:
+                        small[name] = queries
+                    else:
+                        self.assertLessEqual(queries, small[name], f'{name} runs more queries with more data')
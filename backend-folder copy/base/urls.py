@@ -9,4 +9,5 @@ urlpatterns = [
     path('artpieces/', include('artpiece.urls')),
     path('cart/', include('cart.urls')),
     path('purchase_order/', include('purchase_order.urls')),
+    path('jobs/', include('jobs.urls')),
 ]
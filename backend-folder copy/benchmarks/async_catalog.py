@@ -0,0 +1,141 @@
+import argparse
+import http.client
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+# Throughput of the sync catalog views vs their async versions (artpiece/async_views.py) under uvicorn.
+#
+#   python benchmarks/async_catalog.py                        # starts uvicorn on myproject.asgi itself
+#   python benchmarks/async_catalog.py --concurrency 1 10 50 --duration 10
+#   python benchmarks/async_catalog.py --url http://127.0.0.1:8000   # against a server that's already running
+#
+# Every client is a thread with its own keep-alive connection sending requests back to back. The server
+# uses whatever database myproject/settings.py points at, so load some art pieces first. The catalog cache
+# is switched off for the server we start (otherwise both versions just measure cache hits); pass
+# --with-cache to keep it.
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ENDPOINTS = {
+    'list': '/base/artpieces/{async_}',
+    'detail': '/base/artpieces/{async_}{art_id}/',
+    'seller': '/base/artpieces/{async_}{seller_id}/art/',
+    'locations': '/base/artpieces/{async_}locations/',
+}
+
+
+def start_server(port, with_cache):
+    env = dict(os.environ)
+    if not with_cache:
+        env['CACHE_BACKEND'] = 'django.core.cache.backends.dummy.DummyCache'
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'myproject.asgi:application', '--port', str(port), '--log-level', 'warning'],
+        cwd=BACKEND_DIR, env=env,
+    )
+    for _ in range(100):
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            connection.request('GET', '/base/artpieces/locations/')
+            connection.getresponse().read()
+            return server
+        except OSError:
+            time.sleep(0.1)
+    server.terminate()
+    raise SystemExit('uvicorn did not start')
+
+
+def get_json(host, port, path):
+    connection = http.client.HTTPConnection(host, port)
+    connection.request('GET', path)
+    response = connection.getresponse()
+    return json.loads(response.read())
+
+
+def run_clients(host, port, path, clients, duration):
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def client():
+        connection = http.client.HTTPConnection(host, port)
+        mine = []
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            connection.request('GET', path)
+            response = connection.getresponse()
+            response.read()
+            mine.append(time.perf_counter() - started)
+            if response.status != 200:
+                with lock:
+                    errors[0] += 1
+        with lock:
+            latencies.extend(mine)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+    return {
+        'requests_per_second': len(latencies) / duration,
+        'p50_ms': statistics.median(latencies) * 1000 if latencies else 0,
+        'p95_ms': latencies[int(len(latencies) * 0.95)] * 1000 if latencies else 0,
+        'errors': errors[0],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--url', help='benchmark a server that is already running instead of starting uvicorn')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 10, 50])
+    parser.add_argument('--duration', type=float, default=5, help='seconds per endpoint per concurrency level')
+    parser.add_argument('--endpoints', nargs='+', choices=ENDPOINTS, default=list(ENDPOINTS))
+    parser.add_argument('--with-cache', action='store_true')
+    args = parser.parse_args()
+
+    server = None
+    if args.url:
+        host, port = urlsplit(args.url).hostname, urlsplit(args.url).port or 80
+    else:
+        host, port = '127.0.0.1', args.port
+        server = start_server(port, args.with_cache)
+
+    try:
+        first = get_json(host, port, '/base/artpieces/?page_size=1')['results']
+        if not first:
+            raise SystemExit('no art pieces in the database to benchmark against')
+        ids = {'art_id': first[0]['art_id'], 'seller_id': first[0]['user']['user_id']}
+
+        print(f"{'endpoint':<10} {'clients':>7}  {'sync req/s':>10} {'p50 ms':>7} {'p95 ms':>7}"
+              f"  {'async req/s':>11} {'p50 ms':>7} {'p95 ms':>7}")
+        for name in args.endpoints:
+            for clients in args.concurrency:
+                row = []
+                for async_ in ['', 'async/']:
+                    path = ENDPOINTS[name].format(async_=async_, **ids)
+                    result = run_clients(host, port, path, clients, args.duration)
+                    if result['errors']:
+                        print(f'  {result["errors"]} non-200 responses from {path}', file=sys.stderr)
+                    row.append(result)
+                sync, asynchronous = row
+                print(f"{name:<10} {clients:>7}  {sync['requests_per_second']:>10.1f} {sync['p50_ms']:>7.1f} "
+                      f"{sync['p95_ms']:>7.1f}  {asynchronous['requests_per_second']:>11.1f} "
+                      f"{asynchronous['p50_ms']:>7.1f} {asynchronous['p95_ms']:>7.1f}")
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,30 @@
+import os
+
+from myproject.settings import *  # noqa: F401,F403
+from myproject.settings import BASE_DIR, LOGGING
+
+# Settings for benchmarks/suite.py. Everything is the same as myproject/settings.py except:
+#   - the database: a scratch SQLite file by default, or with BENCHMARK_DATABASE=mysql the MySQL server from
+#     myproject/settings.py. Either way the suite builds a separate test database (test_<name> on MySQL)
+#     the same way the test runner does, so the seeded rows never end up in the real one. Replicas are only
+#     used with MySQL (DATABASE_REPLICA_HOSTS), where the test runner points them at the test database.
+#   - login throttling is off, since every benchmark client logs in from 127.0.0.1
+#   - only warnings are logged (not a line per request)
+
+if os.environ.get('BENCHMARK_DATABASE', 'sqlite') == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'benchmark_db.sqlite3',
+            'TEST': {'NAME': BASE_DIR / 'benchmark_db.sqlite3'},  # a file, so the server threads share it
+        }
+    }
+    DATABASE_REPLICAS = []
+MIGRATION_MODULES = {'base': None}  # build the tables straight from base/models.py, like the tests
+
+DEBUG = False
+ALLOWED_HOSTS = ['127.0.0.1', 'localhost']
+LOGIN_THROTTLE_RATES = {'username': (10 ** 9, 10 ** 9), 'ip': (10 ** 9, 10 ** 9)}
+
+for logger in LOGGING['loggers'].values():
+    logger['level'] = 'WARNING'
@@ -0,0 +1,430 @@
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import timeit
+from collections import defaultdict
+from datetime import datetime, timezone
+from http.cookies import SimpleCookie
+
+# Performance baseline for the API: serializer micro-benchmarks plus throughput and latency percentiles
+# for the main things people do on the site, all against freshly seeded local data.
+#
+#   python benchmarks/suite.py                          # SQLite, compare with benchmarks/baseline.json
+#   python benchmarks/suite.py --database mysql         # a test_ database on the MySQL server in settings
+#   python benchmarks/suite.py --save-baseline          # record this run as the new baseline
+#   python benchmarks/suite.py --scenarios browse detail --clients 1 8 --duration 5
+#
+# What it does:
+#   1. builds a scratch database with benchmarks/settings.py (the same way `manage.py test` does) and fills
+#      it with --scale * (200 users, 50 locations, 2000 art pieces, 100 orders) from base/synthetic.py
+#   2. S3 is moto's in-process fake (moto.mock_aws), so nothing talks to AWS
+#   3. times the output serializers on rows that are already loaded (microseconds per object)
+#   4. starts the Django app on a threaded WSGI server in this process and runs each scenario below with
+#      N clients (threads with their own connection and session) sending requests back to back
+#   5. writes everything to benchmarks/results/<time>.json and compares it with the baseline: a p50/p95
+#      latency, serializer time or req/s more than --tolerance worse than the baseline is a regression,
+#      and the exit status is 1
+#
+# benchmarks/baseline.json is checked in: a default run (SQLite, --scale 1) recorded on a 1-CPU x86_64 Linux
+# machine, with the commit and settings it was made with under "meta". Timings depend on the machine, so before
+# comparing against it on different hardware, record your own with `--save-baseline` on the commit you're
+# starting from (and commit it when the change being measured lands, so the next comparison starts there).
+#
+# The server shares this process (and its GIL) with the clients, so the numbers are for comparing runs on
+# the same machine, not for capacity planning; benchmarks/async_catalog.py runs the catalog under uvicorn.
+# SQLite allows one writer at a time, so checkout only runs with one client there (SQLITE_SINGLE_CLIENT);
+# use --database mysql for the concurrent write scenarios. A baseline with errors in it isn't saved.
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(BACKEND_DIR, 'benchmarks', 'results')
+DEFAULT_BASELINE = os.path.join(BACKEND_DIR, 'benchmarks', 'baseline.json')
+
+PASSWORD = 'benchmark-password'
+SEARCH_WORDS = ['river', 'mountain', 'heron', 'fern', 'canyon', 'meadow', 'fog', 'tide', 'pine', 'aspen']
+TYPES_OF_ART = ['Painting', 'Photography', 'Sculpture', 'Drawing', 'Print', 'Textile']
+STATES = ['CA', 'OR', 'WA', 'NV', 'AZ', 'UT', 'CO', 'NM']
+
+# metric -> True if bigger is better; anything else in the results is informational
+COMPARED_METRICS = {'p50_ms': False, 'p95_ms': False, 'requests_per_second': True, 'us_per_object': False}
+# SQLite allows one writer at a time, so checkout with several clients mostly measures "database is locked"
+# errors there; those runs are skipped on SQLite
+SQLITE_SINGLE_CLIENT = {'checkout'}
+
+
+# ---- data ----
+
+def seed(scale, seed_value):
+    from artpiece import search
+    from base.models import ArtPiece, Users
+    from base.synthetic import SyntheticDataGenerator
+
+    SyntheticDataGenerator(users=200 * scale, locations=50 * scale, art_pieces=2000 * scale, orders=100 * scale,
+                           seed=seed_value, password=PASSWORD, prefix='bench').run()
+    ArtPiece.objects.update(stock_amount=10 ** 6)  # enough that checkout never runs out
+    search.rebuild_index()
+
+    # the clients are users who don't sell anything, so they can buy any piece
+    clients = Users.objects.exclude(user_id__in=ArtPiece.objects.values('user_id')).order_by('user_id')
+    return {
+        'art_ids': list(ArtPiece.objects.values_list('art_id', flat=True)),
+        'clients': list(clients.values_list('username', flat=True)),
+    }
+
+
+def create_bucket():
+    import boto3
+    from django.conf import settings
+
+    boto3.client('s3', region_name=settings.AWS_S3_REGION_NAME).create_bucket(
+        Bucket=settings.AWS_STORAGE_BUCKET_NAME,
+        CreateBucketConfiguration={'LocationConstraint': settings.AWS_S3_REGION_NAME},
+    )
+
+
+# ---- serializer micro-benchmarks ----
+
+def bench_serializers(repeat):
+    from artpiece.serializers import ArtPieceSerializer, LocationSerializer
+    from base.models import ArtPiece, CartArtPiece, Location, Users
+    from cart.serializers import CartArtPieceSerializer
+    from purchase_order.serializers import PurchaseOrderSerializer
+    from purchase_order.views import purchase_orders_with_items
+    from users.serializers import UserSerializer
+
+    art_pieces = list(ArtPiece.objects.select_related('user', 'location')[:100])
+    cart_items = [CartArtPiece(cart_art_id=n, cart_id=1, art=art_piece) for n, art_piece in enumerate(art_pieces)]
+    orders = list(purchase_orders_with_items()[:20])
+    cases = {
+        'ArtPieceSerializer': (ArtPieceSerializer, art_pieces),
+        'LocationSerializer': (LocationSerializer, list(Location.objects.all()[:100])),
+        'UserSerializer': (UserSerializer, list(Users.objects.all()[:100])),
+        'CartArtPieceSerializer': (CartArtPieceSerializer, cart_items),
+        'PurchaseOrderSerializer': (PurchaseOrderSerializer, orders),
+    }
+
+    results = {}
+    for name, (serializer_class, objects) in cases.items():
+        timer = timeit.Timer(lambda: serializer_class(objects, many=True).data)
+        number, _ = timer.autorange()
+        best = min(timer.repeat(repeat, number)) / number
+        results[name] = {'objects': len(objects), 'us_per_object': round(best / len(objects) * 1e6, 2)}
+    return results
+
+
+# ---- load ----
+
+def start_server():
+    from django.core.handlers.wsgi import WSGIHandler
+    from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+
+    class QuietHandler(WSGIRequestHandler):
+        # the handler writes the headers and the body separately; with Nagle on, the body then waits for the
+        # client's delayed ACK and every response takes ~40ms more than it should
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadedWSGIServer(('127.0.0.1', 0), QuietHandler, allow_reuse_address=False)
+    server.set_app(WSGIHandler())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# One simulated user: a connection and a session cookie. Requests made with an op name are timed under it.
+class Client:
+    def __init__(self, port, username):
+        self.connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        self.username = username
+        self.cookies = SimpleCookie()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def request(self, op, method, path, body=None, expect=(200,)):
+        headers = {'Content-Type': 'application/json'}
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f'{name}={morsel.value}' for name, morsel in self.cookies.items())
+        started = time.perf_counter()
+        self.connection.request(method, path, body=json.dumps(body) if body is not None else None,
+                                headers=headers)
+        response = self.connection.getresponse()
+        payload = response.read()
+        elapsed = time.perf_counter() - started
+
+        for cookie in response.headers.get_all('Set-Cookie') or []:
+            self.cookies.load(cookie)
+        if response.getheader('Connection', '').lower() == 'close':
+            self.connection.close()  # reopened by the next request
+        if op is not None:
+            self.latencies[op].append(elapsed)
+            if response.status not in expect:
+                self.errors[op] += 1
+        return response.status, payload
+
+    def log_in(self):
+        status, _ = self.request(None, 'POST', '/base/users/login/', {'username': self.username, 'password': PASSWORD})
+        if status != 200:
+            raise SystemExit(f'could not log in as {self.username} ({status})')
+
+
+# Each scenario is one iteration of what a user does; the client repeats it until time is up.
+# Only requests given an op name are timed.
+
+def browse(client, data, rng):
+    if rng.random() < 0.5:
+        client.request('browse', 'GET', '/base/artpieces/')
+    else:
+        client.request('browse_filtered', 'GET', f'/base/artpieces/?type_of_art={rng.choice(TYPES_OF_ART)}'
+                                                 f'&state={rng.choice(STATES)}&max_price=500')
+
+
+def detail(client, data, rng):
+    client.request('detail', 'GET', f'/base/artpieces/{rng.choice(data["art_ids"])}/')
+
+
+def search(client, data, rng):
+    client.request('search', 'GET', f'/base/artpieces/search/?q={rng.choice(SEARCH_WORDS)}')
+
+
+def cart(client, data, rng):
+    art_id = rng.choice(data['art_ids'])
+    client.request('cart_add', 'POST', f'/base/cart/add-to-cart/{art_id}/', expect=(200, 201))
+    client.request('cart_view', 'GET', '/base/cart/')
+    client.request('cart_remove', 'DELETE', f'/base/cart/remove/{art_id}/')
+
+
+def checkout(client, data, rng):
+    client.request(None, 'POST', f'/base/cart/add-to-cart/{rng.choice(data["art_ids"])}/')
+    client.request('checkout', 'POST', '/base/purchase_order/checkout/', {}, expect=(201,))
+
+
+def login(client, data, rng):
+    client.request('login', 'POST', '/base/users/login/', {'username': client.username, 'password': PASSWORD})
+
+
+SCENARIOS = {
+    'browse': browse,
+    'detail': detail,
+    'search': search,
+    'cart': cart,
+    'checkout': checkout,
+    'login': login,
+}
+NEEDS_SESSION = {'cart', 'checkout'}
+
+
+def run_scenario(name, port, data, clients, duration, seed_value):
+    scenario = SCENARIOS[name]
+    users = [Client(port, username) for username in data['clients'][:clients]]
+    if name in NEEDS_SESSION:
+        for user in users:
+            user.log_in()
+            user.request(None, 'DELETE', '/base/cart/clear/')
+    deadline = time.monotonic() + duration
+
+    def work(user, rng):
+        while time.monotonic() < deadline:
+            scenario(user, data, rng)
+
+    threads = [threading.Thread(target=work, args=(user, random.Random(seed_value + n)))
+               for n, user in enumerate(users)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    for user in users:
+        for op, values in user.latencies.items():
+            latencies[op].extend(values)
+        for op, count in user.errors.items():
+            errors[op] += count
+    return {op: summarize(values, errors[op], duration) for op, values in latencies.items()}
+
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def summarize(latencies, errors, duration):
+    ordered = sorted(latencies)
+    return {
+        'requests': len(ordered),
+        'requests_per_second': round(len(ordered) / duration, 1),
+        'p50_ms': round(statistics.median(ordered) * 1000, 2),
+        'p95_ms': round(percentile(ordered, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(ordered, 0.99) * 1000, 2),
+        'errors': errors,
+        'error_rate': round(errors / len(ordered), 4) if ordered else 0,
+    }
+
+
+def error_rate(metrics):
+    return metrics['errors'] / metrics['requests'] if metrics.get('requests') else 0
+
+
+# ---- results ----
+
+# [(name, metric, baseline value, this run's value, change)] for everything more than `tolerance` worse.
+# Errors have no tolerance: any rise in an endpoint's error rate is a regression, since failing fast would
+# otherwise pass as a speed-up.
+def find_regressions(results, baseline, tolerance):
+    regressions = []
+    for section in ('serializers', 'endpoints'):
+        for name, old_metrics in baseline.get(section, {}).items():
+            new_metrics = results.get(section, {}).get(name)
+            if new_metrics is None:
+                continue
+            for metric, higher_is_better in COMPARED_METRICS.items():
+                old, new = old_metrics.get(metric), new_metrics.get(metric)
+                if not old or new is None:
+                    continue
+                change = (new - old) / old
+                if (-change if higher_is_better else change) > tolerance:
+                    regressions.append((name, metric, old, new, change))
+            if section == 'endpoints':
+                old, new = error_rate(old_metrics), error_rate(new_metrics)
+                if new > old:
+                    regressions.append((name, 'error_rate', round(old, 4), round(new, 4), new - old))
+    return regressions
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serializer micro-benchmarks and endpoint load tests.')
+    parser.add_argument('--database', choices=['sqlite', 'mysql'], default='sqlite')
+    parser.add_argument('--keepdb', action='store_true', help='keep the benchmark database afterwards')
+    parser.add_argument('--scale', type=int, default=1, help='multiplies the amount of seeded data')
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 8], help='concurrency levels to run')
+    parser.add_argument('--duration', type=float, default=5, help='seconds per scenario per concurrency level')
+    parser.add_argument('--warmup', type=float, default=1, help='untimed seconds before each scenario')
+    parser.add_argument('--repeat', type=int, default=5, help='serializer timing repeats (the best one counts)')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--no-cache', action='store_true', help='turn the cache off (DummyCache)')
+    parser.add_argument('--output', help='default: benchmarks/results/<time>.json')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help='also write the results to --baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='how much worse than the baseline counts as a regression (0.25 = 25%%)')
+    args = parser.parse_args()
+
+    # all before Django reads its settings
+    sys.path.insert(0, BACKEND_DIR)
+    os.environ['DJANGO_SETTINGS_MODULE'] = 'benchmarks.settings'
+    os.environ['BENCHMARK_DATABASE'] = args.database
+    if args.no_cache:
+        os.environ['CACHE_BACKEND'] = 'django.core.cache.backends.dummy.DummyCache'
+    os.environ.pop('AWS_S3_ENDPOINT_URL', None)  # moto intercepts the real endpoint
+    for name in ('AWS_ACCESS_KEY_ID', 'AWS_SECRET_ACCESS_KEY'):
+        os.environ[name] = 'benchmark'
+
+    import django
+    from moto import mock_aws
+
+    django.setup()
+    from django.db import connection
+
+    from myproject.test_runner import UnManagedModelTestRunner
+
+    runner = UnManagedModelTestRunner(verbosity=0, interactive=False, keepdb=args.keepdb)
+    with mock_aws():
+        runner.setup_test_environment()
+        old_config = runner.setup_databases()
+        try:
+            create_bucket()
+            started = time.perf_counter()
+            data = seed(args.scale, args.seed)
+            print(f'seeded {len(data["art_ids"])} art pieces in {time.perf_counter() - started:.1f}s')
+
+            results = {
+                'meta': {
+                    'time': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                    'commit': git_commit(),
+                    'database': connection.vendor,
+                    'cache': not args.no_cache,
+                    'scale': args.scale,
+                    'duration': args.duration,
+                    'python': platform.python_version(),
+                    'machine': platform.machine(),
+                },
+                'serializers': bench_serializers(args.repeat),
+                'endpoints': {},
+            }
+            for name, result in results['serializers'].items():
+                print(f'{name:<28} {result["us_per_object"]:>9.1f} us/object')
+
+            server = start_server()
+            port = server.server_address[1]
+            try:
+                print(f"\n{'endpoint':<28} {'clients':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+                      f" {'errors':>6}")
+                for name in args.scenarios:
+                    for clients in args.clients:
+                        if clients > 1 and name in SQLITE_SINGLE_CLIENT and connection.vendor == 'sqlite':
+                            print(f'{name}@{clients}: skipped on SQLite (one writer at a time), use --database mysql')
+                            continue
+                        if args.warmup:
+                            run_scenario(name, port, data, clients, args.warmup, args.seed)
+                        for op, result in run_scenario(name, port, data, clients, args.duration,
+                                                       args.seed).items():
+                            key = f'{op}@{clients}'
+                            results['endpoints'][key] = {'clients': clients, **result}
+                            print(f"{key:<28} {clients:>7} {result['requests_per_second']:>8.1f} "
+                                  f"{result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} {result['p99_ms']:>8.1f} "
+                                  f"{result['errors']:>6}")
+            finally:
+                server.shutdown()
+                server.server_close()
+        finally:
+            runner.teardown_databases(old_config)
+            runner.teardown_test_environment()
+
+    output = args.output or os.path.join(RESULTS_DIR, datetime.now().strftime('%Y%m%d-%H%M%S') + '.json')
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w') as results_file:
+        json.dump(results, results_file, indent=2)
+    print(f'\nresults written to {os.path.relpath(output)}')
+
+    status = 0
+    failing = [name for name, result in results['endpoints'].items() if result['errors']]
+    if args.save_baseline and failing:
+        print(f'not saving a baseline with errors in {", ".join(failing)}')
+        status = 1
+    elif args.save_baseline:
+        with open(args.baseline, 'w') as baseline_file:
+            json.dump(results, baseline_file, indent=2)
+        print(f'baseline saved to {os.path.relpath(args.baseline)}')
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        regressions = find_regressions(results, baseline, args.tolerance)
+        for name, metric, old, new, change in regressions:
+            print(f'REGRESSION {name} {metric}: {old} -> {new} ({change:+.0%})')
+        if regressions:
+            status = 1
+        else:
+            print(f'no regressions against {os.path.relpath(args.baseline)} (tolerance {args.tolerance:.0%})')
+    else:
+        print(f'no baseline at {os.path.relpath(args.baseline)}; run with --save-baseline to record one')
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,17 +1,25 @@
 # cart/serializers.py
 from rest_framework import serializers
+from base.metrics import TimedSerializerMixin
 from base.models import CartArtPiece, ArtPiece, Cart, Users
 from artpiece.serializers import ArtPieceSerializer
 from users.serializers import UserSerializer
 
-class CartArtPieceSerializer(serializers.ModelSerializer):
+class CartArtPieceSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     art = ArtPieceSerializer(read_only=True)
+    out_of_stock = serializers.SerializerMethodField()
     
     class Meta:
         model = CartArtPiece
-        fields = ['cart_art_id', 'cart', 'art']
+        fields = ['cart_art_id', 'cart', 'art', 'out_of_stock']
 
-class CartSerializer(serializers.ModelSerializer):
+    def get_out_of_stock(self, obj):
+        # UserCartListView works this out in SQL; fall back to the loaded art piece otherwise
+        if hasattr(obj, 'out_of_stock'):
+            return obj.out_of_stock
+        return obj.art.stock_amount <= 0
+
+class CartSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     items = serializers.SerializerMethodField()
     
@@ -20,5 +28,24 @@ class CartSerializer(serializers.ModelSerializer):
         fields = ['cart_id', 'user', 'items']
     
     def get_items(self, obj):
-        cart_items = CartArtPiece.objects.filter(cart=obj)
-        return CartArtPieceSerializer(cart_items, many=True).data
\ No newline at end of file
+        cart_items = CartArtPiece.objects.filter(cart=obj).select_related('art__user', 'art__location')
+        return CartArtPieceSerializer(cart_items, many=True).data
+
+# Body of a batch cart update: {"add": [art ids], "remove": [art ids]}
+class CartBatchSerializer(serializers.Serializer):
+    MAX_ITEMS = 100
+
+    add = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False, default=list,
+                                max_length=MAX_ITEMS)
+    remove = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False, default=list,
+                                   max_length=MAX_ITEMS)
+
+    def validate(self, data):
+        # keep the order they were sent in, without repeats
+        data['add'] = list(dict.fromkeys(data['add']))
+        data['remove'] = list(dict.fromkeys(data['remove']))
+        if set(data['add']) & set(data['remove']):
+            raise serializers.ValidationError('An art piece cannot be both added and removed')
+        if not data['add'] and not data['remove']:
+            raise serializers.ValidationError('Nothing to add or remove')
+        return data
@@ -0,0 +1,130 @@
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from base.models import Cart, CartArtPiece
+from base.testing import log_in, make_art_piece, make_location, make_user
+
+
+class CartQueryCountTests(TestCase):
+
+    def setUp(self):
+        self.buyer = make_user()
+        self.cart = Cart.objects.create(user=self.buyer)
+        log_in(self.client, self.buyer)
+
+    def fill_cart(self, how_many):
+        for _ in range(how_many):
+            piece = make_art_piece(make_user(), make_location())
+            CartArtPiece.objects.create(cart=self.cart, art=piece)
+
+    def count_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/base/cart/')
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_cart_query_count_is_constant(self):
+        self.fill_cart(2)
+        small = self.count_queries()
+        self.fill_cart(10)
+        self.assertEqual(self.count_queries(), small)
+
+    def test_totals_and_out_of_stock_flags(self):
+        in_stock = make_art_piece(make_user(), make_location(), price='10.50')
+        sold_out = make_art_piece(make_user(), make_location(), price='4.50', stock_amount=0)
+        CartArtPiece.objects.create(cart=self.cart, art=in_stock)
+        CartArtPiece.objects.create(cart=self.cart, art=sold_out)
+
+        data = self.client.get('/base/cart/').json()
+        self.assertEqual((data['item_count'], data['subtotal']), (2, '15.00'))
+        self.assertTrue(data['has_out_of_stock'])
+        flags = {item['art']['art_id']: item['out_of_stock'] for item in data['items']}
+        self.assertEqual(flags, {in_stock.art_id: False, sold_out.art_id: True})
+
+        summary = self.client.get('/base/cart/summary/').json()
+        self.assertEqual((summary['item_count'], summary['subtotal'], summary['out_of_stock_count']), (2, '15.00', 1))
+
+    def test_reading_does_not_create_a_cart(self):
+        shopper = make_user()
+        log_in(self.client, shopper)
+        with CaptureQueriesContext(connection) as queries:
+            data = self.client.get('/base/cart/').json()
+        self.assertEqual((data['item_count'], data['items']), (0, []))
+        self.assertFalse(Cart.objects.filter(user=shopper).exists())
+        self.assertFalse(any(query['sql'].startswith('INSERT') for query in queries))
+
+    # another request adds the same piece between the "already in cart?" check and the INSERT
+    def test_adding_twice_at_once_keeps_one_row(self):
+        piece = make_art_piece(make_user(), make_location())
+        CartArtPiece.objects.create(cart=self.cart, art=piece)
+        with mock.patch('django.db.models.query.QuerySet.exists', return_value=False):
+            response = self.client.post(f'/base/cart/add-to-cart/{piece.art_id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'message': 'Item already in cart'})
+        self.assertEqual(CartArtPiece.objects.filter(cart=self.cart).count(), 1)
+
+
+class BatchCartTests(TestCase):
+
+    def setUp(self):
+        self.buyer = make_user()
+        log_in(self.client, self.buyer)
+        self.seller = make_user()
+        self.location = make_location()
+
+    def batch(self, add=(), remove=()):
+        return self.client.post('/base/cart/batch/', {'add': list(add), 'remove': list(remove)},
+                                content_type='application/json')
+
+    def test_results_for_each_art_piece(self):
+        fresh = make_art_piece(self.seller, self.location)
+        already = make_art_piece(self.seller, self.location)
+        sold_out = make_art_piece(self.seller, self.location, stock_amount=0)
+        mine = make_art_piece(self.buyer, self.location)
+        to_remove = make_art_piece(self.seller, self.location)
+        never_added = make_art_piece(self.seller, self.location)
+        cart = Cart.objects.create(user=self.buyer)
+        CartArtPiece.objects.create(cart=cart, art=already)
+        CartArtPiece.objects.create(cart=cart, art=to_remove)
+
+        response = self.batch(add=[fresh.art_id, already.art_id, sold_out.art_id, mine.art_id, 999999, fresh.art_id],
+                              remove=[to_remove.art_id, never_added.art_id])
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['add'], {
+            str(fresh.art_id): 'added', str(already.art_id): 'already_in_cart', str(sold_out.art_id): 'out_of_stock',
+            str(mine.art_id): 'own_art', '999999': 'not_found',
+        })
+        self.assertEqual(data['remove'], {str(to_remove.art_id): 'removed', str(never_added.art_id): 'not_in_cart'})
+        self.assertEqual(data['item_count'], 2)
+        self.assertEqual(set(CartArtPiece.objects.filter(cart=cart).values_list('art_id', flat=True)),
+                         {fresh.art_id, already.art_id})
+
+    def test_creates_the_cart_when_needed(self):
+        piece = make_art_piece(self.seller, self.location)
+        self.assertEqual(self.batch(add=[piece.art_id]).json()['add'], {str(piece.art_id): 'added'})
+        self.assertEqual(self.client.get('/base/cart/').json()['item_count'], 1)
+
+    def test_query_count_does_not_grow_with_the_batch(self):
+        Cart.objects.create(user=self.buyer)
+
+        def count_queries(how_many):
+            ids = [make_art_piece(make_user(), self.location).art_id for _ in range(how_many)]
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.batch(add=ids).status_code, 200)
+            with CaptureQueriesContext(connection) as remove_queries:
+                self.assertEqual(self.batch(remove=ids).status_code, 200)
+            return len(queries), len(remove_queries)
+
+        self.assertEqual(count_queries(2), count_queries(20))
+
+    def test_invalid_bodies(self):
+        self.assertEqual(self.batch().status_code, 400)
+        self.assertEqual(self.batch(add=[1], remove=[1]).status_code, 400)
+        self.assertEqual(self.batch(add=['x']).status_code, 400)
+        self.assertEqual(self.batch(add=range(1, 102)).status_code, 400)
+        self.client.logout()
+        self.assertEqual(self.batch(add=[1]).status_code, 401)
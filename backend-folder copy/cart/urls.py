@@ -1,10 +1,12 @@
 # cart/urls.py
 from django.urls import path
-from .views import AddToCartView, RemoveFromCartAPIView, UserCartListView, ClearCartAPIView
+from .views import AddToCartView, RemoveFromCartAPIView, UserCartListView, ClearCartAPIView, CartSummaryAPIView, BatchCartAPIView
 
 urlpatterns = [
     path('', UserCartListView.as_view(), name='user-cart'),
+    path('summary/', CartSummaryAPIView.as_view(), name='cart-summary'),
     path('add-to-cart/<int:art_id>/', AddToCartView.as_view(), name='add-to-cart'),
     path('remove/<int:art_id>/', RemoveFromCartAPIView.as_view(), name='remove-from-cart'),
+    path('batch/', BatchCartAPIView.as_view(), name='cart-batch'),
     path('clear/', ClearCartAPIView.as_view(), name='clear-cart'),
 ]
\ No newline at end of file
@@ -4,82 +4,179 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from base.models import CartArtPiece, ArtPiece, Cart, Users
-from .serializers import CartArtPieceSerializer
+from .serializers import CartArtPieceSerializer, CartBatchSerializer
+from base.authentication import forget_user
 from django.shortcuts import get_object_or_404
-from django.db import transaction
+from django.db import IntegrityError, transaction
+from django.db.models import BooleanField, Count, Exists, ExpressionWrapper, OuterRef, Q, Sum
+from decimal import Decimal
 
-# View all cart items for a specific user
-class UserCartListView(ListAPIView):
-    serializer_class = CartArtPieceSerializer
+# Totals for a user's cart in a single query: number of items, subtotal and how many are out of stock.
+# Returns None if the user has no cart yet (reads never create one).
+def cart_totals(user_id):
+    return Cart.objects.filter(user_id=user_id).annotate(
+        item_count=Count('items_in_cart'),
+        subtotal=Sum('items_in_cart__art__price'),
+        out_of_stock_count=Count('items_in_cart', filter=Q(items_in_cart__art__stock_amount__lte=0)),
+    ).values('cart_id', 'item_count', 'subtotal', 'out_of_stock_count').first()
 
-    def get_queryset(self):
-        user_id = self.request.session.get('user_id')
-        if not user_id:
-            return CartArtPiece.objects.none()
-        
-        user = get_object_or_404(Users, pk=user_id)
-        
-        # Get or create user's cart
-        cart, created = Cart.objects.get_or_create(user=user)
-        
-        return CartArtPiece.objects.filter(cart=cart)
+
+def empty_cart_totals():
+    return {'cart_id': None, 'item_count': 0, 'subtotal': None, 'out_of_stock_count': 0}
+
+
+def format_totals(totals):
+    return {
+        'cart_id': totals['cart_id'],
+        'item_count': totals['item_count'],
+        'subtotal': str(Decimal(totals['subtotal'] or 0).quantize(Decimal('0.01'))),
+        'out_of_stock_count': totals['out_of_stock_count'],
+        'has_out_of_stock': totals['out_of_stock_count'] > 0,
+    }
+
+
+# View all cart items for a specific user, with the cart totals.
+# Two queries (totals + items with their art, seller and location), whatever the size of the cart.
+class UserCartListView(APIView):
+    def get(self, request):
+        if not request.user.is_authenticated:
+            return Response({**format_totals(empty_cart_totals()), 'items': []})
+
+        totals = cart_totals(request.user.user_id) or empty_cart_totals()
+        items = []
+        if totals['item_count']:
+            items = CartArtPiece.objects.filter(cart_id=totals['cart_id']).select_related(
+                'art__user', 'art__location'
+            ).annotate(
+                out_of_stock=ExpressionWrapper(Q(art__stock_amount__lte=0), output_field=BooleanField())
+            ).order_by('cart_art_id')
+
+        return Response({
+            **format_totals(totals),
+            'items': CartArtPieceSerializer(items, many=True).data,
+        })
+
+
+# Just the totals, for the cart badge that every page polls
+class CartSummaryAPIView(APIView):
+    def get(self, request):
+        totals = cart_totals(request.user.user_id) if request.user.is_authenticated else None
+        return Response(format_totals(totals or empty_cart_totals()))
 
 # Handle adding an item to the cart
 class AddToCartView(APIView):
     def post(self, request, art_id):
-        user_id = request.session.get('user_id')
-        if not user_id:
+        if not request.user.is_authenticated:
             return Response({"error": "User not authenticated"}, status=status.HTTP_401_UNAUTHORIZED)
             
-        user = get_object_or_404(Users, pk=user_id)
+        user = request.user  # loaded by SessionUserAuthentication, with the cart id attached
         
         try:
-            art_piece = ArtPiece.objects.get(art_id=art_id)
+            art_piece = ArtPiece.objects.only('art_id', 'stock_amount').get(art_id=art_id)
         except ArtPiece.DoesNotExist:
             return Response({"error": "Art piece not found"}, status=status.HTTP_404_NOT_FOUND)
 
         # Find or create the user's cart
-        cart, created = Cart.objects.get_or_create(user=user)
+        cart_id = user.current_cart_id
+        if cart_id is None:
+            cart, created = Cart.objects.get_or_create(user_id=user.user_id)
+            cart_id = cart.cart_id
+            forget_user(user.user_id)  # the cached user doesn't know about the new cart yet
 
         # Check if the art piece is already in the cart
-        existing_item = CartArtPiece.objects.filter(cart=cart, art=art_piece).first()
-
-        if existing_item:
+        if CartArtPiece.objects.filter(cart_id=cart_id, art_id=art_id).exists():
             # Item already in cart, return success
             return Response({"message": "Item already in cart"}, status=status.HTTP_200_OK)
         else:
             # Create new cart item
             if art_piece.stock_amount > 0:
-                CartArtPiece.objects.create(cart=cart, art=art_piece)
+                try:
+                    with transaction.atomic():
+                        CartArtPiece.objects.create(cart_id=cart_id, art_id=art_id)
+                except IntegrityError:
+                    # another request added it since the check above (cart_id, art_id is unique, migration 0005)
+                    return Response({"message": "Item already in cart"}, status=status.HTTP_200_OK)
                 return Response({"message": "Item added to cart"}, status=status.HTTP_201_CREATED)
             else:
                 return Response({"error": "Item out of stock"}, status=status.HTTP_400_BAD_REQUEST)
 
+# Add and remove many items in one request, e.g. when restoring a saved cart:
+#   POST /base/cart/batch/  {"add": [3, 4, 5], "remove": [7]}
+# Every art piece is checked (exists, in stock, not your own, already in the cart?) with one query,
+# then the changes are made with one bulk INSERT and one DELETE. The response says what happened
+# to each art piece and includes the new cart totals:
+#   {"add": {"3": "added", "4": "out_of_stock", "5": "already_in_cart"}, "remove": {"7": "removed"}, "item_count": ...}
+class BatchCartAPIView(APIView):
+    def post(self, request):
+        if not request.user.is_authenticated:
+            return Response({"error": "User not authenticated"}, status=status.HTTP_401_UNAUTHORIZED)
+
+        serializer = CartBatchSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        add_ids, remove_ids = serializer.validated_data['add'], serializer.validated_data['remove']
+
+        user = request.user
+        with transaction.atomic():
+            cart_id = user.current_cart_id
+            if cart_id is None and add_ids:
+                cart, created = Cart.objects.get_or_create(user_id=user.user_id)
+                cart_id = cart.cart_id
+                forget_user(user.user_id)  # the cached user doesn't know about the new cart yet
+
+            art_pieces = {
+                art['art_id']: art for art in ArtPiece.objects.filter(art_id__in=add_ids + remove_ids).annotate(
+                    in_cart=Exists(CartArtPiece.objects.filter(cart_id=cart_id, art_id=OuterRef('art_id')))
+                ).values('art_id', 'stock_amount', 'user_id', 'in_cart')
+            }
+
+            added = {}
+            for art_id in add_ids:
+                art = art_pieces.get(art_id)
+                if art is None:
+                    added[art_id] = 'not_found'
+                elif art['in_cart']:
+                    added[art_id] = 'already_in_cart'
+                elif art['user_id'] == user.user_id:
+                    added[art_id] = 'own_art'  # checkout would refuse it anyway
+                elif art['stock_amount'] <= 0:
+                    added[art_id] = 'out_of_stock'
+                else:
+                    added[art_id] = 'added'
+            # ignore_conflicts: a concurrent request may have added one of them since the check above
+            CartArtPiece.objects.bulk_create([
+                CartArtPiece(cart_id=cart_id, art_id=art_id) for art_id, result in added.items() if result == 'added'
+            ], ignore_conflicts=True)
+
+            removed = {}
+            for art_id in remove_ids:
+                art = art_pieces.get(art_id)
+                removed[art_id] = 'removed' if art and art['in_cart'] else 'not_in_cart'
+            if cart_id is not None and remove_ids:
+                CartArtPiece.objects.filter(cart_id=cart_id, art_id__in=remove_ids).delete()
+
+        totals = cart_totals(user.user_id) or empty_cart_totals()
+        return Response({
+            'add': {str(art_id): result for art_id, result in added.items()},
+            'remove': {str(art_id): result for art_id, result in removed.items()},
+            **format_totals(totals),
+        }, status=status.HTTP_200_OK)
+
+
 # Remove an item from the cart
 class RemoveFromCartAPIView(APIView):
     def delete(self, request, art_id):
-        user_id = request.session.get('user_id')
-        if not user_id:
+        if not request.user.is_authenticated:
             return Response({"error": "User not authenticated"}, status=status.HTTP_401_UNAUTHORIZED)
             
-        user = get_object_or_404(Users, pk=user_id)
-        
         # Get user's cart
-        try:
-            cart = Cart.objects.get(user=user)
-        except Cart.DoesNotExist:
+        cart_id = request.user.current_cart_id
+        if cart_id is None:
             return Response({"error": "Cart does not exist"}, status=status.HTTP_404_NOT_FOUND)
             
-        # Find art piece
-        try:
-            art_piece = ArtPiece.objects.get(art_id=art_id)
-        except ArtPiece.DoesNotExist:
-            return Response({"error": "Art piece not found"}, status=status.HTTP_404_NOT_FOUND)
-            
-        # Remove item from cart
-        cart_item = CartArtPiece.objects.filter(cart=cart, art=art_piece).first()
-        if cart_item:
-            cart_item.delete()
+        # Remove item from cart (a single DELETE)
+        deleted, _ = CartArtPiece.objects.filter(cart_id=cart_id, art_id=art_id).delete()
+        if deleted:
             return Response({"message": "Item removed from cart"}, status=status.HTTP_200_OK)
         else:
             return Response({"error": "Item not in cart"}, status=status.HTTP_404_NOT_FOUND)
@@ -87,19 +184,15 @@ class RemoveFromCartAPIView(APIView):
 # Clear cart
 class ClearCartAPIView(APIView):
     def delete(self, request):
-        user_id = request.session.get('user_id')
-        if not user_id:
+        if not request.user.is_authenticated:
             return Response({"error": "User not authenticated"}, status=status.HTTP_401_UNAUTHORIZED)
             
-        user = get_object_or_404(Users, pk=user_id)
-        
         # Get user's cart
-        try:
-            cart = Cart.objects.get(user=user)
-            
-            # Delete all items in cart
-            CartArtPiece.objects.filter(cart=cart).delete()
-            
-            return Response({"message": "Cart cleared"}, status=status.HTTP_200_OK)
-        except Cart.DoesNotExist:
-            return Response({"message": "Cart is already empty"}, status=status.HTTP_200_OK)
\ No newline at end of file
+        cart_id = request.user.current_cart_id
+        if cart_id is None:
+            return Response({"message": "Cart is already empty"}, status=status.HTTP_200_OK)
+
+        # Delete all items in cart
+        CartArtPiece.objects.filter(cart_id=cart_id).delete()
+        
+        return Response({"message": "Cart cleared"}, status=status.HTTP_200_OK)
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from jobs.queue import Worker
+
+
+class Command(BaseCommand):
+    help = 'Runs queued background jobs (image uploads, thumbnails, ...).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=4, help='How many jobs run at the same time.')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds to wait when the queue is empty.')
+        parser.add_argument('--once', action='store_true', help='Exit once there is nothing left to run.')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Running jobs with concurrency {options['concurrency']}")
+        Worker(concurrency=options['concurrency'], poll_interval=options['poll_interval']).run(once=options['once'])
@@ -0,0 +1,39 @@
+from django.db import models
+from django.utils import timezone
+
+
+# One unit of background work (see jobs/queue.py). Unlike the tables in base/models.py this one
+# belongs to Django, so it's created by the migrations in jobs/migrations.
+class Job(models.Model):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    job_id = models.BigAutoField(primary_key=True)
+    name = models.CharField(max_length=100)  # registered task name, e.g. "artpiece.attach_image"
+    payload = models.JSONField(default=dict)  # keyword arguments for the task
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)  # pushed back after a failed attempt
+    created_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    last_error = models.TextField(blank=True, default='')
+    # while running: the worker keeps pushing this forward; if it passes, the worker died (see queue.py)
+    locked_until = models.DateTimeField(blank=True, null=True)
+    # user_id (base.Users) of whoever queued the job, the only one allowed to look it up; None for system jobs
+    owner_id = models.IntegerField(blank=True, null=True)
+
+    class Meta:
+        db_table = 'job'
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='job_status_run_after_idx'),
+        ]
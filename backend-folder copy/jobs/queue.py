@@ -0,0 +1,189 @@
+import logging
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.db import close_old_connections, transaction
+from django.db.models import Avg, Count, F, Min
+from django.utils import timezone
+
+from .models import Job
+
+# A small database-backed job queue for work that's too slow to do inside a request
+# (uploading images to S3, generating thumbnails, ...).
+#
+#   @task('artpiece.attach_image')       # in some app's tasks.py
+#   def attach_image(art_id, path): ...
+#
+#   enqueue('artpiece.attach_image', art_id=1, path='...')   # from a view
+#
+# Jobs are rows in the "job" table; `python manage.py run_jobs` picks them up and runs them on a thread pool.
+# A job that raises is retried with exponential backoff until it runs out of attempts.
+# Each job runs in one transaction unless its task is registered with atomic=False
+# (for long jobs that commit their work in chunks themselves).
+#
+# A claimed job is leased to its worker until locked_until, which the worker keeps extending while the job
+# runs. If the worker is killed or crashes the lease runs out, and the next claim_jobs puts the job back in
+# the queue (or fails it, when it's out of attempts or its task isn't atomic and may have committed half its work).
+
+logger = logging.getLogger(__name__)
+
+_tasks = {}
+_non_atomic_tasks = set()
+
+RETRY_BASE_DELAY = 5  # seconds; doubles after each failed attempt
+LEASE_SECONDS = 300  # a running job whose worker hasn't been heard from for this long is taken back
+HEARTBEAT_SECONDS = 60  # how often a worker extends the lease of the jobs it's running
+
+
+def task(name, atomic=True):
+    def register(func):
+        _tasks[name] = func
+        if not atomic:
+            _non_atomic_tasks.add(name)
+        return func
+    return register
+
+
+# owner_id: the user the job is for, who can then poll it through JobStatusAPIView
+def enqueue(name, max_attempts=3, owner_id=None, **payload):
+    if name not in _tasks:
+        raise ValueError(f'Unknown task: {name}')
+    return Job.objects.create(name=name, payload=payload, max_attempts=max_attempts, owner_id=owner_id)
+
+
+# Queues the same task for a list of payloads with a single INSERT
+def enqueue_many(name, payloads, max_attempts=3):
+    if name not in _tasks:
+        raise ValueError(f'Unknown task: {name}')
+    return Job.objects.bulk_create([Job(name=name, payload=payload, max_attempts=max_attempts) for payload in payloads])
+
+
+# Running jobs whose lease ran out: back to pending if they can safely run again, otherwise failed
+def requeue_expired(now):
+    for job in Job.objects.filter(status=Job.RUNNING, locked_until__lt=now).only('job_id', 'name', 'attempts',
+                                                                                'max_attempts', 'locked_until'):
+        expired = Job.objects.filter(job_id=job.job_id, status=Job.RUNNING, locked_until=job.locked_until)
+        error = f'Worker stopped responding (lease expired at {job.locked_until.isoformat()})'
+        if job.attempts < job.max_attempts and job.name not in _non_atomic_tasks:
+            if expired.update(status=Job.PENDING, run_after=now, locked_until=None, last_error=error):
+                logger.warning('job %s (%s) was abandoned by its worker, requeued', job.job_id, job.name)
+        elif expired.update(status=Job.FAILED, finished_at=now, locked_until=None, last_error=error):
+            logger.error('job %s (%s) was abandoned by its worker, failed', job.job_id, job.name)
+
+
+def claim_jobs(limit):
+    # The conditional UPDATE means two workers can never both claim the same job,
+    # even on databases without SELECT ... FOR UPDATE SKIP LOCKED.
+    now = timezone.now()
+    requeue_expired(now)
+    candidate_ids = list(
+        Job.objects.filter(status=Job.PENDING, run_after__lte=now).order_by('run_after', 'job_id')
+        .values_list('job_id', flat=True)[:limit]
+    )
+    claimed = []
+    for job_id in candidate_ids:
+        updated = Job.objects.filter(job_id=job_id, status=Job.PENDING).update(
+            status=Job.RUNNING, started_at=now, attempts=F('attempts') + 1,
+            locked_until=now + timedelta(seconds=LEASE_SECONDS),
+        )
+        if updated:
+            claimed.append(job_id)
+    return list(Job.objects.filter(job_id__in=claimed).order_by('job_id'))
+
+
+def run_job(job):
+    started = time.monotonic()
+    try:
+        func = _tasks[job.name]
+        if job.name in _non_atomic_tasks:
+            func(**job.payload)
+        else:
+            with transaction.atomic():
+                func(**job.payload)
+    except Exception as e:
+        finished = timezone.now()
+        if job.attempts < job.max_attempts:
+            delay = RETRY_BASE_DELAY * 2 ** (job.attempts - 1)
+            Job.objects.filter(job_id=job.job_id).update(
+                status=Job.PENDING, run_after=finished + timedelta(seconds=delay), locked_until=None,
+                last_error=traceback.format_exc(),
+            )
+            logger.warning('job %s (%s) failed on attempt %s, retrying in %ss: %s',
+                           job.job_id, job.name, job.attempts, delay, e)
+        else:
+            Job.objects.filter(job_id=job.job_id).update(
+                status=Job.FAILED, finished_at=finished, locked_until=None, last_error=traceback.format_exc(),
+            )
+            logger.error('job %s (%s) failed after %s attempts: %s', job.job_id, job.name, job.attempts, e)
+        return False
+
+    Job.objects.filter(job_id=job.job_id).update(status=Job.DONE, finished_at=timezone.now(), locked_until=None,
+                                                 last_error='')
+    logger.info('job %s (%s) done in %.3fs, %.3fs after it was queued', job.job_id, job.name,
+                time.monotonic() - started, (timezone.now() - job.created_at).total_seconds())
+    return True
+
+
+# Runs whatever is due right now, one at a time, in this thread. Handy for tests and one-off scripts.
+def run_pending(limit=100):
+    return sum(1 for job in claim_jobs(limit) if run_job(job))
+
+
+class Worker:
+    def __init__(self, concurrency=4, poll_interval=1.0):
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.running = {}  # future -> job id
+        self.last_heartbeat = time.monotonic()
+
+    def run_in_thread(self, job):
+        # each pool thread has its own database connection; don't let it go stale between jobs
+        close_old_connections()
+        try:
+            return run_job(job)
+        finally:
+            close_old_connections()
+
+    # tells the other workers the jobs we're running are still alive
+    def heartbeat(self):
+        if self.running and time.monotonic() - self.last_heartbeat >= HEARTBEAT_SECONDS:
+            Job.objects.filter(job_id__in=self.running.values(), status=Job.RUNNING).update(
+                locked_until=timezone.now() + timedelta(seconds=LEASE_SECONDS),
+            )
+            self.last_heartbeat = time.monotonic()
+
+    def run(self, once=False):
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='job') as pool:
+            while True:
+                self.running = {future: job_id for future, job_id in self.running.items() if not future.done()}
+                self.heartbeat()
+                free = self.concurrency - len(self.running)
+                jobs = claim_jobs(free) if free else []
+                for job in jobs:
+                    self.running[pool.submit(self.run_in_thread, job)] = job.job_id
+                if once and not self.running:
+                    return
+                if not jobs:
+                    time.sleep(self.poll_interval)
+
+
+# Queue depth and latency numbers for dashboards / the stats endpoint
+def stats():
+    now = timezone.now()
+    counts = dict(Job.objects.values_list('status').annotate(total=Count('job_id')))
+    oldest_pending = Job.objects.filter(status=Job.PENDING).aggregate(oldest=Min('created_at'))['oldest']
+    recent = Job.objects.filter(status=Job.DONE, finished_at__gte=now - timedelta(hours=1)).aggregate(
+        latency=Avg(F('finished_at') - F('created_at')),
+        runtime=Avg(F('finished_at') - F('started_at')),
+    )
+    return {
+        'pending': counts.get(Job.PENDING, 0),
+        'running': counts.get(Job.RUNNING, 0),
+        'failed': counts.get(Job.FAILED, 0),
+        'done': counts.get(Job.DONE, 0),
+        'oldest_pending_seconds': (now - oldest_pending).total_seconds() if oldest_pending else 0,
+        'avg_latency_seconds_last_hour': recent['latency'].total_seconds() if recent['latency'] else None,
+        'avg_runtime_seconds_last_hour': recent['runtime'].total_seconds() if recent['runtime'] else None,
+    }
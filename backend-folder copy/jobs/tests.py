@@ -0,0 +1,149 @@
+from datetime import timedelta
+
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from base.testing import log_in, make_user
+from . import queue
+from .models import Job
+from .queue import Worker, enqueue, enqueue_many, run_pending, stats, task
+
+calls = []
+
+
+@task('tests.record')
+def record(value):
+    calls.append(value)
+
+
+@task('tests.flaky')
+def flaky(fail_times):
+    calls.append('try')
+    if calls.count('try') <= fail_times:
+        raise RuntimeError('not yet')
+
+
+@task('tests.in_transaction', atomic=False)
+def in_transaction():
+    calls.append(connection.in_atomic_block)
+
+
+class JobQueueTests(TestCase):
+
+    def setUp(self):
+        calls.clear()
+
+    def test_enqueue_and_run(self):
+        job = enqueue('tests.record', value=42)
+        self.assertEqual(run_pending(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.DONE)
+        self.assertEqual(calls, [42])
+        self.assertEqual(run_pending(), 0)
+
+    def test_enqueue_many(self):
+        enqueue_many('tests.record', [{'value': 1}, {'value': 2}, {'value': 3}])
+        self.assertEqual(run_pending(), 3)
+        self.assertEqual(calls, [1, 2, 3])
+
+    def test_unknown_task(self):
+        with self.assertRaises(ValueError):
+            enqueue('tests.nope')
+
+    def test_failed_job_is_retried_with_backoff(self):
+        job = enqueue('tests.flaky', fail_times=1)
+        self.assertEqual(run_pending(), 0)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.PENDING)
+        self.assertGreater(job.run_after, timezone.now())
+        self.assertIn('not yet', job.last_error)
+
+        Job.objects.filter(job_id=job.job_id).update(run_after=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(run_pending(), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.DONE, 2))
+
+    def test_job_fails_after_max_attempts(self):
+        job = enqueue('tests.flaky', fail_times=5, max_attempts=1)
+        run_pending()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+
+    def test_stats(self):
+        enqueue('tests.record', value=1)
+        enqueue('tests.record', value=2)
+        run_pending(limit=1)
+        self.assertEqual(self.client.get('/base/jobs/stats/').status_code, 401)
+        log_in(self.client, make_user())
+        numbers = self.client.get('/base/jobs/stats/').json()
+        self.assertEqual((numbers['pending'], numbers['done']), (1, 1))
+        self.assertEqual(stats()['pending'], 1)
+
+
+    def test_status_is_only_shown_to_the_owner(self):
+        owner = make_user()
+        job = enqueue('tests.record', owner_id=owner.user_id, value=1)
+        url = f'/base/jobs/{job.job_id}/'
+        self.assertEqual(self.client.get(url).status_code, 401)
+        log_in(self.client, make_user())
+        self.assertEqual(self.client.get(url).status_code, 404)
+        log_in(self.client, owner)
+        self.assertEqual(self.client.get(url).json()['status'], Job.PENDING)
+
+    def expire(self, job):
+        Job.objects.filter(job_id=job.job_id).update(locked_until=timezone.now() - timedelta(seconds=1))
+
+    def test_abandoned_job_is_requeued(self):
+        job = enqueue('tests.record', value=7)
+        claimed, = queue.claim_jobs(1)  # ...and the worker dies without finishing it
+        self.assertGreater(claimed.locked_until, timezone.now())
+        self.assertEqual(run_pending(), 0)  # still leased
+
+        self.expire(job)
+        with self.assertLogs('jobs.queue', 'WARNING'):
+            self.assertEqual(run_pending(), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.locked_until), (Job.DONE, 2, None))
+        self.assertEqual(calls, [7])
+
+    def test_abandoned_job_fails_when_it_cannot_run_again(self):
+        out_of_attempts = enqueue('tests.record', max_attempts=1, value=1)
+        non_atomic = enqueue('tests.in_transaction')
+        queue.claim_jobs(2)
+        self.expire(out_of_attempts)
+        self.expire(non_atomic)
+        with self.assertLogs('jobs.queue', 'ERROR'):
+            self.assertEqual(run_pending(), 0)
+        for job in (out_of_attempts, non_atomic):
+            job.refresh_from_db()
+            self.assertEqual(job.status, Job.FAILED)
+            self.assertIn('lease expired', job.last_error)
+
+    def test_worker_heartbeat_extends_the_lease(self):
+        job = enqueue('tests.record', value=1)
+        queue.claim_jobs(1)
+        self.expire(job)
+        worker = Worker()
+        worker.running = {object(): job.job_id}
+        worker.last_heartbeat -= queue.HEARTBEAT_SECONDS
+        worker.heartbeat()
+        job.refresh_from_db()
+        self.assertGreater(job.locked_until, timezone.now())
+
+
+class WorkerTests(TransactionTestCase):
+
+    def test_worker_runs_everything_on_a_thread_pool(self):
+        calls.clear()
+        for value in range(10):
+            enqueue('tests.record', value=value)
+        Worker(concurrency=3, poll_interval=0.01).run(once=True)
+        self.assertEqual(sorted(calls), list(range(10)))
+        self.assertEqual(Job.objects.filter(status=Job.DONE).count(), 10)
+
+    def test_non_atomic_tasks_run_outside_a_transaction(self):
+        calls.clear()
+        enqueue('tests.in_transaction')
+        run_pending()
+        self.assertEqual(calls, [False])
@@ -0,0 +1,7 @@
+from django.urls import path
+from .views import JobStatsAPIView, JobStatusAPIView
+
+urlpatterns = [
+    path('stats/', JobStatsAPIView.as_view(), name='job-stats'),
+    path('<int:job_id>/', JobStatusAPIView.as_view(), name='job-status'),
+]
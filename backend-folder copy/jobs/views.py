@@ -0,0 +1,32 @@
+from django.shortcuts import get_object_or_404
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .models import Job
+from .queue import stats
+
+
+# queue depth and job latency, for monitoring (logged-in users only)
+class JobStatsAPIView(APIView):
+    def get(self, request):
+        if not request.user.is_authenticated:
+            return Response({'error': 'User not authenticated'}, status=status.HTTP_401_UNAUTHORIZED)
+        return Response(stats())
+
+
+# lets the frontend poll a job it was handed back (e.g. a listing's image upload).
+# Only the user the job was queued for can see it; anyone else gets a 404, as if it didn't exist.
+class JobStatusAPIView(APIView):
+    def get(self, request, job_id):
+        if not request.user.is_authenticated:
+            return Response({'error': 'User not authenticated'}, status=status.HTTP_401_UNAUTHORIZED)
+        job = get_object_or_404(Job, job_id=job_id, owner_id=request.user.user_id)
+        return Response({
+            'job_id': job.job_id,
+            'name': job.name,
+            'status': job.status,
+            'attempts': job.attempts,
+            'created_at': job.created_at,
+            'finished_at': job.finished_at,
+        })
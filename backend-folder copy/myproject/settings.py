@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 import os
+import sys
 from pathlib import Path
 from datetime import timedelta
 import boto3
@@ -48,15 +49,41 @@ INSTALLED_APPS = [
     "artpiece",
     "cart",
     "purchase_order",
+    "jobs",
     'rest_framework_simplejwt',
     'corsheaders',
     "storages",
 ]
 
 REST_FRAMEWORK = {
-    'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend']
+    'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend'],
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'base.authentication.JWTUserAuthentication',  # only used when an Authorization: Bearer header is sent
+        'base.authentication.SessionUserAuthentication',
+    ],
 }
 
+# Login: size of the thread pool that checks password hashes, and token-bucket limits on attempts
+# as (bucket size, tokens added back per second) -- see users/passwords.py and users/throttling.py.
+# Run `manage.py clear_login_throttle` now and then (e.g. daily, next to clearsessions) to prune old buckets.
+PASSWORD_HASH_WORKERS = 4
+LOGIN_THROTTLE_RATES = {
+    'username': (5, 5 / 60),  # 5 attempts in a burst, then 5 a minute
+    'ip': (20, 20 / 60),  # 20 attempts in a burst, then 20 a minute
+}
+
+# Token login for our own Users table (see base/authentication.py)
+SIMPLE_JWT = {
+    'ACCESS_TOKEN_LIFETIME': timedelta(minutes=15),
+    'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
+    'USER_ID_FIELD': 'user_id',
+    'USER_ID_CLAIM': 'user_id',
+    'UPDATE_LAST_LOGIN': False,
+}
+
+# Seconds the logged-in Users row (and their cart id) is cached between requests; 0 turns it off
+AUTH_USER_CACHE_TIMEOUT = 30
+
 # Add these AWS S3 settings to your settings.py
 
 # In settings.py
@@ -68,16 +95,39 @@ MEDIA_URL = '/media/'
 AWS_STORAGE_BUCKET_NAME = 'nature-picture-images'
 AWS_S3_REGION_NAME = 'us-east-2'  # Change to your region if different
 AWS_QUERYSTRING_AUTH = False  # This will remove query parameter authentication from generated URLs
+AWS_S3_ENDPOINT_URL = os.environ.get('AWS_S3_ENDPOINT_URL')  # set to a MinIO/moto server URL to work locally
 
 # S3 Storage configuration
 DEFAULT_FILE_STORAGE = 'myproject.storage_backends.MediaStorage'
 
+# Direct-to-bucket uploads (see artpiece/uploads.py)
+ART_IMAGE_MAX_UPLOAD_BYTES = 15 * 1024 * 1024  # 15 MB
+ART_IMAGE_UPLOAD_EXPIRY = 600  # seconds a presigned upload stays valid
+
+# Images uploaded through ArtPieceCreateAPIView wait here until a background job sends them to S3
+PENDING_UPLOAD_ROOT = os.path.join(BASE_DIR, 'pending_uploads')
+
 # Optional but recommended settings
 AWS_S3_OBJECT_PARAMETERS = {
     'CacheControl': 'max-age=86400',  # 1 day cache
 }
 
 
+# The cache has to be shared by every process: web workers and `run_jobs` coordinate through it (the catalog
+# version in artpiece/cache.py, location map invalidation, the JWT denylist), and a bump made in one process
+# must be seen by the others. The database cache works out of the box once its table exists
+# (`python manage.py createcachetable`, safe to re-run); point CACHE_BACKEND/CACHE_LOCATION at Redis or Memcached
+# (e.g. django.core.cache.backends.redis.RedisCache, redis://host:6379) to take the load off the database.
+# A per-process cache (LocMemCache) gets a warning from `manage.py check` (base/checks.py).
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.db.DatabaseCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'django_cache'),
+    }
+}
+CATALOG_CACHE_TIMEOUT = 300  # seconds a cached catalog response is kept
+
+
 CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOW_CREDENTIALS = True
 
@@ -86,6 +136,8 @@ SESSION_COOKIE_SECURE = False
 
 
 MIDDLEWARE = [
+    "base.middleware.RequestMetricsMiddleware",  # first, so its timings cover everything below
+    "base.middleware.ReplicaRoutingMiddleware",  # before the session middleware, which reads and writes sessions
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -98,6 +150,9 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = "myproject.urls"
 
+# Per-request timings (base/middleware.py): sent back in a Server-Timing header and logged
+SERVER_TIMING = True
+
 AUTHENTICATION_BACKENDS = [
     'django.contrib.auth.backends.ModelBackend',
 ]
@@ -135,6 +190,62 @@ DATABASES = {
     }
 }
 
+# Read replicas (base/replicas.py). GET requests read from these aliases; DATABASE_REPLICA_HOSTS is a
+# comma-separated list of MySQL replica hosts with the same database, user and password as the primary.
+DATABASE_REPLICAS = []
+for number, host in enumerate(filter(None, os.environ.get('DATABASE_REPLICA_HOSTS', '').split(',')), start=1):
+    DATABASES[f'replica{number}'] = {**DATABASES['default'], 'HOST': host.strip(), 'TEST': {'MIRROR': 'default'}}
+    DATABASE_REPLICAS.append(f'replica{number}')
+DATABASE_ROUTERS = ['base.replicas.ReplicaRouter']
+REPLICA_PIN_SECONDS = 5  # after writing, a client reads from the primary for this long (longer than replication lag)
+REPLICA_RETRY_SECONDS = 30  # a replica that couldn't be connected to is skipped for this long
+REPLICA_FALLBACK = os.environ.get('REPLICA_FALLBACK', 'primary')  # when no replica is up: 'primary' or 'error' (503)
+
+# The test suite runs against a throwaway local SQLite database so it doesn't need the MySQL server.
+# The models are unmanaged, so the test runner temporarily makes them managed to create the tables.
+if 'test' in sys.argv:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+            'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},  # a file (not :memory:) so threaded tests share it
+        },
+        # a second database standing in for a read replica; only tests that ask for it use it (ReplicaRoutingTests)
+        'replica': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'test_replica_db.sqlite3',
+            'TEST': {'NAME': BASE_DIR / 'test_replica_db.sqlite3'},
+        },
+    }
+    DATABASE_REPLICAS = []
+    MIGRATION_MODULES = {'base': None}  # build the test tables straight from base/models.py
+    PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']  # fast hashing keeps test setup quick
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}  # tests opt in to caching
+
+TEST_RUNNER = 'myproject.test_runner.UnManagedModelTestRunner'
+
+# Log to the console. Debugging output is logged at DEBUG, which only shows when DEBUG is on
+# (or LOG_LEVEL=DEBUG); the per-request metrics lines are INFO. The test suite only shows warnings.
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'WARNING' if 'test' in sys.argv else 'DEBUG' if DEBUG else 'INFO')
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'simple': {'format': '{asctime} {levelname} {name}: {message}', 'style': '{'},
+    },
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler', 'formatter': 'simple'},
+    },
+    'loggers': {
+        'artpiece': {'handlers': ['console'], 'level': LOG_LEVEL},
+        'base': {'handlers': ['console'], 'level': LOG_LEVEL},
+        'cart': {'handlers': ['console'], 'level': LOG_LEVEL},
+        'jobs': {'handlers': ['console'], 'level': LOG_LEVEL},
+        'purchase_order': {'handlers': ['console'], 'level': LOG_LEVEL},
+        'users': {'handlers': ['console'], 'level': LOG_LEVEL},
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
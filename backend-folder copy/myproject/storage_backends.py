@@ -1,5 +1,8 @@
 from storages.backends.s3boto3 import S3Boto3Storage
 
-class MediaStorage(S3Boto3Storage):
+from base.metrics import TimedStorageMixin
+
+# TimedStorageMixin: the time spent talking to S3 shows up as "storage" in the Server-Timing header
+class MediaStorage(TimedStorageMixin, S3Boto3Storage):
     location = 'media'
     file_overwrite = False
\ No newline at end of file
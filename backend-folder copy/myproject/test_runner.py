@@ -0,0 +1,24 @@
+from django.apps import apps
+from django.test.runner import DiscoverRunner
+
+
+# All of our models in base/models.py are managed=False because they mirror the hand-built MySQL database.
+# That means Django won't create their tables in the test database, so this runner flips them to
+# managed=True for the duration of the test run (and back again afterwards).
+class UnManagedModelTestRunner(DiscoverRunner):
+    # these tables already belong to Django's own apps (auth, sessions, migrations...) so leave them alone
+    skipped_table_prefixes = ('auth_', 'django_')
+
+    def setup_test_environment(self, *args, **kwargs):
+        self.unmanaged_models = [
+            model for model in apps.get_app_config('base').get_models()
+            if not model._meta.managed and not model._meta.db_table.startswith(self.skipped_table_prefixes)
+        ]
+        for model in self.unmanaged_models:
+            model._meta.managed = True
+        super().setup_test_environment(*args, **kwargs)
+
+    def teardown_test_environment(self, *args, **kwargs):
+        super().teardown_test_environment(*args, **kwargs)
+        for model in self.unmanaged_models:
+            model._meta.managed = False
@@ -0,0 +1,10 @@
+from rest_framework.pagination import CursorPagination
+
+
+# Keyset pagination for purchase history, newest orders first.
+# purchase_order_id breaks ties between orders placed on the same day so the order of rows is stable.
+class PurchaseOrderCursorPagination(CursorPagination):
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-date_purchased', '-purchase_order_id')
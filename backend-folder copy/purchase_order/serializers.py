@@ -1,16 +1,17 @@
 from rest_framework import serializers
+from base.metrics import TimedSerializerMixin
 from base.models import PurchaseOrder, PurchaseOrderArtPiece, ArtPiece
 from artpiece.serializers import ArtPieceSerializer
 from users.serializers import UserSerializer  # your existing user serializer
 
-class PurchaseOrderArtPieceSerializer(serializers.ModelSerializer):
+class PurchaseOrderArtPieceSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     art = ArtPieceSerializer(read_only=True)
 
     class Meta:
         model = PurchaseOrderArtPiece
         fields = '__all__'
 
-class PurchaseOrderSerializer(serializers.ModelSerializer):
+class PurchaseOrderSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     buyer = UserSerializer(read_only=True)
     art_pieces = serializers.SerializerMethodField()
 
@@ -19,5 +20,16 @@ class PurchaseOrderSerializer(serializers.ModelSerializer):
         fields = '__all__'  # Include all fields from the PurchaseOrder model
 
     def get_art_pieces(self, obj):
-        purchase_items = PurchaseOrderArtPiece.objects.filter(purchase_order=obj)
+        # uses the items prefetched by the view (see purchase_orders_with_items) instead of a query per order
+        purchase_items = obj.purchaseorderartpiece_set.all()
         return PurchaseOrderArtPieceSerializer(purchase_items, many=True).data
+
+
+# Purchase history without the nested art pieces: just the totals, computed in SQL by the view
+class PurchaseOrderSummarySerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    item_count = serializers.IntegerField(read_only=True)
+    total = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+
+    class Meta:
+        model = PurchaseOrder
+        fields = ['purchase_order_id', 'date_purchased', 'item_count', 'total']
@@ -0,0 +1,193 @@
+import threading
+import time
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import close_old_connections, connection
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from base.models import ArtPiece, Cart, CartArtPiece, PurchaseOrder, PurchaseOrderArtPiece
+from base.testing import log_in, make_art_piece, make_location, make_user
+
+
+class PurchaseHistoryQueryCountTests(TestCase):
+
+    def setUp(self):
+        self.buyer = make_user()
+        log_in(self.client, self.buyer)
+
+    def add_orders(self, how_many, items_per_order=3):
+        for _ in range(how_many):
+            order = PurchaseOrder.objects.create(buyer=self.buyer, date_purchased=timezone.now().date())
+            for _ in range(items_per_order):
+                piece = make_art_piece(make_user(), make_location())
+                PurchaseOrderArtPiece.objects.create(purchase_order=order, art=piece, price=piece.price)
+
+    def count_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/base/purchase_order/purchase-history/')
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_purchase_history_query_count_is_constant(self):
+        self.add_orders(1)
+        small = self.count_queries()
+        self.add_orders(5)
+        self.assertEqual(self.count_queries(), small)
+
+    def test_history_is_paginated_newest_first(self):
+        self.add_orders(5, items_per_order=1)
+        url = '/base/purchase_order/purchase-history/?page_size=2'
+        seen = []
+        while url:
+            page = self.client.get(url).json()
+            self.assertLessEqual(len(page['results']), 2)
+            seen.extend(order['purchase_order_id'] for order in page['results'])
+            url = page['next']
+        self.assertEqual(seen, sorted(seen, reverse=True))
+        self.assertEqual(len(seen), 5)
+
+    def test_summary_mode(self):
+        self.add_orders(2, items_per_order=3)
+        response = self.client.get('/base/purchase_order/purchase-history/?summary=true')
+        order = response.data['results'][0]
+        self.assertEqual(set(order), {'purchase_order_id', 'date_purchased', 'item_count', 'total'})
+        self.assertEqual(order['item_count'], 3)
+        self.assertEqual(order['total'], '75.00')
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/base/purchase_order/purchase-history/?summary=true')
+        self.assertLessEqual(len(queries), 4)  # session, user, orders with totals
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class CheckoutCacheTests(TestCase):
+
+    def test_checkout_invalidates_cached_stock(self):
+        cache.clear()
+        buyer = make_user()
+        piece = make_art_piece(make_user(), make_location(), stock_amount=2)
+        cart = Cart.objects.create(user=buyer)
+        CartArtPiece.objects.create(cart=cart, art=piece)
+        detail_url = f'/base/artpieces/{piece.art_id}/'
+        self.assertEqual(self.client.get(detail_url).data['stock_amount'], 2)
+
+        log_in(self.client, buyer)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/base/purchase_order/checkout/')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.client.get(detail_url).data['stock_amount'], 1)
+
+
+class CheckoutTests(TestCase):
+
+    def setUp(self):
+        self.buyer = make_user()
+        self.seller = make_user()
+        self.location = make_location()
+        self.cart = Cart.objects.create(user=self.buyer)
+        log_in(self.client, self.buyer)
+
+    def add_to_cart(self, **fields):
+        piece = make_art_piece(self.seller, self.location, **fields)
+        CartArtPiece.objects.create(cart=self.cart, art=piece)
+        return piece
+
+    def checkout(self):
+        return self.client.post('/base/purchase_order/checkout/')
+
+    def test_checkout_creates_order_and_decrements_stock(self):
+        first = self.add_to_cart(stock_amount=2)
+        second = self.add_to_cart(stock_amount=1)
+        response = self.checkout()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data['order']['art_pieces']), 2)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual((first.stock_amount, second.stock_amount), (1, 0))
+        self.assertFalse(CartArtPiece.objects.filter(cart=self.cart).exists())
+
+    def test_history_shows_the_price_paid(self):
+        piece = self.add_to_cart(price=Decimal('40.00'))
+        self.assertEqual(self.checkout().status_code, 201)
+        ArtPiece.objects.filter(pk=piece.pk).update(price=Decimal('90.00'))
+
+        order = self.client.get('/base/purchase_order/purchase-history/').data['results'][0]
+        self.assertEqual(order['art_pieces'][0]['price'], '40.00')
+        summary = self.client.get('/base/purchase_order/purchase-history/?summary=true').data['results'][0]
+        self.assertEqual(summary['total'], '40.00')
+
+    def test_out_of_stock_rolls_back_everything(self):
+        in_stock = self.add_to_cart(stock_amount=3)
+        self.add_to_cart(stock_amount=0)
+        self.assertEqual(self.checkout().status_code, 400)
+        in_stock.refresh_from_db()
+        self.assertEqual(in_stock.stock_amount, 3)
+        self.assertFalse(PurchaseOrder.objects.exists())
+        self.assertEqual(CartArtPiece.objects.filter(cart=self.cart).count(), 2)
+
+    def test_cannot_buy_own_art(self):
+        piece = make_art_piece(self.buyer, self.location)
+        CartArtPiece.objects.create(cart=self.cart, art=piece)
+        self.assertEqual(self.checkout().status_code, 400)
+        self.assertFalse(PurchaseOrder.objects.exists())
+
+    def test_empty_and_missing_cart(self):
+        self.assertEqual(self.checkout().status_code, 400)
+        self.cart.delete()
+        self.assertEqual(self.checkout().status_code, 404)
+
+    def test_query_count_does_not_grow_with_cart_size(self):
+        for _ in range(2):
+            self.add_to_cart()
+        with CaptureQueriesContext(connection) as small:
+            self.assertEqual(self.checkout().status_code, 201)
+
+        for _ in range(10):
+            self.add_to_cart()
+        with CaptureQueriesContext(connection) as large:
+            self.assertEqual(self.checkout().status_code, 201)
+        self.assertEqual(len(large), len(small))
+
+
+class ConcurrentCheckoutTests(TransactionTestCase):
+    # Many buyers race for the last few copies of the same piece from separate threads
+
+    def test_no_oversell(self):
+        stock = 3
+        piece = make_art_piece(make_user(), make_location(), stock_amount=stock)
+        buyers = [make_user() for _ in range(8)]
+        for buyer in buyers:
+            CartArtPiece.objects.create(cart=Cart.objects.create(user=buyer), art=piece)
+
+        start = threading.Barrier(len(buyers))
+        results = []
+
+        def checkout(buyer):
+            client = Client()
+            log_in(client, buyer)
+            start.wait()
+            try:
+                # a 500 here means the database was busy (SQLite allows one writer); the client just retries
+                for _ in range(20):
+                    response = client.post('/base/purchase_order/checkout/')
+                    if response.status_code != 500:
+                        break
+                    time.sleep(0.05)
+                results.append(response.status_code)
+            finally:
+                close_old_connections()
+
+        threads = [threading.Thread(target=checkout, args=(buyer,)) for buyer in buyers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        piece.refresh_from_db()
+        self.assertEqual(piece.stock_amount, 0)
+        self.assertEqual(results.count(201), stock)
+        self.assertEqual(results.count(400), len(buyers) - stock)
+        self.assertEqual(PurchaseOrderArtPiece.objects.filter(art=piece).count(), stock)
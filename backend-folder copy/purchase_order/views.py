@@ -1,95 +1,148 @@
 # purchase_order/views.py
+from collections import Counter, defaultdict
 from rest_framework.generics import ListAPIView
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from django.shortcuts import get_object_or_404
 from django.db import transaction
+from django.db.models import Count, F, Prefetch, Sum
 from django.utils import timezone
 from base.models import PurchaseOrder, PurchaseOrderArtPiece, ArtPiece, Users, Cart, CartArtPiece
-from .serializers import PurchaseOrderSerializer
+from .serializers import PurchaseOrderSerializer, PurchaseOrderSummarySerializer
+from .pagination import PurchaseOrderCursorPagination
+from artpiece.cache import bump_catalog_version_on_commit
 
-# Get Purchase Order History for a specific user
+# Purchase orders with their buyer, line items, and each item's art piece/seller/location loaded up front.
+# Serializing any number of orders from this queryset takes 2 queries total instead of several per order.
+def purchase_orders_with_items():
+    return PurchaseOrder.objects.select_related('buyer').prefetch_related(
+        Prefetch(
+            'purchaseorderartpiece_set',
+            queryset=PurchaseOrderArtPiece.objects.select_related('art__user', 'art__location'),
+        )
+    )
+
+
+# Get Purchase Order History for a specific user, one page at a time (newest first).
+# ?summary=true returns just the item count and total paid per order instead of every art piece.
 class PurchaseOrderListAPIView(ListAPIView):
     serializer_class = PurchaseOrderSerializer
+    pagination_class = PurchaseOrderCursorPagination
+
+    def is_summary(self):
+        return self.request.query_params.get('summary', '').lower() in ('1', 'true', 'yes')
+
+    def get_serializer_class(self):
+        if self.is_summary():
+            return PurchaseOrderSummarySerializer
+        return PurchaseOrderSerializer
 
     def get_queryset(self):
-        # Manually authenticate user via session
-        user_id = self.request.session.get('user_id')  # Assuming user_id is stored in session during login
+        # request.user is loaded from the session by SessionUserAuthentication
+        user = self.request.user
         
-        if not user_id:
-            # If no user_id found in session, return an empty queryset
+        if not user.is_authenticated:
+            # If not logged in, return an empty queryset
             return PurchaseOrder.objects.none()  
 
-        # If authenticated, fetch the user
-        user = get_object_or_404(Users, pk=user_id)
-
         # Return the PurchaseOrders for this user
-        return PurchaseOrder.objects.filter(buyer=user).order_by('-date_purchased')
+        if self.is_summary():
+            return PurchaseOrder.objects.filter(buyer=user).annotate(
+                item_count=Count('purchaseorderartpiece'),
+                total=Sum('purchaseorderartpiece__price'),
+            )
+        return purchase_orders_with_items().filter(buyer=user)
     
 # Create a new Purchase Order (checkout process)
 class CreatePurchaseOrderAPIView(APIView):
     def post(self, request):
         # Check if user is authenticated
-        user_id = request.session.get('user_id')
-        if not user_id:
+        if not request.user.is_authenticated:
             return Response({"error": "User not authenticated"}, status=status.HTTP_401_UNAUTHORIZED)
             
-        user = get_object_or_404(Users, pk=user_id)
+        user = request.user
         
-        # Check if user has items in cart
-        try:
-            cart = Cart.objects.get(user=user)
-            cart_items = CartArtPiece.objects.filter(cart=cart)
-            
-            if not cart_items.exists():
-                return Response({"error": "Cart is empty"}, status=status.HTTP_400_BAD_REQUEST)
-                
-        except Cart.DoesNotExist:
-            return Response({"error": "Cart does not exist"}, status=status.HTTP_404_NOT_FOUND)
-            
         # Get order notes if provided
         order_notes = request.data.get('order_notes', '')
-            
+
+        # Checkout runs a fixed number of queries however many items are in the cart, and row locks make it
+        # safe when two buyers check out the last copy of a piece at the same time.
         try:
             with transaction.atomic():
-                # Create purchase order
-                purchase_order = PurchaseOrder.objects.create(
-                    buyer=user,
-                    date_purchased=timezone.now().date()
+                # Lock the cart so the same cart can't be checked out twice at once
+                cart = None
+                if user.current_cart_id is not None:
+                    cart = Cart.objects.select_for_update().filter(cart_id=user.current_cart_id).first()
+                if cart is None:
+                    return Response({"error": "Cart does not exist"}, status=status.HTTP_404_NOT_FOUND)
+
+                # art_id -> how many times it's in the cart (normally 1)
+                quantities = Counter(CartArtPiece.objects.filter(cart=cart).values_list('art_id', flat=True))
+                if not quantities:
+                    return Response({"error": "Cart is empty"}, status=status.HTTP_400_BAD_REQUEST)
+
+                # Lock every art piece in the cart in one query (always in art_id order, so two checkouts
+                # can't deadlock by locking the same rows in a different order)
+                art_pieces = list(
+                    ArtPiece.objects.select_for_update()
+                    .filter(art_id__in=quantities)
+                    .order_by('art_id')
+                    .only('art_id', 'name', 'user_id', 'stock_amount', 'price')
                 )
-                
-                # Add items to purchase order
-                for cart_item in cart_items:
-                    art_piece = cart_item.art
 
-                    if art_piece.user.user_id == user.user_id:
+                for art_piece in art_pieces:
+                    if art_piece.user_id == user.user_id:
+                        transaction.set_rollback(True)
                         return Response({
                             "error": f"You cannot purchase your own art: '{art_piece.name}'"
                          }, status=status.HTTP_400_BAD_REQUEST)
-                    
+
                     # Check if item is still in stock
-                    if art_piece.stock_amount <= 0:
+                    if art_piece.stock_amount < quantities[art_piece.art_id]:
                         transaction.set_rollback(True)
                         return Response({
                             "error": f"Item '{art_piece.name}' is out of stock"
                         }, status=status.HTTP_400_BAD_REQUEST)
-                    
-                    # Create purchase order item
-                    PurchaseOrderArtPiece.objects.create(
-                        purchase_order=purchase_order,
-                        art=art_piece
+
+                # Decrease stock with one conditional UPDATE per distinct quantity (just one in practice).
+                # The stock_amount__gte condition is the real guard: if another checkout got there first the
+                # row isn't updated and we roll back instead of overselling.
+                by_quantity = defaultdict(list)
+                for art_id, quantity in quantities.items():
+                    by_quantity[quantity].append(art_id)
+                for quantity, art_ids in by_quantity.items():
+                    updated = ArtPiece.objects.filter(art_id__in=art_ids, stock_amount__gte=quantity).update(
+                        stock_amount=F('stock_amount') - quantity
                     )
-                    
-                    # Decrease stock
-                    art_piece.stock_amount -= 1
-                    art_piece.save()
-                
+                    if updated != len(art_ids):
+                        transaction.set_rollback(True)
+                        return Response({"error": "An item in your cart is out of stock"},
+                                        status=status.HTTP_400_BAD_REQUEST)
+
+                # Create purchase order and all of its items in one insert, recording the price paid for each
+                # so the history still shows it after the seller changes the listing
+                prices = {art_piece.art_id: art_piece.price for art_piece in art_pieces}
+                purchase_order = PurchaseOrder.objects.create(
+                    buyer=user,
+                    date_purchased=timezone.now().date()
+                )
+                PurchaseOrderArtPiece.objects.bulk_create([
+                    PurchaseOrderArtPiece(purchase_order=purchase_order, art_id=art_id, price=prices[art_id])
+                    for art_id, quantity in quantities.items()
+                    for _ in range(quantity)
+                ])
+
                 # Clear cart after successful order
-                cart_items.delete()
+                CartArtPiece.objects.filter(cart=cart).delete()
+
+                # stock changed, so cached catalog responses are out of date once this commits
+                bump_catalog_version_on_commit()
                 
                 # Return purchase order details
-                serializer = PurchaseOrderSerializer(purchase_order)
+                serializer = PurchaseOrderSerializer(
+                    purchase_orders_with_items().get(pk=purchase_order.pk)
+                )
                 return Response({
                     "message": "Order placed successfully",
                     "order": serializer.data
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from users.throttling import clear_full_buckets
+
+
+class Command(BaseCommand):
+    help = ('Deletes login throttling buckets that have filled up again (see users/throttling.py). '
+            'Run it every so often, like clearsessions, so the table only holds recent attempts.')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'Deleted {clear_full_buckets()} login throttling buckets')
@@ -0,0 +1,12 @@
+from django.db import models
+
+
+# One login-throttling token bucket (see users/throttling.py), e.g. key "username:fern" or "ip:10.0.0.7".
+# Unlike the tables in base/models.py this one belongs to Django, so it's created by users/migrations.
+class LoginThrottleBucket(models.Model):
+    key = models.CharField(primary_key=True, max_length=255)
+    tokens = models.FloatField()  # tokens left as of `updated`
+    updated = models.FloatField()  # unix time of the last attempt
+
+    class Meta:
+        db_table = 'login_throttle_bucket'
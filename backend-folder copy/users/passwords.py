@@ -0,0 +1,41 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+
+from base.models import Users
+
+# Password checking off the request thread.
+#
+# Checking a PBKDF2 hash is tens of milliseconds of pure CPU. Under ASGI that would block the event loop
+# (or the single thread sync views share), so logins hash on a small, fixed-size thread pool instead;
+# its size caps how much CPU logins can take at once.
+#
+# When a password checks out but its hash uses an old algorithm or iteration count, a fresh hash is made
+# at the same time and saved, so old hashes are upgraded as people log in.
+
+_executor = ThreadPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix='password')
+
+
+# (password matches?, new hash to store or None). Runs on the pool; doesn't touch the database.
+def _check(raw_password, encoded):
+    new_hashes = []
+    matches = check_password(raw_password, encoded, setter=lambda raw: new_hashes.append(make_password(raw)))
+    return matches, (new_hashes[0] if new_hashes else None)
+
+
+def verify_password(user, raw_password):
+    matches, new_hash = _executor.submit(_check, raw_password, user.password).result()
+    if matches and new_hash:
+        Users.objects.filter(pk=user.pk).update(password=new_hash)
+        user.password = new_hash
+    return matches
+
+
+async def averify_password(user, raw_password):
+    matches, new_hash = await asyncio.wrap_future(_executor.submit(_check, raw_password, user.password))
+    if matches and new_hash:
+        await Users.objects.filter(pk=user.pk).aupdate(password=new_hash)
+        user.password = new_hash
+    return matches
@@ -1,9 +1,10 @@
 from rest_framework import serializers
 from django.contrib.auth.hashers import make_password
+from base.metrics import TimedSerializerMixin
 from base.models import Users, ArtPiece, Location
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Users
         fields = ['user_id', 'username', 'email', 'first_name', 'last_name', ]  # Fields to be serialized
@@ -0,0 +1,170 @@
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from base.authentication import JWTUserAuthentication, deny_token
+from base.models import Cart, CartArtPiece, Users
+from base.testing import make_art_piece, make_location, make_user
+from .models import LoginThrottleBucket
+from .throttling import check_login_rate, clear_full_buckets
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'users-tests'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class TokenAuthenticationTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = make_user(username='fern', password='secret-pass')
+        self.cart = Cart.objects.create(user=self.user)
+
+    def obtain(self):
+        response = self.client.post('/base/users/token/', {'username': 'fern', 'password': 'secret-pass'})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def bearer(self, access):
+        return {'HTTP_AUTHORIZATION': f'Bearer {access}'}
+
+    def test_wrong_password(self):
+        response = self.client.post('/base/users/token/', {'username': 'fern', 'password': 'nope'})
+        self.assertEqual(response.status_code, 401)
+
+    def test_access_token_authenticates_without_session_or_user_queries(self):
+        tokens = self.obtain()
+        CartArtPiece.objects.create(cart=self.cart, art=make_art_piece(make_user(), make_location()))
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/base/cart/summary/', **self.bearer(tokens['access']))
+        self.assertEqual(response.data['item_count'], 1)
+        sql = ' '.join(query['sql'] for query in queries)
+        self.assertNotIn('django_session', sql)
+        self.assertNotIn('FROM "users"', sql)
+
+    def test_token_always_carries_a_cart(self):
+        self.cart.delete()
+        tokens = self.obtain()
+        cart = Cart.objects.get(user=self.user)
+        self.assertEqual(AccessToken(tokens['access'])['cart_id'], cart.cart_id)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.delete('/base/cart/clear/', **self.bearer(tokens['access']))
+        self.assertEqual(response.data['message'], 'Cart cleared')
+        self.assertNotIn('FROM "cart" ', ' '.join(query['sql'] for query in queries))
+
+    def test_token_user_cannot_be_saved(self):
+        user = JWTUserAuthentication().get_user(AccessToken(self.obtain()['access']))
+        self.assertEqual((user.user_id, user.username), (self.user.user_id, 'fern'))
+        with self.assertRaises(TypeError):
+            user.save()
+        self.assertEqual(Users.objects.get(pk=self.user.pk).email, self.user.email)  # the row is untouched
+
+    def test_a_refresh_token_can_only_be_denied_once(self):
+        refresh = RefreshToken(self.obtain()['refresh'])
+        self.assertTrue(deny_token(refresh))
+        self.assertFalse(deny_token(refresh))
+        response = self.client.post('/base/users/token/refresh/', {'refresh': str(refresh)})
+        self.assertEqual(response.status_code, 401)
+
+    def test_refresh_rotates_tokens(self):
+        tokens = self.obtain()
+        response = self.client.post('/base/users/token/refresh/', {'refresh': tokens['refresh']})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.data['refresh'], tokens['refresh'])
+
+        # the old refresh token was used up
+        response = self.client.post('/base/users/token/refresh/', {'refresh': tokens['refresh']})
+        self.assertEqual(response.status_code, 401)
+
+    def test_logout_revokes_tokens(self):
+        tokens = self.obtain()
+        response = self.client.post('/base/users/token/logout/', {'refresh': tokens['refresh']},
+                                    **self.bearer(tokens['access']))
+        self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(self.client.delete('/base/cart/clear/', **self.bearer(tokens['access'])).status_code, 401)
+        response = self.client.post('/base/users/token/refresh/', {'refresh': tokens['refresh']})
+        self.assertEqual(response.status_code, 401)
+
+    def test_invalid_token_is_rejected(self):
+        self.assertEqual(self.client.delete('/base/cart/clear/', **self.bearer('not-a-token')).status_code, 401)
+
+
+class LoginTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = make_user(username='moss', password='secret-pass')
+
+    def login(self, password='secret-pass', **extra):
+        return self.client.post('/base/users/login/', {'username': 'moss', 'password': password},
+                                content_type='application/json', **extra)
+
+    def test_login_sets_session(self):
+        response = self.login()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['user_id'], self.user.user_id)
+        self.assertEqual(self.client.session['user_id'], self.user.user_id)
+
+    def test_wrong_password_and_unknown_user(self):
+        self.assertEqual(self.login(password='wrong').status_code, 401)
+        response = self.client.post('/base/users/login/', {'username': 'nobody', 'password': 'x'},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 404)
+
+    def test_form_encoded_login_still_works(self):
+        response = self.client.post('/base/users/login/', {'username': 'moss', 'password': 'secret-pass'})
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(PASSWORD_HASHERS=[
+        'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+        'django.contrib.auth.hashers.MD5PasswordHasher',
+    ])
+    def test_legacy_hash_is_upgraded_on_login(self):
+        self.assertTrue(self.user.password.startswith('md5$'))
+        self.assertEqual(self.login().status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$'))
+        self.assertEqual(self.login().status_code, 200)
+
+    @override_settings(LOGIN_THROTTLE_RATES={'username': (3, 0.01), 'ip': (100, 1)})
+    def test_burst_of_attempts_is_throttled(self):
+        for _ in range(3):
+            self.assertEqual(self.login(password='wrong').status_code, 401)
+        response = self.login()
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 0)
+
+        # other usernames from the same address aren't affected
+        make_user(username='fern', password='pw')
+        response = self.client.post('/base/users/login/', {'username': 'fern', 'password': 'pw'},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(LOGIN_THROTTLE_RATES={'username': (2, 0.5), 'ip': (100, 1)})
+class LoginThrottleTests(TestCase):
+
+    def test_bucket_empties_and_refills(self):
+        self.assertEqual(check_login_rate('moss', '10.0.0.1'), 0)
+        self.assertEqual(check_login_rate('MOSS', '10.0.0.2'), 0)  # same username bucket
+        self.assertGreater(check_login_rate('moss', '10.0.0.3'), 0)
+        self.assertEqual(check_login_rate('fern', '10.0.0.1'), 0)
+
+        with mock.patch('users.throttling.time.time', return_value=time.time() + 2):
+            self.assertEqual(check_login_rate('moss', '10.0.0.4'), 0)
+        self.assertAlmostEqual(LoginThrottleBucket.objects.get(key='username:moss').tokens, 0, places=1)
+
+    def test_full_buckets_are_cleared(self):
+        check_login_rate('moss', '10.0.0.1')
+        self.assertEqual(clear_full_buckets(), 0)
+        self.assertEqual(clear_full_buckets(now=time.time() + 5), 1)  # the username bucket; the IP one takes 100s
+        self.assertEqual(clear_full_buckets(now=time.time() + 101), 1)
+        self.assertFalse(LoginThrottleBucket.objects.exists())
@@ -0,0 +1,75 @@
+import time
+
+from django.conf import settings
+from django.db.models import F, FloatField, Value
+from django.db.models.functions import Least
+from django.db.models.lookups import GreaterThanOrEqual
+
+from .models import LoginThrottleBucket
+
+# Token-bucket rate limiting for login attempts, per username and per client IP.
+#
+# Each bucket holds up to `capacity` tokens and refills at `refill_rate` tokens a second; every attempt takes
+# one. A credential-stuffing burst empties its bucket quickly and then gets a 429 before we spend any CPU
+# on password hashing, while normal users never notice.
+#
+# Buckets are rows in the database (users.models.LoginThrottleBucket), so every web process sees the same ones,
+# and a token is taken with a single conditional UPDATE: concurrent attempts can't both spend the last token.
+# Rows for buckets that have filled up again are removed by `manage.py clear_login_throttle`.
+
+KEY_LENGTH = LoginThrottleBucket._meta.get_field('key').max_length
+
+
+def _take(key, capacity, refill_rate, now):
+    available = Least(
+        Value(float(capacity)), F('tokens') + (Value(now) - F('updated')) * Value(refill_rate),
+        output_field=FloatField(),
+    )
+    taken = LoginThrottleBucket.objects.filter(GreaterThanOrEqual(available, 1), key=key).update(
+        tokens=available - 1, updated=now,
+    )
+    if taken:
+        return 0
+
+    bucket = LoginThrottleBucket.objects.filter(key=key).first()
+    if bucket is None:
+        return 0  # removed by clear_login_throttle in between, so it was full
+    tokens = min(capacity, bucket.tokens + (now - bucket.updated) * refill_rate)
+    return max(1 - tokens, 0) / refill_rate  # seconds until a token is available
+
+
+def client_ip(request):
+    return request.META.get('REMOTE_ADDR', '')
+
+
+# Takes a token from the username and IP buckets. Returns 0 if the attempt may go ahead,
+# otherwise how many seconds to wait.
+def check_login_rate(username, ip):
+    now = time.time()
+    # the username comes straight from the request, hence the cut to the column's length
+    buckets = [(scope, f'{scope}:{value}'[:KEY_LENGTH]) for scope, value in (
+        ('username', (username or '').lower()), ('ip', ip),
+    )]
+    # new buckets start full; the ones that already exist are left alone
+    LoginThrottleBucket.objects.bulk_create([
+        LoginThrottleBucket(key=key, tokens=settings.LOGIN_THROTTLE_RATES[scope][0], updated=now)
+        for scope, key in buckets
+    ], ignore_conflicts=True)
+
+    wait = 0
+    for scope, key in buckets:
+        capacity, refill_rate = settings.LOGIN_THROTTLE_RATES[scope]
+        wait = max(wait, _take(key, capacity, refill_rate, now))
+    return wait
+
+
+# Deletes the buckets that have had time to fill up again, which are the same as no bucket at all.
+# Returns how many were deleted.
+def clear_full_buckets(now=None):
+    now = time.time() if now is None else now
+    deleted = 0
+    for scope, (capacity, refill_rate) in settings.LOGIN_THROTTLE_RATES.items():
+        deleted += LoginThrottleBucket.objects.filter(
+            key__startswith=f'{scope}:', updated__lt=now - capacity / refill_rate,
+        ).delete()[0]
+    return deleted
@@ -1,9 +1,12 @@
 from django.urls import path
-from .views import LoginAPIView, LogoutAPIView, SignupAPIView
+from .views import login_view, LogoutAPIView, SignupAPIView, TokenObtainAPIView, TokenRefreshAPIView, TokenLogoutAPIView
 
 urlpatterns = [
     path('signup/', SignupAPIView.as_view(), name='signup'),
-    path('login/', LoginAPIView.as_view(), name='login'),
+    path('login/', login_view, name='login'),
     path('logout/', LogoutAPIView.as_view(), name='logout'),
+    path('token/', TokenObtainAPIView.as_view(), name='token-obtain'),
+    path('token/refresh/', TokenRefreshAPIView.as_view(), name='token-refresh'),
+    path('token/logout/', TokenLogoutAPIView.as_view(), name='token-logout'),
 ]
 
@@ -1,3 +1,8 @@
+import json
+import math
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
@@ -7,6 +12,12 @@ from django.shortcuts import get_object_or_404
 from django.contrib.auth.hashers import check_password
 from base.models import Location, ArtPiece, Users
 from .serializers import SignupSerializer  # Import the serializer
+from base.authentication import deny_token, forget_user, tokens_for_user
+from django.db.models import F
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.tokens import RefreshToken
+from .passwords import averify_password, verify_password
+from .throttling import check_login_rate, client_ip
 
 
 # Handles user signup functionality.
@@ -32,35 +43,127 @@ class SignupAPIView(APIView):
 # Handles the login functionality. It is an API endpoint that 
 # allows the frontend to send login data (username and password), checks the credentials 
 # against the database, and returns a response based on whether the login is successful or not.
-class LoginAPIView(APIView):
+#
+# This is a plain async Django view (DRF views are sync only) so that under ASGI the slow password hash
+# runs on the bounded pool in users/passwords.py while the event loop keeps serving other requests.
+# Attempts are rate limited per username and IP before any hashing happens.
+async def login_view(request):
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Method not allowed'}, status=status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    try:
+        data = json.loads(request.body or b'{}') if request.content_type == 'application/json' else request.POST
+    except ValueError:
+        return JsonResponse({'error': 'Invalid JSON'}, status=status.HTTP_400_BAD_REQUEST)
+    username = data.get('username')
+    password = data.get('password') or ''
+
+    wait = await sync_to_async(check_login_rate)(username, client_ip(request))
+    if wait:
+        response = JsonResponse({'error': 'Too many login attempts, try again later'},
+                                status=status.HTTP_429_TOO_MANY_REQUESTS)
+        response['Retry-After'] = str(math.ceil(wait))
+        return response
+
+    user = await Users.objects.filter(username=username).afirst() # tries to find user object in database 
+    if user is None:
+        return JsonResponse({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    if not await averify_password(user, password):
+        return JsonResponse({'error': 'Invalid password'}, status=status.HTTP_401_UNAUTHORIZED)
+
+    # create a session for the user by storing their user_id in Django's session framework — 
+    # this is exactly how session-based auth works. Django will automatically send a session 
+    # cookie back to the frontend (called sessionid) which will identify the user in future requests
+    # (the session store is synchronous, hence sync_to_async)
+    await sync_to_async(request.session.__setitem__)('user_id', user.user_id)
+
+    return JsonResponse({
+        'message': 'Login successful', 
+        'user_id': user.user_id,
+        'username': user.username,
+        'email': user.email,
+    })
+
+
+# like the DRF view it replaces, login doesn't need a CSRF token (Django 4.2's @csrf_exempt
+# wraps the view in a sync function, so set the flag by hand to keep the view async)
+login_view.csrf_exempt = True
+
+
+class LogoutAPIView(APIView):
+    def post(self, request):
+        user_id = request.session.get('user_id')
+        if user_id:
+            forget_user(user_id)  # drop the cached user row (base/authentication.py)
+        request.session.flush()  # clears session data
+        return Response({'message': 'Logged out successfully'}, status=status.HTTP_200_OK)
+
+
+# Token-based login (optional alternative to the session login above).
+# Returns an access token to send as "Authorization: Bearer <access>" and a refresh token to get new ones.
+class TokenObtainAPIView(APIView):
     permission_classes = [AllowAny]
+    authentication_classes = []
 
     def post(self, request):
         username = request.data.get('username')
         password = request.data.get('password')
 
-        try:
-            user = Users.objects.get(username=username) # tries to find user object in database 
-            if check_password(password, user.password):
-                # create a session for the user by storing their user_id in Django's session framework — 
-                # this is exactly how session-based auth works. Django will automatically send a session 
-                # cookie back to the frontend (called sessionid) which will identify the user in future requests
-                request.session['user_id'] = user.user_id 
-
-                return Response({
-                    'message': 'Login successful', 
-                    'user_id': user.user_id,
-                    'username': user.username,
-                    'email': user.email,
-                })
-            else:
-                return Response({'error': 'Invalid password'}, status=status.HTTP_401_UNAUTHORIZED)
-        except Users.DoesNotExist:
+        wait = check_login_rate(username, client_ip(request))
+        if wait:
+            return Response({'error': 'Too many login attempts, try again later'},
+                            status=status.HTTP_429_TOO_MANY_REQUESTS, headers={'Retry-After': str(math.ceil(wait))})
+
+        user = Users.objects.annotate(current_cart_id=F('cart__cart_id')).filter(username=username).first()
+        if user is None:
             return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
-        
+        if not verify_password(user, password or ''):
+            return Response({'error': 'Invalid password'}, status=status.HTTP_401_UNAUTHORIZED)
 
+        refresh = tokens_for_user(user, user.current_cart_id)
+        return Response({
+            'access': str(refresh.access_token),
+            'refresh': str(refresh),
+            'user_id': user.user_id,
+            'username': user.username,
+            'email': user.email,
+        })
+
+
+# Swaps a refresh token for a new access + refresh pair. The old refresh token can't be used again.
+class TokenRefreshAPIView(APIView):
+    permission_classes = [AllowAny]
+    authentication_classes = []
 
-class LogoutAPIView(APIView):
     def post(self, request):
-        request.session.flush()  # clears session data
+        try:
+            old_refresh = RefreshToken(request.data.get('refresh'))
+        except TokenError:
+            return Response({'error': 'Invalid or expired refresh token'}, status=status.HTTP_401_UNAUTHORIZED)
+        # denying the old token is also the check that it hasn't been used or revoked: of two requests
+        # refreshing the same token at once, only one gets through
+        if not deny_token(old_refresh):
+            return Response({'error': 'Refresh token has been revoked'}, status=status.HTTP_401_UNAUTHORIZED)
+
+        # re-read the user here (refreshing is rare) in case they were deleted or their cart changed
+        user = Users.objects.annotate(current_cart_id=F('cart__cart_id')).filter(pk=old_refresh['user_id']).first()
+        if user is None:
+            return Response({'error': 'User not found'}, status=status.HTTP_401_UNAUTHORIZED)
+
+        refresh = tokens_for_user(user, user.current_cart_id)
+        return Response({'access': str(refresh.access_token), 'refresh': str(refresh)})
+
+
+# Revokes the refresh token from the body and the access token used to make the request
+class TokenLogoutAPIView(APIView):
+    permission_classes = [AllowAny]
+
+    def post(self, request):
+        try:
+            deny_token(RefreshToken(request.data.get('refresh')))
+        except TokenError:
+            pass  # already expired or garbage; nothing to revoke
+        if request.auth is not None:
+            deny_token(request.auth)
         return Response({'message': 'Logged out successfully'}, status=status.HTTP_200_OK)